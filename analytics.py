@@ -0,0 +1,298 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+import box
+import shards
+
+"""
+The `analytics.py` script computes learning statistics for one or many flashcard boxes.
+It loads card levels and the review logs written by `Box.save_reviews` into NumPy arrays
+and computes all statistics with vectorised operations, so it scales to thousands of boxes and millions of reviews.
+
+Run it as a report command: `python analytics.py [BOX ...] [--data data] [--days 30]`.
+"""
+
+# ____________________
+
+# Layout of a record in the review log, must match box.REVIEW_RECORD
+REVIEW_DTYPE = np.dtype(
+    [("time", "<f8"), ("card", "<u4"), ("level", "u1"), ("correct", "u1")]
+)
+
+# Days until a card in a level is due for its next review, by level
+INTERVAL_DAYS = np.array([1, 2, 3, 5, 8, 13, 21, 34, 55, 89])
+
+SECONDS_PER_DAY = 86400
+
+
+# ______Loading______
+
+
+def load_reviews(file_path):
+    """
+    Loads a review log into a structured array.
+
+    Args:
+        file_path (str): Path of the review log.
+
+    Returns:
+        numpy.ndarray: The reviews with the fields time, card, level (before the review) and correct.
+    """
+    if not os.path.isfile(file_path):
+        return np.empty(0, dtype=REVIEW_DTYPE)
+    return np.fromfile(file_path, dtype=REVIEW_DTYPE)
+
+
+def load_boxes(save_folder="data", names=None):
+    """
+    Loads the cards and reviews of several boxes into flat arrays.
+    Cards and reviews are joined by a key combining the box number and the card ID.
+
+    Args:
+        save_folder (str, optional): Folder with the JSON save-files. Defaults to 'data'.
+        names (list, optional): Names of the boxes to load. Defaults to None (all boxes, sharded ones included).
+
+    Returns:
+        tuple: The cards (dict of arrays: key, level, category, last_review), the reviews
+        (dict of arrays: key, time, level, correct) and the list of category names.
+    """
+    if names is None:
+        names = sorted(
+            {
+                os.path.splitext(filename)[0]
+                for filename in os.listdir(save_folder)
+                if filename.endswith(".json")
+                or shards.is_sharded(os.path.join(save_folder, filename))
+            }
+        )
+    category_codes = {}
+    cards = {"key": [], "level": [], "category": [], "last_review": []}
+    reviews = {"key": [], "time": [], "level": [], "correct": []}
+    for number, name in enumerate(names):
+        folder = os.path.join(save_folder, name)
+        if shards.is_sharded(folder):
+            current_box = shards.ShardedBox.open(folder)
+            current_box.ensure_loaded()
+        else:
+            current_box = box.Box.load_from_json(
+                os.path.join(save_folder, f"{name}.json")
+            )
+        count = len(current_box.cards)
+        ids = np.fromiter((card.id for card in current_box.cards), np.int64, count)
+        cards["key"].append((number << 32) | ids)
+        cards["level"].append(
+            np.fromiter((card.level for card in current_box.cards), np.int64, count)
+        )
+        cards["category"].append(
+            np.fromiter(
+                (
+                    category_codes.setdefault(card.category, len(category_codes))
+                    for card in current_box.cards
+                ),
+                np.int64,
+                count,
+            )
+        )
+        cards["last_review"].append(
+            np.fromiter(
+                (
+                    np.nan if card.last_review is None else card.last_review
+                    for card in current_box.cards
+                ),
+                np.float64,
+                count,
+            )
+        )
+        log = load_reviews(os.path.join(save_folder, f"{name}.reviews"))
+        reviews["key"].append((number << 32) | log["card"].astype(np.int64))
+        reviews["time"].append(log["time"])
+        reviews["level"].append(log["level"].astype(np.int64))
+        reviews["correct"].append(log["correct"].astype(np.int64))
+
+    cards = {
+        key: concatenate(arrays, np.float64 if key == "last_review" else np.int64)
+        for key, arrays in cards.items()
+    }
+    reviews = {
+        key: concatenate(arrays, np.float64 if key == "time" else np.int64)
+        for key, arrays in reviews.items()
+    }
+    categories = sorted(category_codes, key=category_codes.get)
+    return cards, reviews, categories
+
+
+def concatenate(arrays, dtype):
+    """
+    Concatenates a list of arrays. Returns an empty array of the given type for an empty list.
+    """
+    if not arrays:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(arrays)
+
+
+# ______Statistics______
+
+
+def levels_after(reviews):
+    """
+    Computes the level of every card after each review, following Card.change_level.
+
+    Args:
+        reviews (dict): The reviews.
+
+    Returns:
+        numpy.ndarray: The levels after the reviews.
+    """
+    return np.where(reviews["correct"] == 1, np.minimum(reviews["level"] + 1, 10), 1)
+
+
+def retention_by_category(cards, reviews, categories):
+    """
+    Computes the share of correct answers per category.
+
+    Args:
+        cards (dict): The cards.
+        reviews (dict): The reviews.
+        categories (list): The category names.
+
+    Returns:
+        dict: Number of reviews and retention rate (None without reviews) by category.
+    """
+    order = np.argsort(cards["key"])
+    sorted_keys = cards["key"][order]
+    positions = np.searchsorted(sorted_keys, reviews["key"])
+    positions = np.minimum(positions, max(len(sorted_keys) - 1, 0))
+    known = (
+        sorted_keys[positions] == reviews["key"]
+        if len(sorted_keys)
+        else np.zeros(len(reviews["key"]), dtype=bool)
+    )
+    review_categories = cards["category"][order][positions[known]]
+    total = np.bincount(review_categories, minlength=len(categories))
+    correct = np.bincount(
+        review_categories, weights=reviews["correct"][known], minlength=len(categories)
+    )
+    return {
+        category: (int(total[i]), float(correct[i] / total[i]) if total[i] else None)
+        for i, category in enumerate(categories)
+    }
+
+
+def transition_matrix(reviews):
+    """
+    Counts how often reviews moved a card from one level to another.
+
+    Args:
+        reviews (dict): The reviews.
+
+    Returns:
+        numpy.ndarray: A 10x10 matrix, rows are the levels before and columns the levels after a review.
+    """
+    before = reviews["level"] - 1
+    after = levels_after(reviews) - 1
+    return np.bincount(before * 10 + after, minlength=100).reshape(10, 10)
+
+
+def time_to_mastery(reviews, mastery_level=10):
+    """
+    Computes for every mastered card the time from its first review until it first reached the mastery level.
+
+    Args:
+        reviews (dict): The reviews.
+        mastery_level (int, optional): The level that counts as mastered. Defaults to 10.
+
+    Returns:
+        numpy.ndarray: The times to mastery in days.
+    """
+    order = np.lexsort((reviews["time"], reviews["key"]))
+    keys = reviews["key"][order]
+    times = reviews["time"][order]
+    mastered = levels_after(reviews)[order] >= mastery_level
+
+    first_keys, first_index = np.unique(keys, return_index=True)
+    mastered_keys, mastered_index = np.unique(keys[mastered], return_index=True)
+    first_times = times[first_index][np.searchsorted(first_keys, mastered_keys)]
+    return (times[mastered][mastered_index] - first_times) / SECONDS_PER_DAY
+
+
+def forecast_review_load(cards, days=30, now=None):
+    """
+    Forecasts how many cards will be due for review on each of the next days.
+    A card is due INTERVAL_DAYS after its last review, depending on its level. Overdue and never reviewed cards are due today.
+
+    Args:
+        cards (dict): The cards.
+        days (int, optional): Number of days to forecast. Defaults to 30.
+        now (float, optional): The current time in seconds since epoch. Defaults to None (now).
+
+    Returns:
+        numpy.ndarray: Number of due cards per day, starting today.
+    """
+    if now is None:
+        now = time.time()
+    due = cards["last_review"] + INTERVAL_DAYS[cards["level"] - 1] * SECONDS_PER_DAY
+    day = np.floor((np.nan_to_num(due, nan=now) - now) / SECONDS_PER_DAY)
+    day = np.maximum(day, 0).astype(np.int64)
+    return np.bincount(day[day < days], minlength=days)
+
+
+# ______Report______
+
+
+def print_report(cards, reviews, categories, days=30):
+    """
+    Prints all statistics.
+    """
+    print(f"CARDS:   {len(cards['key'])}")
+    print(f"REVIEWS: {len(reviews['key'])}")
+
+    print("\nRETENTION BY CATEGORY:\n")
+    for category, (total, rate) in retention_by_category(
+        cards, reviews, categories
+    ).items():
+        rate = "-" if rate is None else f"{rate:.1%}"
+        print(f"  {category}: {rate} OF {total} REVIEWS")
+
+    print("\nLEVEL TRANSITIONS (ROWS: BEFORE, COLUMNS: AFTER):\n")
+    print("         " + " ".join(f"{level:>7}" for level in range(1, 11)))
+    for level, row in enumerate(transition_matrix(reviews), start=1):
+        print(f"  LEVEL {level:02} " + " ".join(f"{count:>7}" for count in row))
+
+    durations = time_to_mastery(reviews)
+    print("\nTIME TO MASTERY:\n")
+    if len(durations):
+        p50, p90 = np.percentile(durations, [50, 90])
+        print(f"  {len(durations)} CARDS MASTERED")
+        print(f"  MEDIAN: {p50:.1f} DAYS, P90: {p90:.1f} DAYS")
+    else:
+        print("  NO CARDS MASTERED YET")
+
+    print(f"\nREVIEW LOAD, NEXT {days} DAYS:\n")
+    for day, count in enumerate(forecast_review_load(cards, days)):
+        print(f"  DAY {day:02}: {count}")
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Learning analytics for FlashLine_ boxes."
+    )
+    parser.add_argument("boxes", nargs="*", help="names of the boxes (default: all)")
+    parser.add_argument(
+        "--data", default="data", help="folder with the JSON save-files"
+    )
+    parser.add_argument(
+        "--days", type=int, default=30, help="days of review load to forecast"
+    )
+    args = parser.parse_args()
+    cards, reviews, categories = load_boxes(args.data, args.boxes or None)
+    print_report(cards, reviews, categories, args.days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import numpy as np
+
+import analytics
+
+"""
+The `bench_analytics.py` script benchmarks `analytics.py` with generated data.
+It simulates many learners with their own boxes and times every statistic on more than a million reviews.
+"""
+
+# ____________________
+
+
+def generate(learners, cards_per_box, reviews_per_card, categories=20, seed=0):
+    """
+    Generates cards and reviews in the layout returned by analytics.load_boxes.
+
+    Returns:
+        tuple: The cards, the reviews and the list of category names.
+    """
+    rng = np.random.default_rng(seed)
+    box_numbers = np.repeat(np.arange(learners, dtype=np.int64), cards_per_box)
+    card_ids = np.tile(np.arange(1, cards_per_box + 1, dtype=np.int64), learners)
+    card_count = len(card_ids)
+    now = time.time()
+    cards = {
+        "key": (box_numbers << 32) | card_ids,
+        "level": rng.integers(1, 11, card_count),
+        "category": rng.integers(0, categories, card_count),
+        "last_review": now - rng.uniform(0, 60, card_count) * analytics.SECONDS_PER_DAY,
+    }
+
+    review_count = card_count * reviews_per_card
+    reviewed = rng.integers(0, card_count, review_count)
+    reviews = {
+        "key": cards["key"][reviewed],
+        "time": now - rng.uniform(0, 365, review_count) * analytics.SECONDS_PER_DAY,
+        "level": rng.integers(1, 11, review_count),
+        "correct": (rng.random(review_count) < 0.7).astype(np.int64),
+    }
+    return cards, reviews, [f"CATEGORY-{i}" for i in range(categories)]
+
+
+def bench(name, function, *args):
+    """
+    Runs a function and prints its duration.
+    """
+    start = time.perf_counter()
+    function(*args)
+    print(f"{name:<24} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark for analytics.py.")
+    parser.add_argument("--learners", type=int, default=1000)
+    parser.add_argument("--cards", type=int, default=500, help="cards per box")
+    parser.add_argument("--reviews", type=int, default=4, help="reviews per card")
+    args = parser.parse_args()
+
+    cards, reviews, categories = generate(args.learners, args.cards, args.reviews)
+    print(f"CARDS:   {len(cards['key'])}")
+    print(f"REVIEWS: {len(reviews['key'])}\n")
+    bench(
+        "retention_by_category",
+        analytics.retention_by_category,
+        cards,
+        reviews,
+        categories,
+    )
+    bench("transition_matrix", analytics.transition_matrix, reviews)
+    bench("time_to_mastery", analytics.time_to_mastery, reviews)
+    bench("forecast_review_load", analytics.forecast_review_load, cards)
+
+
+if __name__ == "__main__":
+    main()
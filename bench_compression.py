@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from box import Box
+
+"""
+The `bench_compression.py` script benchmarks the save formats of `compression.py`.
+It scales the DEMO box to a large number of cards and compares the size, save and load time of every format
+with the original whitespace-padded JSON.
+"""
+
+# ____________________
+
+# Compression method and category column of every format
+FORMATS = [
+    (None, False),
+    (None, True),
+    ("zlib", False),
+    ("gzip", False),
+    ("gzip", True),
+    ("lzma", False),
+    ("lzma", True),
+]
+
+
+def generate(cards, categories=20, demo_path="data/DEMO.json"):
+    """
+    Generates a box by repeating the DEMO cards in several categories. Questions are numbered to keep them unique.
+
+    Returns:
+        Box: The generated box.
+    """
+    demo = Box.load_from_json(demo_path)
+    generated = Box("BENCH")
+    for i in range(categories):
+        generated.add_category(f"{demo.categories[0]} {i}")
+    for i in range(cards):
+        card = demo.cards[i % len(demo.cards)]
+        generated.add_card(
+            f"{card.question} #{i}", card.answer, generated.categories[i % categories]
+        )
+    return generated
+
+
+def bench(function, *args):
+    """
+    Runs a function and returns its duration in milliseconds.
+    """
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark for compression.py.")
+    parser.add_argument("--cards", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    generated = generate(args.cards)
+    print(f"CARDS: {len(generated.cards)}\n")
+    print(f"{'FORMAT':<22} {'SIZE (MB)':>10} {'SAVE (MS)':>10} {'LOAD (MS)':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = os.path.join(folder, "BENCH.json")
+
+        def save_original():
+            with open(file_path, "w") as file:
+                json.dump(generated.to_dict(), file)
+
+        save_time = bench(save_original)
+        load_time = bench(Box.load_from_json, file_path)
+        size = os.path.getsize(file_path) / 1e6
+        print(f"{'original':<22} {size:>10.1f} {save_time:>10.0f} {load_time:>10.0f}")
+
+        for method, category_column in FORMATS:
+            generated.compression = method
+            generated.category_column = category_column
+            save_time = bench(generated.save_to_json, folder)
+            load_time = bench(Box.load_from_json, file_path)
+            size = os.path.getsize(file_path) / 1e6
+            name = f"{method or 'compact'}{' + column' if category_column else ''}"
+            print(f"{name:<22} {size:>10.1f} {save_time:>10.0f} {load_time:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
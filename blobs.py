@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import os
+import time
+
+import box
+import compression
+import shards
+import snapshots
+
+"""
+The `blobs.py` script stores attachments of flashcards, like images and pronunciation audio, outside of the save files.
+Every attachment is a blob in a content-addressed store: the file is named by the SHA-256 hash of its content,
+so the same file attached to many cards or boxes is stored once. Cards only hold references (`Card.attachments`),
+which keeps save files small, and a blob is only read when its card is shown.
+Blobs that no box refers to anymore are removed by garbage collection (`BlobStore.collect`).
+
+The store lives in 'data/blobs', next to the save files of all boxes:
+    data/blobs/ab/abcdef...    a blob, in a folder named by the first two characters of its hash
+
+Run it as a command:
+    python blobs.py attach BOX CARD_ID FILE    attach a file to a flashcard and save the box
+    python blobs.py gc                         remove blobs no box refers to
+"""
+
+# ____________________
+
+# Blobs younger than this are never collected, they may belong to a box that was not saved yet
+GRACE_SECONDS = 3600
+
+
+class BlobStore:
+    """
+    A content-addressed store of blobs in a folder.
+
+    Attributes:
+        folder (str): The folder of the store.
+    """
+
+    def __init__(self, folder=os.path.join("data", "blobs")):
+        """
+        Initializes a blob store. The folder is created when the first blob is stored.
+
+        Args:
+            folder (str, optional): The folder of the store. Defaults to 'data/blobs'.
+        """
+        self.folder = folder
+
+    def path(self, blob):
+        """
+        Returns the path of a blob.
+
+        Args:
+            blob (str): The hash of the blob.
+
+        Returns:
+            str: The path of the blob file.
+        """
+        return os.path.join(self.folder, blob[:2], blob)
+
+    def put(self, data):
+        """
+        Stores a blob. If the same content is stored already, only its modification time is renewed,
+        so garbage collection treats it as new again (see collect).
+        The file is written to a temporary file first, so a crash never leaves a damaged blob.
+
+        Args:
+            data (bytes): The content.
+
+        Returns:
+            str: The hash of the blob, used as its reference.
+        """
+        blob = hashlib.sha256(data).hexdigest()
+        file_path = self.path(blob)
+        try:
+            os.utime(file_path)
+            return blob
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temporary_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, file_path)
+        return blob
+
+    def put_file(self, file_path):
+        """
+        Stores the content of a file as a blob.
+
+        Args:
+            file_path (str): The path of the file.
+
+        Returns:
+            str: The hash of the blob.
+        """
+        with open(file_path, "rb") as file:
+            return self.put(file.read())
+
+    def get(self, blob):
+        """
+        Reads a blob.
+
+        Args:
+            blob (str): The hash of the blob.
+
+        Returns:
+            bytes: The content.
+
+        Raises:
+            FileNotFoundError: If the blob is not in the store.
+        """
+        with open(self.path(blob), "rb") as file:
+            return file.read()
+
+    def size(self, blob):
+        """
+        Returns the size of a blob in bytes, None if it is not in the store.
+        """
+        try:
+            return os.path.getsize(self.path(blob))
+        except FileNotFoundError:
+            return None
+
+    def blobs(self):
+        """
+        Lists the hashes of all blobs in the store.
+
+        Returns:
+            list: The hashes.
+        """
+        if not os.path.isdir(self.folder):
+            return []
+        return [
+            filename
+            for prefix in sorted(os.listdir(self.folder))
+            if os.path.isdir(os.path.join(self.folder, prefix))
+            for filename in sorted(os.listdir(os.path.join(self.folder, prefix)))
+            if not filename.endswith(".tmp")
+        ]
+
+    def collect(self, referenced, grace_seconds=GRACE_SECONDS):
+        """
+        Removes all blobs that are not referenced. Blobs younger than the grace period are kept.
+
+        Args:
+            referenced (set): The hashes of all referenced blobs.
+            grace_seconds (float, optional): Minimum age of a removed blob. Defaults to GRACE_SECONDS.
+
+        Returns:
+            int: The number of blobs removed.
+        """
+        removed = 0
+        now = time.time()
+        for blob in self.blobs():
+            if blob in referenced:
+                continue
+            file_path = self.path(blob)
+            if now - os.path.getmtime(file_path) < grace_seconds:
+                continue
+            os.remove(file_path)
+            removed += 1
+        return removed
+
+
+# ______Boxes______
+
+
+def attach_file(current_box, card_id, file_path, store):
+    """
+    Stores a file and attaches it to a flashcard. The box must be saved afterwards.
+
+    Args:
+        current_box (Box): The box.
+        card_id (int): The ID of the flashcard.
+        file_path (str): The path of the file.
+        store (BlobStore): The blob store.
+
+    Returns:
+        str: The hash of the blob.
+    """
+    blob = store.put_file(file_path)
+    current_box.add_attachment(card_id, os.path.basename(file_path), blob)
+    return blob
+
+
+def referenced_blobs(save_folder="data"):
+    """
+    Collects the hashes of all blobs referenced by the boxes in a save folder, sharded boxes and snapshots included.
+
+    Args:
+        save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+
+    Returns:
+        set: The hashes.
+    """
+    referenced = set()
+    for filename in os.listdir(save_folder):
+        file_path = os.path.join(save_folder, filename)
+        if shards.is_sharded(file_path):
+            current_box = shards.ShardedBox.open(file_path)
+            current_box.ensure_loaded()
+        elif not filename.endswith(".json") or not os.path.isfile(file_path):
+            continue
+        elif compression.detect_file(file_path) is None:
+            continue
+        else:
+            current_box = box.Box.load_from_json(file_path)
+        for card in current_box.cards:
+            referenced.update(attachment["blob"] for attachment in card.attachments)
+    for filename in os.listdir(save_folder):
+        if filename.endswith(".snapshots"):
+            name = filename[: -len(".snapshots")]
+            referenced |= snapshots.SnapshotStore(name, save_folder).referenced_blobs()
+    return referenced
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attachments of FlashLine_ cards.")
+    parser.add_argument("--data", default="data", help="folder with the save-files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    attach_parser = commands.add_parser("attach", help="attach a file to a flashcard")
+    attach_parser.add_argument("box", help="name of the box")
+    attach_parser.add_argument("card_id", type=int, help="ID of the flashcard")
+    attach_parser.add_argument("file", help="the file to attach")
+    commands.add_parser("gc", help="remove blobs no box refers to")
+    args = parser.parse_args()
+
+    store = BlobStore(os.path.join(args.data, "blobs"))
+    if args.command == "attach":
+        current_box = box.Box.load_from_json(
+            os.path.join(args.data, f"{args.box}.json")
+        )
+        blob = attach_file(current_box, args.card_id, args.file, store)
+        current_box.save_to_json(args.data)
+        print(f"FILE ATTACHED AS {blob}")
+    elif args.command == "gc":
+        removed = store.collect(referenced_blobs(args.data))
+        print(f"{removed} UNREFERENCED BLOBS REMOVED")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,78 @@
+import bisect
 import json
 import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+import compression
+import metrics
+import schema
 
 """
 The `box.py` script is a core part of the application, which enables users to create and manage flashcards.
 It defines two main classes, called `Box` and `Card`.
+It also provides a reader-writer lock, called `RWLock`, that makes a box safe to share between threads.
 """
 
 # ____________________
 
 
+class RWLock:
+    """
+    A reader-writer lock. Any number of readers can hold the lock at the same time, writers get exclusive access.
+    Waiting writers are preferred, so a steady stream of readers can not starve them. The lock is not reentrant.
+    """
+
+    def __init__(self):
+        """
+        Initializes a new, unlocked reader-writer lock.
+        """
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writers_waiting = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self):
+        """
+        Context manager holding the lock for reading.
+        """
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """
+        Context manager holding the lock for writing.
+        """
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+# ____________________
+
+
 class Box:
     """
     Represents a flashcard box with flashcards in different levels and categories.
@@ -18,6 +82,19 @@ class Box:
         categories (list): A list of all categories for flashcards in the box. Dynamic.
         levels (list): A list of all levels for flashcards in the box. Does not represent difficulty but progress. Static.
         cards (list): A list of all flashcards/instances of Card in the box. Dynamic.
+        lock (RWLock): Guards categories and cards. Held for reading by queries and for writing by changes.
+        questions (dict): Index of all flashcards by question. Questions are unique within a box.
+        ids (dict): Index of all flashcards by their ID.
+        next_id (int): The ID for the next new flashcard. IDs are never reused.
+        category_cards (dict): Index of all flashcards by category. Each list is kept sorted by question.
+        level_cards (dict): Index of all flashcards by level, as dictionaries of IDs and flashcards.
+        level_lock (Lock): Guards level_cards while levels change under the read lock.
+        listings (dict): Cached question and ID listings by category. Dropped when a category changes.
+        reviews (list): Reviews since the last save, as tuples of time, card ID, level before the review and result.
+        compression (str): How the save file is compressed (see compression.py). None for plain JSON.
+        category_column (bool): Whether the save file stores the categories as a column (see schema.py).
+        changed_cards (set): IDs of the flashcards added, changed or deleted since the last snapshot (see snapshots.py).
+        snapshot_base (tuple): Folder, version and card records of the last snapshot, None if none was taken.
     """
 
     def __init__(self, name):
@@ -31,9 +108,23 @@ class Box:
         self.categories = []
         self.levels = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
         self.cards = []
+        self.lock = RWLock()
+        self.questions = {}
+        self.ids = {}
+        self.next_id = 1
+        self.category_cards = {}
+        self.level_cards = {level: {} for level in self.levels}
+        self.level_lock = threading.Lock()
+        self.listings = {}
+        self.reviews = []
+        self.compression = None
+        self.category_column = False
+        self.changed_cards = set()
+        self.snapshot_base = None
 
     # methods related to saving/loading a box__________
 
+    @metrics.timed("box_to_dict_seconds")
     def to_dict(self):
         """
         Convert the box and its conten to a dictionary. Used for saving the box as JSON.
@@ -41,57 +132,134 @@ class Box:
         Returns:
             dict: A dictionary representing the box.
         """
-        return {
-            "name": self.name,
-            "categories": self.categories,
-            "cards": [card.to_dict() for card in self.cards],
-        }
+        with self.lock.read():
+            return {
+                "version": schema.SCHEMA_VERSION,
+                "name": self.name,
+                "categories": list(self.categories),
+                "next_id": self.next_id,
+                "cards": [card.to_dict() for card in self.cards],
+            }
 
     @classmethod
+    @metrics.timed("box_from_dict_seconds")
     def from_dict(cls, data):
         """
-        Creates a Box object from a dictionary.
+        Creates a Box object from a dictionary in the current schema version.
+        Older save files are migrated by schema.load first, which gives every flashcard a unique ID.
 
         Args:
             data (dict): A dictionary representing a box.
 
         Returns:
             Box: A Box object created from the dictionary.
+
+        Raises:
+            ValueError: If a flashcard has no ID or shares it with another one.
         """
         name = data["name"]
         categories = data["categories"]
         cards = [Card.from_dict(card_data) for card_data in data["cards"]]
         box = cls(name)
-        box.categories = categories
+        box.categories = sorted(categories)
         box.cards = cards
+        box.ids = {card.id: card for card in cards}
+        if None in box.ids or len(box.ids) != len(cards):
+            raise ValueError("flashcard IDs are missing or not unique")
+        box.next_id = max([data.get("next_id", 1)] + [card.id + 1 for card in cards])
+        box.rebuild_indexes()
         return box
 
-    def save_to_json(self, save_folder="data"):
+    @metrics.timed("box_save_seconds")
+    def save_to_json(self, save_folder="data", file_path=None):
         """
-        Saves the box to a JSON file.
+        Saves the box to a JSON file, compressed and with a category column if the box is set up so.
+        The file keeps the name '<name>.json' either way, loading detects the compression by its magic bytes.
+        Reviews since the last save are appended to the review log of the box (see save_reviews).
 
         Args:
             save_folder (str): Folder in root to save the JSON file to. By default 'data'.
+            file_path (str, optional): Path of the JSON file, e.g. a copy with another name.
+                Defaults to None ('<name>.json' in the save folder).
         """
         data = self.to_dict()
-        file_path = os.path.join(save_folder, f"{self.name}.json")
-        with open(file_path, "w") as file:
-            json.dump(data, file)
+        if self.category_column:
+            schema.encode_categories(data)
+        content = compression.compress(
+            json.dumps(data, separators=(",", ":")).encode(), self.compression
+        )
+        if file_path is None:
+            file_path = os.path.join(save_folder, f"{self.name}.json")
+        with open(file_path, "wb") as file:
+            file.write(content)
+        if metrics.enabled:
+            metrics.count("box_save_bytes_total", len(content))
+        self.save_reviews(save_folder)
+
+    def save_reviews(self, save_folder="data"):
+        """
+        Appends the reviews since the last save to the review log '<name>.reviews' in the save folder.
+        Every review is a fixed-size binary record (see REVIEW_RECORD), so the log can be read directly into arrays.
+
+        Args:
+            save_folder (str): Folder in root to save the review log to. By default 'data'.
+        """
+        with self.lock.write():
+            reviews, self.reviews = self.reviews, []
+        if reviews:
+            file_path = os.path.join(save_folder, f"{self.name}.reviews")
+            with open(file_path, "ab") as file:
+                file.write(b"".join(REVIEW_RECORD.pack(*review) for review in reviews))
+
+    def ensure_loaded(self, categories=None):
+        """
+        Makes sure the flashcards of categories are in box.cards and the indexes. A box loaded from one file holds all of them,
+        so this does nothing. Sharded boxes load their categories on demand (see shards.py).
+
+        Args:
+            categories (iterable, optional): The categories needed. Defaults to None (all categories).
+        """
+
+    def mark_changed(self, card):
+        """
+        Called with the lock held whenever a flashcard is added, edited, deleted or changes its level
+        (for reading by change_level, for writing by all other changes).
+        Remembers the ID of the flashcard, so the next snapshot only compares changed flashcards (see snapshots.py).
+        Sharded boxes also mark the category for their next save (see shards.py).
+
+        Args:
+            card (Card): The changed flashcard.
+        """
+        self.changed_cards.add(card.id)
 
     @classmethod
+    @metrics.timed("box_load_seconds")
     def load_from_json(cls, file_path):
         """
-        Load a box from a JSON file.
+        Load a box from a JSON file, plain or compressed (see compression.py).
+        Files in an older schema version are migrated, every file is validated (see schema.py).
+        The box keeps the compression and category column of the file for its next save.
 
         Args:
             file_path (str): The path to the JSON file.
 
         Returns:
             Box: The Box object loaded from the JSON file.
-        """
-        with open(file_path, "r") as file:
-            data = json.load(file)
-            return cls.from_dict(data)
+
+        Raises:
+            ValueError: If the file is damaged or its version unknown (schema.SchemaError for invalid content).
+        """
+        with open(file_path, "rb") as file:
+            content = file.read()
+        if metrics.enabled:
+            metrics.count("box_load_bytes_total", len(content))
+        content, method = compression.decompress(content)
+        data = json.loads(content)
+        category_column = isinstance(data, dict) and "category_table" in data
+        box = cls.from_dict(schema.load(data))
+        box.compression = method
+        box.category_column = category_column
+        return box
 
     # methods related to the 'categories' attribute__________
 
@@ -105,21 +273,22 @@ class Box:
         Returns:
             bool: True if the category exists, otherwise False.
         """
-        if category in self.categories:
-            return True
-        else:
-            return False
+        with self.lock.read():
+            if category in self.categories:
+                return True
+            else:
+                return False
 
     def add_category(self, category):
         """
         Adds a category to box.categories.
-        Sorts box.categories alphabetically
+        Inserts at the alphabetical position, so box.categories stays sorted.
 
         Args:
             category (str): The category to add.
         """
-        self.categories.append(category)
-        self.categories.sort()
+        with self.lock.write():
+            bisect.insort(self.categories, category)
 
     def delete_category(self, category):
         """
@@ -128,20 +297,159 @@ class Box:
         Args:
             category (str): The category to delete.
         """
-        self.categories.remove(category)
+        with self.lock.write():
+            self.categories.remove(category)
+
+    # methods related to the indexes of the 'cards' attribute__________
+
+    def rebuild_indexes(self):
+        """
+        Rebuilds the question, category and level indexes from box.cards. Caller must hold the lock for writing.
+        """
+        self.questions = {}
+        self.category_cards = {}
+        self.level_cards = {level: {} for level in self.levels}
+        for card in self.cards:
+            self.questions.setdefault(card.question, card)
+            self.category_cards.setdefault(card.category, []).append(card)
+            self.level_cards[card.level][card.id] = card
+        for cards in self.category_cards.values():
+            cards.sort(key=question_key)
+        self.listings = {}
+
+    def index_card(self, card):
+        """
+        Adds a flashcard to the question, category and level indexes. Caller must hold the lock for writing.
+
+        Args:
+            card (Card): The flashcard to add.
+        """
+        self.questions[card.question] = card
+        bisect.insort(
+            self.category_cards.setdefault(card.category, []), card, key=question_key
+        )
+        self.level_cards[card.level][card.id] = card
+        self.listings.pop(card.category, None)
+
+    def unindex_card(self, card):
+        """
+        Removes a flashcard from the question, category and level indexes. Caller must hold the lock for writing.
+
+        Args:
+            card (Card): The flashcard to remove.
+        """
+        if self.questions.get(card.question) is card:
+            del self.questions[card.question]
+        cards = self.category_cards[card.category]
+        index = bisect.bisect_left(cards, card.question, key=question_key)
+        # cards of a damaged file can share a question (see rebuild_indexes), remove this one and not its twin
+        while cards[index] is not card:
+            index += 1
+        del cards[index]
+        for cards in self.level_cards.values():
+            cards.pop(card.id, None)
+        self.listings.pop(card.category, None)
+
+    def reindex_level(self, card):
+        """
+        Moves a flashcard to its current level in the level index. Caller must hold the lock for reading or writing.
+        The card is looked up in every level, so concurrent changes of the same card always end in its latest level.
+        A card that is no longer in the box (deleted or removed by a merge, see sync.merge_delta) is not added again.
+
+        Args:
+            card (Card): The flashcard whose level changed.
+        """
+        with self.level_lock:
+            for cards in self.level_cards.values():
+                if cards.get(card.id) is card:
+                    del cards[card.id]
+            if self.ids.get(card.id) is card:
+                self.level_cards[card.level][card.id] = card
+
+    def listing(self, category):
+        """
+        Returns the cached listing of a category. Creates it if the category changed since the last call.
+
+        Args:
+            category (str): The category to list.
+
+        Returns:
+            tuple: The questions and the IDs of all flashcards in the category, sorted by question.
+        """
+        cached = self.listings.get(category)
+        if cached is None:
+            with self.lock.read():
+                cards = self.category_cards.get(category, [])
+                cached = (
+                    [card.question for card in cards],
+                    [card.id for card in cards],
+                )
+                self.listings[category] = cached
+            if metrics.enabled:
+                metrics.count("cards_touched_total", len(cards), query="listing")
+        return cached
 
     # methods related to the 'cards' attribute__________
 
-    def print_card(self, question):
+    def check_card(self, question):
         """
-        Prints the details of a flashcard.
+        Checks if a flashcard with a question exists in box.cards.
+
+        Args:
+            question (str): The question to check.
+
+        Returns:
+            bool: True if the flashcard exists, otherwise False.
+        """
+        return question in self.questions
+
+    def get_card(self, card_id):
+        """
+        Returns the flashcard with an ID.
+
+        Args:
+            card_id (int): The ID of the flashcard.
+
+        Returns:
+            Card: The flashcard, or None if there is no flashcard with this ID.
+        """
+        return self.ids.get(card_id)
+
+    def find_card(self, question):
+        """
+        Returns the flashcard with a question.
 
         Args:
             question (str): The question of the flashcard.
+
+        Returns:
+            Card: The flashcard, or None if there is no flashcard with this question.
         """
-        for card in self.cards:
-            if card.question == question:
-                card.print()
+        return self.questions.get(question)
+
+    def get_question(self, card_id):
+        """
+        Returns the question of the flashcard with an ID. Used to display flashcards selected by ID.
+
+        Args:
+            card_id (int): The ID of the flashcard.
+
+        Returns:
+            str: The question of the flashcard.
+        """
+        return self.ids[card_id].question
+
+    def print_card(self, card_id, file=None):
+        """
+        Prints the details of a flashcard.
+
+        Args:
+            card_id (int): The ID of the flashcard.
+            file (file, optional): File to print to. Defaults to None (the standard output).
+        """
+        card = self.get_card(card_id)
+        if card is not None:
+            card.print(file)
 
     def add_card(self, question, answer, category):
         """
@@ -151,25 +459,295 @@ class Box:
             question (str): The question for the new flashcard.
             answer (str): The answer to the question.
             category (str): The category for the new flashcard.
+
+        Returns:
+            Card: The new flashcard.
+
+        Raises:
+            ValueError: If a flashcard with the same question already exists.
+        """
+        with self.lock.write():
+            if question in self.questions:
+                raise ValueError(f"flashcard '{question}' already exists")
+            card = Card(question, answer, category, card_id=self.next_id)
+            self.next_id += 1
+            self.ids[card.id] = card
+            self.cards.append(card)
+            self.index_card(card)
+            self.mark_changed(card)
+        return card
+
+    def edit_card(self, card_id, question=None, answer=None):
+        """
+        Changes the question and/or answer of a flashcard. The flashcard keeps its ID and level.
+
+        Args:
+            card_id (int): The ID of the flashcard.
+            question (str, optional): The new question. Unchanged if None.
+            answer (str, optional): The new answer. Unchanged if None.
+
+        Raises:
+            ValueError: If another flashcard already has the new question.
+        """
+        with self.lock.write():
+            card = self.ids[card_id]
+            if question is not None and question != card.question:
+                if question in self.questions:
+                    raise ValueError(f"flashcard '{question}' already exists")
+                self.unindex_card(card)
+                card.question = question
+                self.index_card(card)
+            if answer is not None:
+                card.answer = answer
+            self.mark_changed(card)
+
+    def add_attachment(self, card_id, name, blob):
+        """
+        Attaches a stored blob to a flashcard. A blob is attached at most once per flashcard.
+
+        Args:
+            card_id (int): The ID of the flashcard.
+            name (str): The file name of the attachment.
+            blob (str): The hash of the blob (see blobs.py).
         """
-        card = Card(question, answer, category)
-        self.cards.append(card)
+        with self.lock.write():
+            card = self.ids[card_id]
+            if all(attachment["blob"] != blob for attachment in card.attachments):
+                card.attachments.append({"name": name, "blob": blob})
+                self.mark_changed(card)
 
-    def delete_card(self, question):
+    def remove_attachment(self, card_id, blob):
+        """
+        Removes an attachment from a flashcard. The blob stays in the store until it is collected.
+
+        Args:
+            card_id (int): The ID of the flashcard.
+            blob (str): The hash of the blob.
+        """
+        with self.lock.write():
+            card = self.ids[card_id]
+            card.attachments = [
+                attachment
+                for attachment in card.attachments
+                if attachment["blob"] != blob
+            ]
+            self.mark_changed(card)
+
+    def delete_card(self, card_id):
         """
         Deletes a flashcard from box.cards.
 
         Args:
-            question (str): The question of the flashcard.
+            card_id (int): The ID of the flashcard.
         """
-        for card in self.cards:
-            if card.question == question:
+        with self.lock.write():
+            card = self.ids.pop(card_id, None)
+            if card is not None:
+                self.unindex_card(card)
                 self.cards.remove(card)
+                self.mark_changed(card)
+
+    def delete_cards(self, card_ids):
+        """
+        Deletes several flashcards from box.cards in a single pass.
+
+        Args:
+            card_ids (iterable): The IDs of the flashcards.
+
+        Returns:
+            int: The number of flashcards deleted.
+        """
+        with self.lock.write():
+            removed = set()
+            for card_id in card_ids:
+                card = self.ids.pop(card_id, None)
+                if card is not None:
+                    self.unindex_card(card)
+                    self.mark_changed(card)
+                    removed.add(card_id)
+            if removed:
+                self.cards[:] = [card for card in self.cards if card.id not in removed]
+        return len(removed)
+
+    def delete_cards_in_category(self, category):
+        """
+        Deletes all flashcards in a specific category from box.cards.
+
+        Args:
+            category (str): The category of the flashcards to delete.
+        """
+        with self.lock.write():
+            for card in self.category_cards.get(category, []):
+                self.mark_changed(card)
+            self.cards[:] = [card for card in self.cards if card.category != category]
+            self.ids = {card.id: card for card in self.cards}
+            self.rebuild_indexes()
+
+    @metrics.timed("box_dedupe_seconds")
+    def dedupe(self, keep="max"):
+        """
+        Merges exact duplicates (same question, answer, category and attachments) into one in a single pass over box.cards.
+        The first flashcard is kept and gets the highest or lowest level of all its duplicates.
+        Flashcards that share a question but differ otherwise are left in place, see list_conflicts.
+
+        Args:
+            keep (str, optional): 'max' to keep the highest level, 'min' to keep the lowest. Defaults to 'max'.
+
+        Returns:
+            int: The number of removed duplicates.
+        """
+        if keep not in ("max", "min"):
+            raise ValueError("keep must be 'max' or 'min'")
+        if metrics.enabled:
+            metrics.count("cards_touched_total", len(self.cards), query="dedupe")
+        with self.lock.write():
+            contents = {}
+            cards = []
+            for card in self.cards:
+                content = (
+                    card.question,
+                    card.answer,
+                    card.category,
+                    tuple((item["name"], item["blob"]) for item in card.attachments),
+                )
+                kept = contents.get(content)
+                if kept is None:
+                    contents[content] = card
+                    cards.append(card)
+                    continue
+                level = kept.level
+                if keep == "max":
+                    kept.level = max(kept.level, card.level)
+                else:
+                    kept.level = min(kept.level, card.level)
+                if kept.level != level:
+                    self.mark_changed(kept)
+                self.mark_changed(card)
+            removed = len(self.cards) - len(cards)
+            if removed:
+                self.cards[:] = cards
+                self.ids = {card.id: card for card in cards}
+                self.rebuild_indexes()
+        return removed
+
+    def list_conflicts(self):
+        """
+        Lists the questions held by more than one flashcard. After dedupe, these flashcards differ in their answer,
+        category or attachments and are left for the user to resolve.
+
+        Returns:
+            list: The questions, sorted.
+        """
+        with self.lock.read():
+            if len(self.questions) == len(self.cards):
+                return []
+            seen = set()
+            conflicts = set()
+            for card in self.cards:
+                if card.question in seen:
+                    conflicts.add(card.question)
+                seen.add(card.question)
+        return sorted(conflicts)
+
+    def change_level(self, card, result):
+        """
+        Changes the level of a flashcard in the box. Safe to call from several threads at once.
+
+        Args:
+            card (Card): The flashcard that was learned.
+            result (bool): Based on correct or incorrect answers when learning a flashcard.
+        """
+        with self.lock.read():
+            level = card.change_level(result)
+            self.reindex_level(card)
+            self.mark_changed(card)
+            self.reviews.append((card.last_review, card.id, level, result))
+
+    def update_levels(self, compute, category=None, level=None):
+        """
+        Changes the levels of all flashcards in a category and/or level in one pass.
+        The flashcards are taken from the category or level index and moved between the level buckets in place.
+        Bulk changes are no reviews, so failures, the time of the last review and the review log stay untouched.
+
+        Args:
+            compute (function): Returns the new level for the current level. The result is clamped to levels 1 to 10.
+            category (str, optional): Only change flashcards in this category. Defaults to None (all categories).
+            level (int, optional): Only change flashcards in this level. Defaults to None (all levels).
+
+        Returns:
+            int: The number of flashcards whose level changed.
+        """
+        changed = 0
+        with self.lock.write(), self.level_lock:
+            if category is not None:
+                cards = self.category_cards.get(category, [])
+                if level is not None:
+                    cards = [card for card in cards if card.level == level]
+            elif level is not None:
+                cards = list(self.level_cards[level].values())
+            else:
+                cards = self.cards
+            for card in cards:
+                new_level = min(
+                    max(compute(card.level), self.levels[0]), self.levels[-1]
+                )
+                if new_level != card.level:
+                    del self.level_cards[card.level][card.id]
+                    card.level = new_level
+                    self.level_cards[new_level][card.id] = card
+                    self.mark_changed(card)
+                    changed += 1
+        if metrics.enabled:
+            metrics.count("cards_touched_total", len(cards), query="update_levels")
+        return changed
+
+    def set_levels(self, new_level, category=None, level=None):
+        """
+        Sets the level of all flashcards in a category and/or level (see update_levels).
+
+        Args:
+            new_level (int): The new level.
+            category (str, optional): Only change flashcards in this category. Defaults to None (all categories).
+            level (int, optional): Only change flashcards in this level. Defaults to None (all levels).
+
+        Returns:
+            int: The number of flashcards whose level changed.
+
+        Raises:
+            ValueError: If the new level is not between 1 and 10.
+        """
+        if new_level not in self.levels:
+            raise ValueError(f"level must be between 1 and 10, not {new_level}")
+        return self.update_levels(lambda _: new_level, category, level)
+
+    def reset_levels(self, category=None, level=None):
+        """
+        Moves all flashcards in a category and/or level back to level 1 (see update_levels).
+
+        Returns:
+            int: The number of flashcards whose level changed.
+        """
+        return self.set_levels(1, category, level)
+
+    def shift_levels(self, steps, category=None, level=None):
+        """
+        Moves all flashcards in a category and/or level up or down by a number of levels (see update_levels).
+        Flashcards do not move below level 1 or above level 10.
+
+        Args:
+            steps (int): Levels to move up, negative to move down.
+            category (str, optional): Only change flashcards in this category. Defaults to None (all categories).
+            level (int, optional): Only change flashcards in this level. Defaults to None (all levels).
+
+        Returns:
+            int: The number of flashcards whose level changed.
+        """
+        return self.update_levels(lambda current: current + steps, category, level)
 
     def list_cards_in_category(self, category):
         """
         Lists the questions of all flashcards in a specific category.
-        Sorts the list alphabetically.
+        Sorts the list alphabetically. The list is cached and must not be modified.
 
         Args:
             category (str): The category of the flashcards to list.
@@ -177,15 +755,25 @@ class Box:
         Returns:
             list: List of all Card objects questions in the category.
         """
-        cards_in_category = [
-            card.question for card in self.cards if card.category == category
-        ]
-        cards_in_category.sort()
-        return cards_in_category
+        return self.listing(category)[0]
+
+    def list_card_ids_in_category(self, category):
+        """
+        Lists the IDs of all flashcards in a specific category.
+        Sorts the list alphabetically by question. The list is cached and must not be modified.
 
+        Args:
+            category (str): The category of the flashcards to list.
+
+        Returns:
+            list: List of all Card objects IDs in the category.
+        """
+        return self.listing(category)[1]
+
+    @metrics.timed("box_list_category_seconds")
     def list_card_obj_in_category(self, category):
         """
-        Lists all Card objects in a specific category.
+        Lists all Card objects in a specific category, sorted by question.
 
         Args:
             category (str): The category of the flashcards to list.
@@ -193,8 +781,13 @@ class Box:
         Returns:
             list: List of all Card objects in the category.
         """
-        return [card for card in self.cards if card.category == category]
+        with self.lock.read():
+            cards = list(self.category_cards.get(category, []))
+        if metrics.enabled:
+            metrics.count("cards_touched_total", len(cards), query="category")
+        return cards
 
+    @metrics.timed("box_list_level_seconds")
     def list_card_obj_in_level(self, level):
         """
         Lists all Card objects in a specific level.
@@ -203,9 +796,13 @@ class Box:
             level (int): The level of the flashcards to list.
 
         Returns:
-            list: List of all Card objects in the level.
+            list: List of all Card objects in the level. Empty for a level that does not exist.
         """
-        return [card for card in self.cards if card.level == level]
+        with self.lock.read(), self.level_lock:
+            cards = list(self.level_cards.get(level, {}).values())
+        if metrics.enabled:
+            metrics.count("cards_touched_total", len(cards), query="level")
+        return cards
 
     def count_cards_level(self, list_cards=None):
         """
@@ -217,18 +814,37 @@ class Box:
         Returns:
             level_count (dict): A dictionary with levels and counts of flashcards.
         """
-        if list_cards is None:
-            list_cards = self.cards
         level_count = {level: 0 for level in self.levels}
-        for card in list_cards:
-            level = card.level
-            level_count[level] += 1
+        with self.lock.read():
+            if list_cards is None:
+                list_cards = self.cards
+            for card in list_cards:
+                level = card.level
+                level_count[level] += 1
+        if metrics.enabled:
+            metrics.count("cards_touched_total", len(list_cards), query="count_level")
         return level_count
 
 
 # ____________________
 
 
+# A review in the review log: time (seconds since epoch), card ID, level before the review, result (0 or 1)
+REVIEW_RECORD = struct.Struct("<dIBB")
+
+
+def question_key(card):
+    """
+    Sort key for flashcards, used to keep the category index sorted by question.
+    """
+    return card.question
+
+
+# Level changes are read-modify-writes. Cards share a small set of locks (picked by object id)
+# instead of holding one lock each, which would be expensive for boxes with millions of cards.
+LEVEL_LOCKS = [threading.Lock() for _ in range(64)]
+
+
 class Card:
     """
     Represents a flashcard in a flashcard box.
@@ -238,9 +854,23 @@ class Card:
         answer (str): The answer to the question.
         category (str): The category to which the flashcard belongs.
         level (int): The level of the box the flashcard is located in.
+        id (int): ID of the flashcard. Unique and stable within its box, assigned by the box.
+        failures (int): How often the flashcard was answered wrong.
+        last_review (float): Time of the last review in seconds since epoch. None if never reviewed.
+        attachments (list): References to attached files, as dictionaries with file name and blob hash (see blobs.py).
     """
 
-    def __init__(self, question, answer, category, level=1):
+    def __init__(
+        self,
+        question,
+        answer,
+        category,
+        level=1,
+        card_id=None,
+        failures=0,
+        last_review=None,
+        attachments=None,
+    ):
         """
         Initializes a new flashcard.
 
@@ -249,27 +879,41 @@ class Card:
             answer (str): The answer to the question.
             category (str): The category to which the flashcard belongs.
             level (int, optional): The level of the box the flashcard is located in. Default at creation is 1.
+            card_id (int, optional): ID of the flashcard. Defaults to None, the box assigns one.
+            failures (int, optional): How often the flashcard was answered wrong. Defaults to 0.
+            last_review (float, optional): Time of the last review. Defaults to None.
+            attachments (list, optional): References to attached files. Defaults to None (no attachments).
         """
         self.question = question
         self.answer = answer
         self.category = category
         self.level = level
+        self.id = card_id
+        self.failures = failures
+        self.last_review = last_review
+        self.attachments = attachments if attachments is not None else []
 
     # methods related to saving/loading cards__________
 
     def to_dict(self):
         """
-        Convert the flashcard to a dictionary for saving as JSON.
+        Convert the flashcard to a dictionary for saving as JSON. Attachments are only included if there are any.
 
         Returns:
             dict: A dictionary that represents the Card object.
         """
-        return {
+        data = {
+            "id": self.id,
             "category": self.category,
             "question": self.question,
             "answer": self.answer,
             "level": self.level,
+            "failures": self.failures,
+            "last_review": self.last_review,
         }
+        if self.attachments:
+            data["attachments"] = [dict(attachment) for attachment in self.attachments]
+        return data
 
     @classmethod
     def from_dict(cls, data):
@@ -286,28 +930,52 @@ class Card:
         answer = data["answer"]
         category = data["category"]
         level = data["level"]
-        card = cls(question, answer, category, level)
+        card_id = data.get("id")
+        failures = data.get("failures", 0)
+        last_review = data.get("last_review")
+        attachments = [dict(attachment) for attachment in data.get("attachments", [])]
+        card = cls(
+            question,
+            answer,
+            category,
+            level,
+            card_id,
+            failures,
+            last_review,
+            attachments,
+        )
         return card
 
     # methods related to manipulating cards attributes__________
 
     def change_level(self, result):
         """
-        Changes the level attribute of a Card object.
+        Changes the level attribute of a Card object and records the time of the review. The update is atomic.
 
         Args:
             result (bool): Based on correct or incorrect answers when learning a flashcard.
+
+        Returns:
+            int: The level before the change.
         """
-        if result == True:
-            if self.level < 10:
-                self.level += 1
-        elif result == False:
-            self.level = 1
+        with LEVEL_LOCKS[id(self) % len(LEVEL_LOCKS)]:
+            level = self.level
+            self.last_review = time.time()
+            if result == True:
+                if self.level < 10:
+                    self.level += 1
+            elif result == False:
+                self.level = 1
+                self.failures += 1
+            return level
 
-    def print(self):
+    def print(self, file=None):
         """
         prints the details of a flashcard. Includes question, answer and level.
+
+        Args:
+            file (file, optional): File to print to. Defaults to None (the standard output).
         """
-        print(f"QUESTION:\n{self.question}")
-        print(f"\nANSWER:\n{self.answer}")
-        print(f"\nLEVEL:\n{self.level}")
+        print(f"QUESTION:\n{self.question}", file=file)
+        print(f"\nANSWER:\n{self.answer}", file=file)
+        print(f"\nLEVEL:\n{self.level}", file=file)
@@ -0,0 +1,144 @@
+import argparse
+import gzip
+import lzma
+import os
+import zlib
+
+"""
+The `compression.py` script reads and writes the bytes of save files, compressed or not.
+The compression of a file is detected by its magic bytes, so compressed save files keep their '.json' name
+and can be loaded without knowing how they were written.
+
+Methods:
+    None: Plain JSON.
+    'gzip': gzip, fast and widely supported.
+    'zlib': zlib, like gzip with a smaller header.
+    'lzma': xz, the smallest files but the slowest saves.
+
+Run it as a command to convert an existing save file:
+    python compression.py data/BOX.json --method lzma --category-column
+"""
+
+# ____________________
+
+METHODS = {
+    "gzip": (gzip.compress, gzip.decompress),
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+# Number of bytes needed to detect every method
+MAGIC_SIZE = 6
+
+GZIP_MAGIC = b"\x1f\x8b"
+LZMA_MAGIC = b"\xfd7zXZ\x00"
+
+
+def detect(head):
+    """
+    Detects how a save file is compressed from its first bytes.
+
+    Args:
+        head (bytes): The first MAGIC_SIZE bytes of the file.
+
+    Returns:
+        str: 'json' for plain JSON, the name of the compression method, or None if the file is no save file.
+    """
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(LZMA_MAGIC):
+        return "lzma"
+    # zlib: deflate with a window of up to 32K, the header is a multiple of 31
+    if len(head) >= 2 and head[0] == 0x78 and (head[0] << 8 | head[1]) % 31 == 0:
+        return "zlib"
+    if head.lstrip().startswith(b"{"):
+        return "json"
+    return None
+
+
+def detect_file(file_path):
+    """
+    Detects how a save file is compressed.
+
+    Args:
+        file_path (str): The path of the file.
+
+    Returns:
+        str: 'json', the name of the compression method, or None if the file is no save file.
+    """
+    with open(file_path, "rb") as file:
+        return detect(file.read(MAGIC_SIZE))
+
+
+def compress(data, method=None):
+    """
+    Compresses the bytes of a save file.
+
+    Args:
+        data (bytes): The plain JSON.
+        method (str, optional): The compression method. Defaults to None (no compression).
+
+    Returns:
+        bytes: The bytes to write.
+
+    Raises:
+        ValueError: If the method is unknown.
+    """
+    if method is None:
+        return data
+    if method not in METHODS:
+        raise ValueError(f"unknown compression method '{method}'")
+    return METHODS[method][0](data)
+
+
+def decompress(data):
+    """
+    Decompresses the bytes of a save file. The method is detected by the magic bytes.
+
+    Args:
+        data (bytes): The bytes read from the file.
+
+    Returns:
+        tuple: The plain JSON and the compression method (None for plain JSON).
+
+    Raises:
+        ValueError: If the data is no save file or can not be decompressed.
+    """
+    method = detect(data[:MAGIC_SIZE])
+    if method is None:
+        raise ValueError("not a save file")
+    if method == "json":
+        return data, None
+    try:
+        return METHODS[method][1](data), method
+    except (OSError, EOFError, lzma.LZMAError, zlib.error) as e:
+        raise ValueError(f"damaged {method} data: {e}") from e
+
+
+# ______Entry point______
+
+
+def main():
+    import box
+
+    parser = argparse.ArgumentParser(description="Compress FlashLine_ save files.")
+    parser.add_argument("box", help="JSON file of the box")
+    parser.add_argument(
+        "--method", choices=sorted(METHODS), help="compression method (default: none)"
+    )
+    parser.add_argument(
+        "--category-column",
+        action="store_true",
+        help="store categories once and refer to them by number",
+    )
+    args = parser.parse_args()
+
+    current_box = box.Box.load_from_json(args.box)
+    current_box.compression = args.method
+    current_box.category_column = args.category_column
+    current_box.save_to_json(os.path.dirname(args.box) or ".")
+    print(f"BOX '{current_box.name}' SAVED WITH {args.method or 'NO'} COMPRESSION")
+
+
+if __name__ == "__main__":
+    main()
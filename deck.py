@@ -0,0 +1,604 @@
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Mapping
+from collections.abc import Sequence
+
+import box
+
+"""
+The `deck.py` script splits a flashcard box into shared content and per-learner progress.
+A deck (`Deck`) holds the immutable content of all cards in a binary file that is memory-mapped,
+so every process reading the same deck shares one copy of it through the operating system's page cache.
+The progress of a learner (`Progress`) is a small overlay with one level byte per card, keyed by card index,
+plus failures and the time of the last review.
+`DeckBox` composes both into a regular `Box`, so learning, progress and saving work as usual.
+A progress file '<name>.progress' in a save folder is listed and loaded as box '<name>' by the application
+and the server, with the deck in the same folder whose fingerprint it carries (see find_deck).
+The question and category indexes of a deck box are sorted arrays in the deck file, searched in place,
+so opening a deck decodes no question and every process shares the indexes too.
+
+Run it as a command:
+    python deck.py build BOX DECK             build a deck from a box
+    python deck.py progress DECK PROGRESS     create an empty progress overlay for a learner
+"""
+
+# ____________________
+
+DECK_MAGIC = b"FLDECK2\0"
+PROGRESS_MAGIC = b"FLPROG1\0"
+
+# Deck header: magic, number of cards, number of categories, fingerprint
+DECK_HEADER = struct.Struct("<8sII8s")
+# Progress header: magic, fingerprint of the deck
+PROGRESS_HEADER = struct.Struct("<8s8s")
+
+
+def build_deck(source_box, file_path):
+    """
+    Writes the content of a box as a deck file.
+
+    Layout after the header: category index per card (u4), card ID per card (u4),
+    string offsets (u8), the indexes (see below) and the UTF-8 string data.
+    Strings are the categories, empty ones included, followed by question and answer of every card.
+    The indexes are card indexes sorted by category and question (u4), the position of the first card of every category
+    in that order plus the number of cards (u4), and card indexes sorted by question (u4).
+
+    Args:
+        source_box (Box): The box to take the content from.
+        file_path (str): Path of the deck file.
+    """
+    categories = sorted(
+        set(source_box.categories) | {card.category for card in source_box.cards}
+    )
+    category_index = {category: i for i, category in enumerate(categories)}
+    card_categories = array(
+        "I", (category_index[card.category] for card in source_box.cards)
+    )
+    ids = array("I", (card.id for card in source_box.cards))
+
+    strings = list(categories)
+    for card in source_box.cards:
+        strings.append(card.question)
+        strings.append(card.answer)
+    encoded = [string.encode() for string in strings]
+    offsets = array("Q", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+
+    cards = source_box.cards
+    order = array(
+        "I",
+        sorted(
+            range(len(cards)),
+            key=lambda i: (card_categories[i], cards[i].question),
+        ),
+    )
+    category_starts = array("I", [0] * (len(categories) + 1))
+    for i in card_categories:
+        category_starts[i + 1] += 1
+    for i in range(len(categories)):
+        category_starts[i + 1] += category_starts[i]
+    by_question = array("I", sorted(range(len(cards)), key=lambda i: cards[i].question))
+
+    body = card_categories.tobytes() + ids.tobytes() + offsets.tobytes()
+    body += order.tobytes() + category_starts.tobytes() + by_question.tobytes()
+    data = b"".join(encoded)
+    fingerprint = hashlib.blake2b(body + data, digest_size=8).digest()
+    with open(file_path, "wb") as file:
+        file.write(DECK_HEADER.pack(DECK_MAGIC, len(ids), len(categories), fingerprint))
+        file.write(body)
+        file.write(data)
+
+
+def read_header(file_path, header):
+    """
+    Reads the header of a deck or progress file.
+
+    Returns:
+        tuple: The fields of the header, None if the file is too short.
+    """
+    with open(file_path, "rb") as file:
+        data = file.read(header.size)
+    if len(data) < header.size:
+        return None
+    return header.unpack(data)
+
+
+def is_progress(file_path):
+    """
+    Checks if a path is a progress file '<name>.progress'.
+    """
+    if not file_path.endswith(".progress") or not os.path.isfile(file_path):
+        return False
+    fields = read_header(file_path, PROGRESS_HEADER)
+    return fields is not None and fields[0] == PROGRESS_MAGIC
+
+
+def find_deck(progress_path):
+    """
+    Finds the deck of a progress file among the decks ('*.deck') in its folder by the fingerprint in both headers.
+
+    Args:
+        progress_path (str): Path of the progress file.
+
+    Returns:
+        str: Path of the deck file, None if no deck in the folder matches.
+    """
+    fields = read_header(progress_path, PROGRESS_HEADER)
+    if fields is None or fields[0] != PROGRESS_MAGIC:
+        return None
+    folder = os.path.dirname(progress_path)
+    for filename in sorted(os.listdir(folder or ".")):
+        deck_path = os.path.join(folder, filename)
+        if not filename.endswith(".deck") or not os.path.isfile(deck_path):
+            continue
+        deck_fields = read_header(deck_path, DECK_HEADER)
+        if deck_fields is not None and deck_fields[0] == DECK_MAGIC:
+            if deck_fields[3] == fields[1]:
+                return deck_path
+    return None
+
+
+# ____________________
+
+
+class Deck:
+    """
+    The shared, read-only content of a deck, memory-mapped from its file. Strings are decoded on access.
+
+    Attributes:
+        count (int): Number of cards.
+        fingerprint (bytes): Identifies the content, used to match progress overlays.
+        categories (list): All categories, sorted.
+        card_categories (memoryview): Category index of every card.
+        ids (memoryview): ID of every card.
+        offsets (memoryview): Start and end of every string in the string data.
+        order (memoryview): Card indexes sorted by category and question.
+        category_starts (memoryview): Position of the first card of every category in order.
+        by_question (memoryview): Card indexes sorted by question.
+    """
+
+    def __init__(self, file_path):
+        """
+        Opens a deck file.
+
+        Args:
+            file_path (str): Path of the deck file.
+        """
+        with open(file_path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, category_count, self.fingerprint = DECK_HEADER.unpack_from(
+            self.map
+        )
+        if magic != DECK_MAGIC:
+            raise ValueError(f"'{file_path}' is not a deck")
+        view = memoryview(self.map)
+        start = DECK_HEADER.size
+        self.card_categories = view[start : start + 4 * self.count].cast("I")
+        start += 4 * self.count
+        self.ids = view[start : start + 4 * self.count].cast("I")
+        start += 4 * self.count
+        string_count = category_count + 2 * self.count
+        self.offsets = view[start : start + 8 * (string_count + 1)].cast("Q")
+        start += 8 * (string_count + 1)
+        self.order = view[start : start + 4 * self.count].cast("I")
+        start += 4 * self.count
+        self.category_starts = view[start : start + 4 * (category_count + 1)].cast("I")
+        start += 4 * (category_count + 1)
+        self.by_question = view[start : start + 4 * self.count].cast("I")
+        self.data_start = start + 4 * self.count
+        self.category_count = category_count
+        self.categories = [self.string(i) for i in range(category_count)]
+
+    def raw_string(self, number):
+        """
+        Returns a string of the string data without decoding it.
+
+        Args:
+            number (int): Number of the string.
+
+        Returns:
+            bytes: The UTF-8 encoded string.
+        """
+        start = self.data_start + self.offsets[number]
+        end = self.data_start + self.offsets[number + 1]
+        return self.map[start:end]
+
+    def string(self, number):
+        """
+        Decodes a string of the string data.
+
+        Args:
+            number (int): Number of the string.
+
+        Returns:
+            str: The string.
+        """
+        return self.raw_string(number).decode()
+
+    def find_question(self, question):
+        """
+        Finds a card by its question with a binary search over the question index in the file.
+
+        Args:
+            question (str): The question.
+
+        Returns:
+            int: Index of the card, None if no card has the question.
+        """
+        encoded = question.encode()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            index = self.by_question[middle]
+            if self.raw_string(self.category_count + 2 * index) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            index = self.by_question[low]
+            if self.raw_string(self.category_count + 2 * index) == encoded:
+                return index
+        return None
+
+    def question(self, index):
+        """
+        Returns the question of the card at an index.
+        """
+        return self.string(self.category_count + 2 * index)
+
+    def answer(self, index):
+        """
+        Returns the answer of the card at an index.
+        """
+        return self.string(self.category_count + 2 * index + 1)
+
+    def category(self, index):
+        """
+        Returns the category of the card at an index.
+        """
+        return self.categories[self.card_categories[index]]
+
+
+# ____________________
+
+
+class Progress:
+    """
+    The progress of one learner on a deck. Keyed by card index.
+
+    Attributes:
+        fingerprint (bytes): Fingerprint of the deck the progress belongs to.
+        levels (bytearray): Level of every card.
+        failures (array): How often every card was answered wrong.
+        last_reviews (array): Time of the last review of every card, 0 if never reviewed.
+    """
+
+    def __init__(self, deck):
+        """
+        Initializes empty progress for a deck. All cards start in level 1.
+
+        Args:
+            deck (Deck): The deck.
+        """
+        self.fingerprint = deck.fingerprint
+        self.levels = bytearray([1]) * deck.count
+        self.failures = array("I", bytes(4 * deck.count))
+        self.last_reviews = array("d", bytes(8 * deck.count))
+
+    @classmethod
+    def load(cls, file_path, deck):
+        """
+        Loads the progress of a learner.
+
+        Args:
+            file_path (str): Path of the progress file.
+            deck (Deck): The deck the progress belongs to.
+
+        Returns:
+            Progress: The loaded progress.
+
+        Raises:
+            ValueError: If the file is not a progress file of this deck, is truncated or has invalid levels.
+        """
+        progress = cls(deck)
+        count = deck.count
+        with open(file_path, "rb") as file:
+            header = file.read(PROGRESS_HEADER.size)
+            data = file.read()
+        if len(header) < PROGRESS_HEADER.size:
+            raise ValueError(f"'{file_path}' is not a progress file of this deck")
+        magic, fingerprint = PROGRESS_HEADER.unpack(header)
+        if magic != PROGRESS_MAGIC or fingerprint != deck.fingerprint:
+            raise ValueError(f"'{file_path}' is not a progress file of this deck")
+        # one level byte, failures (u4) and the time of the last review (f8) per card
+        if len(data) != 13 * count:
+            raise ValueError(
+                f"'{file_path}' holds {len(data)} bytes of progress, the deck needs {13 * count}"
+            )
+        progress.levels = bytearray(data[:count])
+        if count and not (1 <= min(progress.levels) and max(progress.levels) <= 10):
+            raise ValueError(f"'{file_path}' has levels outside 1 to 10")
+        progress.failures = array("I", data[count : 5 * count])
+        progress.last_reviews = array("d", data[5 * count :])
+        return progress
+
+    def save(self, file_path):
+        """
+        Saves the progress. Writes to a temporary file first, so a crash never leaves a half-written file.
+
+        Args:
+            file_path (str): Path of the progress file.
+        """
+        temporary_path = f"{file_path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(PROGRESS_HEADER.pack(PROGRESS_MAGIC, self.fingerprint))
+            file.write(self.levels)
+            file.write(self.failures.tobytes())
+            file.write(self.last_reviews.tobytes())
+        os.replace(temporary_path, file_path)
+
+
+# ____________________
+
+
+class DeckCard(box.Card):
+    """
+    A flashcard whose content is read from a shared deck and whose progress is kept in a learner's overlay.
+    The content is read-only.
+
+    Attributes:
+        deck (Deck): The shared deck.
+        progress (Progress): The learner's progress.
+        index (int): Index of the card in the deck.
+        id (int): ID of the card.
+    """
+
+    # decks hold text only
+    attachments = ()
+
+    def __init__(self, deck, progress, index):
+        """
+        Initializes a card of a deck.
+
+        Args:
+            deck (Deck): The shared deck.
+            progress (Progress): The learner's progress.
+            index (int): Index of the card in the deck.
+        """
+        self.deck = deck
+        self.progress = progress
+        self.index = index
+        self.id = deck.ids[index]
+
+    @property
+    def question(self):
+        return self.deck.question(self.index)
+
+    @property
+    def answer(self):
+        return self.deck.answer(self.index)
+
+    @property
+    def category(self):
+        return self.deck.category(self.index)
+
+    @property
+    def level(self):
+        return self.progress.levels[self.index]
+
+    @level.setter
+    def level(self, level):
+        self.progress.levels[self.index] = level
+
+    @property
+    def failures(self):
+        return self.progress.failures[self.index]
+
+    @failures.setter
+    def failures(self, failures):
+        self.progress.failures[self.index] = failures
+
+    @property
+    def last_review(self):
+        return self.progress.last_reviews[self.index] or None
+
+    @last_review.setter
+    def last_review(self, last_review):
+        self.progress.last_reviews[self.index] = last_review or 0
+
+
+class DeckQuestions(Mapping):
+    """
+    The question index of a deck box: maps questions to cards by searching the deck file (see Deck.find_question).
+    """
+
+    def __init__(self, deck, cards):
+        self.deck = deck
+        self.cards = cards
+
+    def __getitem__(self, question):
+        index = self.deck.find_question(question)
+        if index is None:
+            raise KeyError(question)
+        return self.cards[index]
+
+    def __iter__(self):
+        for index in self.deck.by_question:
+            yield self.cards[index].question
+
+    def __len__(self):
+        return self.deck.count
+
+
+class DeckCategory(Sequence):
+    """
+    The cards of a category of a deck box, sorted by question, as a slice of the category index of the deck file.
+    """
+
+    def __init__(self, deck, cards, start, end):
+        self.deck = deck
+        self.cards = cards
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return self.cards[self.deck.order[self.start + position]]
+
+    def __len__(self):
+        return self.end - self.start
+
+
+class DeckBox(box.Box):
+    """
+    A box composed of a shared deck and a learner's progress. Saving writes the progress only.
+    The content is read-only: adding, editing and deleting cards or categories raises a ValueError.
+
+    Attributes:
+        deck (Deck): The shared deck.
+        progress (Progress): The learner's progress.
+    """
+
+    def __init__(self, name, deck, progress):
+        """
+        Initializes a box for a learner on a deck.
+
+        Args:
+            name (str): The name of the box, used for the progress file.
+            deck (Deck): The shared deck.
+            progress (Progress): The learner's progress.
+        """
+        super().__init__(name)
+        self.deck = deck
+        self.progress = progress
+        self.categories = list(deck.categories)
+        self.cards = [DeckCard(deck, progress, i) for i in range(deck.count)]
+        self.ids = {card.id: card for card in self.cards}
+        self.next_id = max(self.ids, default=0) + 1
+        self.rebuild_indexes()
+
+    def rebuild_indexes(self):
+        """
+        Builds the level index from the progress. The question and category indexes are views of the indexes
+        in the deck file (DeckQuestions, DeckCategory), so no question is decoded.
+        """
+        deck = self.deck
+        self.questions = DeckQuestions(deck, self.cards)
+        self.category_cards = {
+            category: DeckCategory(
+                deck, self.cards, deck.category_starts[i], deck.category_starts[i + 1]
+            )
+            for i, category in enumerate(deck.categories)
+        }
+        self.level_cards = {level: {} for level in self.levels}
+        for card, level in zip(self.cards, self.progress.levels):
+            self.level_cards[level][card.id] = card
+        self.listings = {}
+
+    @classmethod
+    def open(cls, deck_path, progress_path):
+        """
+        Opens the box of a learner. Creates empty progress if the progress file does not exist yet.
+
+        Args:
+            deck_path (str): Path of the deck file.
+            progress_path (str): Path of the learner's progress file, named '<name>.progress'.
+
+        Returns:
+            DeckBox: The box.
+        """
+        deck = Deck(deck_path)
+        if os.path.exists(progress_path):
+            progress = Progress.load(progress_path, deck)
+        else:
+            progress = Progress(deck)
+        name = os.path.splitext(os.path.basename(progress_path))[0]
+        return cls(name, deck, progress)
+
+    @classmethod
+    def load(cls, progress_path):
+        """
+        Opens the box of a learner from a progress file, with the deck next to it (see find_deck).
+
+        Args:
+            progress_path (str): Path of the learner's progress file, named '<name>.progress'.
+
+        Returns:
+            DeckBox: The box.
+
+        Raises:
+            FileNotFoundError: If no deck in the folder of the progress file belongs to it.
+            ValueError: If the progress file is damaged.
+        """
+        deck_path = find_deck(progress_path)
+        if deck_path is None:
+            raise FileNotFoundError(f"no deck for '{progress_path}'")
+        return cls.open(deck_path, progress_path)
+
+    def save_to_json(self, save_folder="data"):
+        """
+        Saves the progress to '<name>.progress' in the save folder. The shared deck is never written.
+
+        Args:
+            save_folder (str): Folder in root to save the progress to. By default 'data'.
+        """
+        self.progress.save(os.path.join(save_folder, f"{self.name}.progress"))
+        self.save_reviews(save_folder)
+
+    def read_only(self, *args, **kwargs):
+        """
+        Replaces all methods changing the content.
+        """
+        raise ValueError("the content of a shared deck is read-only")
+
+    add_category = read_only
+    delete_category = read_only
+    add_card = read_only
+    edit_card = read_only
+    delete_card = read_only
+    delete_cards = read_only
+    delete_cards_in_category = read_only
+    add_attachment = read_only
+    remove_attachment = read_only
+
+    def dedupe(self, keep="max"):
+        """
+        Decks are built from boxes with unique questions, so there is nothing to merge.
+        """
+        return 0
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared FlashLine_ decks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="build a deck from a box")
+    build_parser.add_argument("box", help="JSON file of the box")
+    build_parser.add_argument("deck", help="path of the deck file")
+    progress_parser = commands.add_parser("progress", help="create empty progress")
+    progress_parser.add_argument("deck", help="path of the deck file")
+    progress_parser.add_argument("progress", help="path of the progress file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_deck(box.Box.load_from_json(args.box), args.deck)
+        print(f"DECK SAVED TO {args.deck}")
+    elif args.command == "progress":
+        Progress(Deck(args.deck)).save(args.progress)
+        print(f"PROGRESS SAVED TO {args.progress}")
+
+
+if __name__ == "__main__":
+    main()
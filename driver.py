@@ -0,0 +1,171 @@
+import argparse
+import os
+import time
+
+import box
+import metrics
+import project
+import ui
+
+"""
+The `driver.py` script runs the menus of the application without a terminal.
+It replays keystrokes through a `ui.ScriptedIO` backend against a box, so navigation and learning
+can be tested, timed and profiled in CI, e.g. together with FLASHLINE_METRICS (see metrics.py).
+
+Run it as a benchmark: `python driver.py [BOX] [--script navigate|learn|batch|progress] [--repeat 1000]`.
+With `--memory REPORT`, every box operation and UI action is profiled with tracemalloc and a memory report is written.
+"""
+
+# ____________________
+
+# Positions of the options used by the scripts, as typed in the menus of project.run_main
+LEARN = "1"
+MANAGE = "2"
+PROGRESS = "3"
+LEARN_ALL = "1"
+LEARN_BATCH = "6"
+LEARN_RESUME = "7"
+SHOW_FLASHCARDS = "3"
+CHANGE_LEVELS = "9"
+PROGRESS_TOTAL = "1"
+BACK = "X"
+ENTER = ""
+
+
+def navigate_keys():
+    """
+    Keystrokes opening every submenu of the main menu and showing the first flashcard of the first category.
+
+    Returns:
+        list: The keystrokes, ending in the main menu.
+    """
+    return [
+        LEARN,
+        BACK,
+        MANAGE,
+        SHOW_FLASHCARDS,
+        "1",
+        "1",
+        ENTER,
+        BACK,
+        BACK,
+        BACK,
+        PROGRESS,
+        BACK,
+    ]
+
+
+def learn_keys(count, answer=""):
+    """
+    Keystrokes learning all flashcards of a box with "LEARN ALL", giving the same answer to every card.
+
+    Args:
+        count (int): The number of flashcards in the box.
+        answer (str, optional): The answer to give. Defaults to "" (a wrong answer).
+
+    Returns:
+        list: The keystrokes, ending in the main menu.
+    """
+    return [LEARN, LEARN_ALL] + [answer, ENTER] * count + [ENTER, BACK]
+
+
+def batch_keys(count, answer="", batch_size=None):
+    """
+    Keystrokes learning all flashcards of a box with "LEARN BATCH", giving the same answer to every card.
+
+    Args:
+        count (int): The number of flashcards in the box.
+        answer (str, optional): The answer to give. Defaults to "" (a wrong answer).
+        batch_size (int, optional): Number of flashcards per screen. Defaults to None (project.BATCH_SIZE).
+
+    Returns:
+        list: The keystrokes, ending in the main menu.
+    """
+    if batch_size is None:
+        batch_size = project.BATCH_SIZE
+    keys = [LEARN, LEARN_BATCH]
+    for start in range(0, count, batch_size):
+        keys += [answer] * min(batch_size, count - start) + [ENTER]
+    return keys + [ENTER, BACK]
+
+
+def progress_keys():
+    """
+    Keystrokes showing the progress of the whole box.
+
+    Returns:
+        list: The keystrokes, ending in the main menu.
+    """
+    return [PROGRESS, PROGRESS_TOTAL, ENTER, BACK]
+
+
+def run(keys, current_box, output=None, save_folder="data"):
+    """
+    Runs the main menu of a box with scripted keystrokes until they run out or the application exits.
+
+    Args:
+        keys (iterable): The keystrokes to replay.
+        current_box (Box): The box to run the menus for.
+        output (file, optional): File for the output of the application. Defaults to None (a new StringIO buffer).
+        save_folder (str, optional): The folder the box is saved in, for its session file. Defaults to 'data'.
+
+    Returns:
+        ScriptedIO: The backend, with the output and the number of keystrokes read.
+    """
+    backend = ui.ScriptedIO(keys, output)
+    project.box = current_box
+    project.box_folder = save_folder
+    with ui.use_backend(backend):
+        try:
+            project.run_main(current_box)
+        except (ui.ScriptEnd, SystemExit):
+            pass
+    return backend
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scripted runs of the FlashLine_ menus."
+    )
+    parser.add_argument("box", nargs="?", default="DEMO", help="name of the box")
+    parser.add_argument("--data", default="data", help="folder with the save-files")
+    parser.add_argument(
+        "--script",
+        choices=["navigate", "learn", "batch", "progress"],
+        default="navigate",
+    )
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--memory", help="write a memory report to this file")
+    args = parser.parse_args()
+    if args.memory:
+        metrics.enable_memory()
+
+    current_box = box.Box.load_from_json(os.path.join(args.data, f"{args.box}.json"))
+    if args.script == "navigate":
+        keys = navigate_keys()
+    elif args.script == "learn":
+        keys = learn_keys(len(current_box.cards))
+    elif args.script == "batch":
+        keys = batch_keys(len(current_box.cards))
+    else:
+        keys = progress_keys()
+
+    with open(os.devnull, "w") as output:
+        start = time.perf_counter()
+        backend = run(keys * args.repeat, current_box, output, args.data)
+        seconds = time.perf_counter() - start
+    print(f"KEYSTROKES:  {backend.inputs}")
+    print(f"SECONDS:     {seconds:.2f}")
+    print(f"PER SECOND:  {backend.inputs / seconds:.0f}")
+    if metrics.enabled:
+        print(f"\nMETRICS WRITTEN AT EXIT TO {os.environ['FLASHLINE_METRICS']}")
+    if args.memory:
+        metrics.export_memory(args.memory)
+        print(f"\nMEMORY REPORT WRITTEN TO {args.memory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+
+import box
+import server
+
+"""
+The `load_test.py` script simulates many concurrent learners against the server from `server.py`.
+Every session opens its own connection and repeatedly fetches the next card, answers it and checks its progress.
+By default it starts a server on localhost with a generated box. Use --port to test an already running server instead.
+"""
+
+# ____________________
+
+
+async def request(reader, writer, method, path, data=None):
+    """
+    Sends a single HTTP request over an open connection and returns the decoded JSON response.
+
+    Args:
+        reader (asyncio.StreamReader): Reader of the connection.
+        writer (asyncio.StreamWriter): Writer of the connection.
+        method (str): The HTTP method.
+        path (str): The request target.
+        data (dict, optional): JSON body of the request. Defaults to None.
+
+    Returns:
+        tuple: The status code and the decoded JSON response.
+    """
+    body = json.dumps(data).encode() if data is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def session(host, port, box_name, rounds, latencies, answers):
+    """
+    Simulates one learner. Answers correctly about half of the time.
+
+    Args:
+        host (str): Host of the server.
+        port (int): Port of the server.
+        box_name (str): The box to learn.
+        rounds (int): Number of cards to learn.
+        latencies (list): Collects the latency of every request in seconds.
+        answers (dict): Maps card IDs to correct answers, used to answer correctly.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            _, card = await request(reader, writer, "GET", f"/boxes/{box_name}/next")
+            latencies.append(time.perf_counter() - start)
+
+            answer = answers.get(card["id"], "") if random.random() < 0.5 else "?"
+            start = time.perf_counter()
+            await request(
+                reader,
+                writer,
+                "POST",
+                f"/boxes/{box_name}/answer",
+                {"id": card["id"], "answer": answer},
+            )
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await request(reader, writer, "GET", f"/boxes/{box_name}/progress")
+        latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+def generate_box(save_folder, name, count, categories=10):
+    """
+    Creates and saves a box with generated flashcards.
+
+    Returns:
+        dict: Maps card IDs to answers of the generated box.
+    """
+    new_box = box.Box(name)
+    for i in range(categories):
+        new_box.add_category(f"CATEGORY-{i}")
+    for i in range(count):
+        new_box.add_card(f"QUESTION {i}", f"ANSWER {i}", f"CATEGORY-{i % categories}")
+    new_box.save_to_json(save_folder)
+    return {card.id: card.answer for card in new_box.cards}
+
+
+def print_report(latencies, duration, sessions):
+    """
+    Prints throughput and latency percentiles.
+    """
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"SESSIONS:     {sessions}")
+    print(f"REQUESTS:     {len(latencies)}")
+    print(f"DURATION:     {duration:.2f} s")
+    print(f"THROUGHPUT:   {len(latencies) / duration:.0f} requests/s")
+    print(f"LATENCY P50:  {percentile(0.50):.2f} ms")
+    print(f"LATENCY P95:  {percentile(0.95):.2f} ms")
+    print(f"LATENCY P99:  {percentile(0.99):.2f} ms")
+    print(f"LATENCY MAX:  {latencies[-1] * 1000:.2f} ms")
+
+
+async def run(args):
+    answers = {}
+    if args.port is None:
+        save_folder = tempfile.mkdtemp()
+        answers = generate_box(save_folder, args.box, args.cards)
+        test_server = await server.start_server(args.host, 0, save_folder)
+        port = test_server.sockets[0].getsockname()[1]
+    else:
+        test_server = None
+        port = args.port
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            session(args.host, port, args.box, args.rounds, latencies, answers)
+            for _ in range(args.sessions)
+        )
+    )
+    duration = time.perf_counter() - start
+    print_report(latencies, duration, args.sessions)
+
+    if test_server is not None:
+        test_server.close()
+        await test_server.wait_closed()
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the FlashLine_ server.")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument(
+        "--rounds", type=int, default=20, help="cards learned per session"
+    )
+    parser.add_argument(
+        "--cards", type=int, default=1000, help="size of the generated box"
+    )
+    parser.add_argument("--box", default="LOADTEST")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port", type=int, default=None, help="test a running server instead"
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
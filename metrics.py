@@ -0,0 +1,434 @@
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+"""
+The `metrics.py` script provides opt-in instrumentation for the application.
+It collects counters and latency histograms and exports them as JSON or in the Prometheus text format.
+
+Instrumentation is disabled by default and costs a single flag check per instrumented call.
+Enable it with `enable()` or by setting the environment variable FLASHLINE_METRICS to the path of the export file.
+A path ending in '.prom' is written in the Prometheus text format, every other path as JSON. The file is written at exit.
+
+Memory profiling is a separate mode. Enable it with `enable_memory()` or by setting FLASHLINE_MEMORY to the path of a report.
+Every operation timed with `timed` or `Timer` then also records its peak and retained allocations, traced with `tracemalloc`.
+The report lists one operation per line, sorted by name, followed by the allocation sites holding the most memory at exit,
+so two reports can be compared with `diff` to pin a memory regression to an operation and a line of code.
+"""
+
+# ____________________
+
+# Upper bounds of the histogram buckets in seconds
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+enabled = False
+counters = {}
+histograms = {}
+lock = threading.Lock()
+
+profiling = False
+allocations = {}
+frames = threading.local()
+
+
+class Histogram:
+    """
+    A latency histogram with fixed buckets.
+
+    Attributes:
+        counts (list): Number of observations per bucket. The last bucket counts observations above all bounds.
+        sum (float): Sum of all observations in seconds.
+        count (int): Number of observations.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty histogram.
+        """
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Adds an observation to the histogram.
+
+        Args:
+            value (float): The observed duration in seconds.
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        """
+        Convert the histogram to a dictionary for the JSON export.
+
+        Returns:
+            dict: A dictionary with bucket counts, sum and count.
+        """
+        return {
+            "buckets": dict(
+                zip([str(bound) for bound in BUCKETS] + ["+Inf"], self.counts)
+            ),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+# ______Collecting______
+
+
+def enable():
+    """
+    Enables instrumentation.
+    """
+    global enabled
+    enabled = True
+
+
+def disable():
+    """
+    Disables instrumentation. Collected values are kept.
+    """
+    global enabled
+    enabled = False
+
+
+def reset():
+    """
+    Discards all collected values, including memory statistics.
+    """
+    with lock:
+        counters.clear()
+        histograms.clear()
+        allocations.clear()
+
+
+def count(name, value=1, **labels):
+    """
+    Increases a counter. Callers on hot paths should check `metrics.enabled` first.
+
+    Args:
+        name (str): The name of the counter.
+        value (int, optional): The amount to add. Defaults to 1.
+        **labels: Labels of the counter, e.g. query="category".
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with lock:
+        counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """
+    Adds an observation to a histogram.
+
+    Args:
+        name (str): The name of the histogram.
+        value (float): The observed duration in seconds.
+        **labels: Labels of the histogram.
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with lock:
+        if key not in histograms:
+            histograms[key] = Histogram()
+        histograms[key].observe(value)
+
+
+def timed(name):
+    """
+    Decorator recording the duration of every call of a function in a histogram.
+
+    Args:
+        name (str): The name of the histogram.
+
+    Returns:
+        function: The decorator.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled and not profiling:
+                return function(*args, **kwargs)
+            with Timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class Timer:
+    """
+    Context manager recording the duration of a block in a histogram. Does nothing if instrumentation is disabled.
+    """
+
+    def __init__(self, name, **labels):
+        """
+        Initializes a new timer.
+
+        Args:
+            name (str): The name of the histogram.
+            **labels: Labels of the histogram.
+        """
+        self.name = name
+        self.labels = labels
+        self.start = None
+        self.frame = None
+
+    def __enter__(self):
+        if profiling:
+            self.frame = enter_frame()
+        if enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if self.frame is not None:
+            exit_frame(self.frame, self.name, self.labels)
+
+
+# ______Memory profiling______
+
+
+class Allocations:
+    """
+    Memory statistics of an operation.
+
+    Attributes:
+        calls (int): Number of calls.
+        peak (int): Highest peak of a single call in bytes, above the memory in use when the call started.
+        retained (int): Bytes still allocated after all calls, summed over the calls.
+    """
+
+    def __init__(self):
+        """
+        Initializes empty statistics.
+        """
+        self.calls = 0
+        self.peak = 0
+        self.retained = 0
+
+
+def enable_memory():
+    """
+    Enables memory profiling and starts tracing allocations.
+    """
+    global profiling
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+    profiling = True
+
+
+def disable_memory():
+    """
+    Disables memory profiling and stops tracing allocations. Collected statistics are kept.
+    """
+    global profiling
+    profiling = False
+    tracemalloc.stop()
+
+
+def enter_frame():
+    """
+    Starts measuring an operation. The peak of the enclosing operation is saved first, because the peak is reset.
+    Operations are measured per thread, but tracemalloc counts the allocations of all threads.
+
+    Returns:
+        list: The frame of the operation, memory in use at the start and the peak so far.
+    """
+    stack = getattr(frames, "stack", None)
+    if stack is None:
+        stack = frames.stack = []
+    current, peak = tracemalloc.get_traced_memory()
+    if stack:
+        stack[-1][1] = max(stack[-1][1], peak)
+    tracemalloc.reset_peak()
+    frame = [current, current]
+    stack.append(frame)
+    return frame
+
+
+def exit_frame(frame, name, labels):
+    """
+    Finishes measuring an operation and records its peak and retained allocations.
+    The peak is passed on to the enclosing operation.
+
+    Args:
+        frame (list): The frame returned by enter_frame.
+        name (str): The name of the operation, e.g. the name of its histogram.
+        labels (dict): Labels of the operation.
+    """
+    if not tracemalloc.is_tracing():
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(frame[1], peak)
+    stack = frames.stack
+    stack.pop()
+    if stack:
+        stack[-1][1] = max(stack[-1][1], peak)
+    key = (name.removesuffix("_seconds"), tuple(sorted(labels.items())))
+    with lock:
+        if key not in allocations:
+            allocations[key] = Allocations()
+        statistics = allocations[key]
+        statistics.calls += 1
+        statistics.peak = max(statistics.peak, peak - frame[0])
+        statistics.retained += current - frame[0]
+
+
+def memory_report(top=20):
+    """
+    Formats the memory statistics of all operations and the allocation sites holding the most memory.
+
+    Args:
+        top (int, optional): Number of allocation sites to list. Defaults to 20.
+
+    Returns:
+        str: The report.
+    """
+    lines = [f"{'OPERATION':<60} {'CALLS':>9} {'PEAK KIB':>12} {'RETAINED KIB':>14}"]
+    with lock:
+        for (name, labels), statistics in sorted(allocations.items()):
+            operation = f"{name}{format_labels(labels)}"
+            lines.append(
+                f"{operation:<60} {statistics.calls:>9} "
+                f"{statistics.peak / 1024:>12.1f} {statistics.retained / 1024:>14.1f}"
+            )
+    if tracemalloc.is_tracing():
+        lines.append("")
+        lines.append(f"{'ALLOCATION SITE':<60} {'BLOCKS':>9} {'SIZE KIB':>12}")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        )
+        for statistic in snapshot.statistics("lineno")[:top]:
+            frame = statistic.traceback[0]
+            site = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            lines.append(
+                f"{site:<60} {statistic.count:>9} {statistic.size / 1024:>12.1f}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def export_memory(file_path):
+    """
+    Writes the memory report to a file.
+
+    Args:
+        file_path (str): The path of the report.
+    """
+    with open(file_path, "w") as file:
+        file.write(memory_report())
+
+
+# ______Exporting______
+
+
+def to_dict():
+    """
+    Convert all collected values to a dictionary for the JSON export.
+
+    Returns:
+        dict: A dictionary with all counters and histograms.
+    """
+    with lock:
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+            "histograms": [
+                {"name": name, "labels": dict(labels), **histogram.to_dict()}
+                for (name, labels), histogram in sorted(
+                    histograms.items(), key=lambda item: item[0]
+                )
+            ],
+        }
+
+
+def format_labels(labels, extra=()):
+    """
+    Formats labels for the Prometheus text format.
+
+    Args:
+        labels (tuple): Pairs of label names and values.
+        extra (tuple, optional): Additional pairs, e.g. the bucket bound. Defaults to ().
+
+    Returns:
+        str: The formatted labels, or an empty string if there are none.
+    """
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    ]
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def to_prometheus():
+    """
+    Formats all collected values in the Prometheus text format.
+
+    Returns:
+        str: The formatted metrics.
+    """
+    lines = []
+    with lock:
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE flashline_{name} counter")
+                typed.add(name)
+            lines.append(f"flashline_{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(
+            histograms.items(), key=lambda item: item[0]
+        ):
+            if name not in typed:
+                lines.append(f"# TYPE flashline_{name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(list(BUCKETS) + ["+Inf"], histogram.counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(labels, [("le", bound)])
+                lines.append(f"flashline_{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"flashline_{name}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(
+                f"flashline_{name}_count{format_labels(labels)} {histogram.count}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def export(file_path):
+    """
+    Writes all collected values to a file. Uses the Prometheus text format for '.prom' files, otherwise JSON.
+
+    Args:
+        file_path (str): The path of the export file.
+    """
+    with open(file_path, "w") as file:
+        if file_path.endswith(".prom"):
+            file.write(to_prometheus())
+        else:
+            json.dump(to_dict(), file, indent=2)
+
+
+if os.environ.get("FLASHLINE_METRICS"):
+    enable()
+    atexit.register(export, os.environ["FLASHLINE_METRICS"])
+
+if os.environ.get("FLASHLINE_MEMORY"):
+    enable_memory()
+    atexit.register(export_memory, os.environ["FLASHLINE_MEMORY"])
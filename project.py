@@ -1,3 +1,4 @@
+import contextlib
 import os
 import re
 import random
@@ -5,11 +6,22 @@ import sys
 
 from ui import Menu
 from ui import Selector
+import ui
+from sampling import WeightedSampler
+import blobs
 import box
+import compression
+import deck
+import query
+import search
+import session
+import shards
+import snapshots
+import watch
 
 try:
     import pyfiglet
-    
+
     pyfiglet_installed = True
 except ImportError:
     pyfiglet_installed = False
@@ -20,6 +32,18 @@ It plays a pivotal role by connecting the core functionalities found in `box.py`
 It definines the user interface and the corresponding functions for selectable options.
 """
 
+# Number of flashcards shown per screen by "LEARN BATCH"
+BATCH_SIZE = 10
+
+# The folder the current box is saved in, session files of the box are kept next to its save file
+box_folder = "data"
+
+# The options of "CREATE & MANAGE" kept for shared decks, whose content is read-only (see deck.py)
+DECK_MANAGE_OPTIONS = ("SHOW FLASHCARDS", "CHANGE LEVELS", "BACK")
+
+# Watches the save file of the current box for changes by other programs (see watch.py), None if it is not watched
+watcher = None
+
 # ______Utility functions______
 # for common tasks throughout the application
 
@@ -34,12 +58,9 @@ def new_screen():
 
 def clear_screen():
     """
-    Clears the screen based on the operating system (Windows/Linux).
+    Clears the screen based on the operating system (Windows/Linux), through the I/O backend of ui.py.
     """
-    if os.name == "posix":
-        os.system("clear")
-    else:
-        os.system("cls")
+    ui.backend.clear()
 
 
 def print_line_h(lenght=20):
@@ -49,16 +70,16 @@ def print_line_h(lenght=20):
     Args:
         lenght (int, optional): The lenght of the line (defaults to 20).
     """
-    print()
-    print(lenght * "_")
-    print()
+    ui.backend.print()
+    ui.backend.print(lenght * "_")
+    ui.backend.print()
 
 
 def continue_enter():
     """
     Pauses the execution of the script and waits for random user input to continue.
     """
-    input("\nPRESS 'ENTER' TO CONTINUE")
+    ui.backend.input("\nPRESS 'ENTER' TO CONTINUE")
     pass
 
 
@@ -76,6 +97,23 @@ def clean_input(user_input):  # test
     return cleaned_input
 
 
+def clean_filter_input(user_input):  # test
+    """
+    Clean a filter expression (see query.py) by stripping it and converting it to uppercase outside of quotes.
+    Text in quotes is kept as written, so regular expressions like "\\d" keep their meaning.
+
+    Args:
+        user_input (str): The filter expression provided by the user.
+
+    Returns:
+        str: Cleaned filter expression.
+    """
+    parts = re.split(r"(\"(?:[^\"\\]|\\.)*\"?|'(?:[^'\\]|\\.)*'?)", user_input.strip())
+    return "".join(
+        part if index % 2 else part.upper() for index, part in enumerate(parts)
+    )
+
+
 def get_input_yes_no(action):
     """
     Prompts the user to confirm an action with 'Y' or 'N' and returns validated input.
@@ -89,9 +127,11 @@ def get_input_yes_no(action):
     """
     while True:
         new_screen()
-        user_input = clean_input(input(f"\nDO YOU REALLY WANT TO {action}? (Y/N): "))
+        user_input = clean_input(
+            ui.backend.input(f"\nDO YOU REALLY WANT TO {action}? (Y/N): ")
+        )
         if validate_input_yes_no(user_input) == False:
-            print(f"\nINVALID INPUT - TYPE 'Y' OR 'N'")
+            ui.backend.print(f"\nINVALID INPUT - TYPE 'Y' OR 'N'")
             continue_enter()
         else:
             if user_input.startswith("Y"):
@@ -130,14 +170,16 @@ def get_input(prompt, object, disable_validation=True):
     prompt_complete = f"{prompt} {object}: "
     while True:
         new_screen()
-        user_input = clean_input(input(prompt_complete))
+        user_input = clean_input(ui.backend.input(prompt_complete))
         if disable_validation == True:
             return user_input
         else:
             if validate_input_general(user_input) == True:
                 return user_input
             else:
-                print(f"\nINVALID INPUT - MAKE SURE NOT TO USE SPECIAL CHARACTERS")
+                ui.backend.print(
+                    f"\nINVALID INPUT - MAKE SURE NOT TO USE SPECIAL CHARACTERS"
+                )
                 continue_enter()
 
 
@@ -171,11 +213,11 @@ def display_title_screen():
         print_ASCII("FLASH")
         print_ASCII("  LINE_")
     else:
-        print(f"FLASH")
-        print(f"\nLINE_")
-        print(f"\n(INSTALL PYFIGLET TO CORRECTLY DISPLAY THE TITLE)")
-    print(20 * "_")
-    print(f"\nFLASHCARD LEARNING AND MANAGEMENT")
+        ui.backend.print(f"FLASH")
+        ui.backend.print(f"\nLINE_")
+        ui.backend.print(f"\n(INSTALL PYFIGLET TO CORRECTLY DISPLAY THE TITLE)")
+    ui.backend.print(20 * "_")
+    ui.backend.print(f"\nFLASHCARD LEARNING AND MANAGEMENT")
     continue_enter()
 
 
@@ -188,7 +230,7 @@ def print_ASCII(text, font="slant"):
         font (str, optional): The font for creating the ASCII art. Defaults to 'slant'.
     """
     ascii_text = pyfiglet.figlet_format(text, font=font)
-    print(ascii_text)
+    ui.backend.print(ascii_text)
 
 
 # ______Functions related to the TITLE Menu__________
@@ -200,16 +242,66 @@ def new_box_ui():
     Menu action for "NEW BOX".
     Creates a new flashcard box and starts the main menu.
     """
-    global box
+    global box, box_folder
     name = get_input(f"NAME OF NEW", "BOX", disable_validation=False)
     if check_box(name) == False:
         box = box.Box(name)
-        print(f"\nBOX '{name}' CREATED")
+        box_folder = "data"
+        watch_box()
+        ui.backend.print(f"\nBOX '{name}' CREATED")
         continue_enter()
         run_main(box)
     elif check_box(name) == True:
-        print(f"\nBOX WITH NAME '{name}' ALREADY EXISTS - CHOOSE A DIFFERENT NAME")
+        ui.backend.print(
+            f"\nBOX WITH NAME '{name}' ALREADY EXISTS - CHOOSE A DIFFERENT NAME"
+        )
+        continue_enter()
+
+
+def watch_box(save_folder="data"):
+    """
+    Starts watching the save file of the current box and stops watching the previous one.
+    Sharded boxes and shared decks are not watched.
+
+    Args:
+        save_folder (str, optional): The subfolder in root where the JSON file is saved. Defaults to 'data'.
+    """
+    global watcher
+    if watcher is not None:
+        watcher.stop()
+        watcher = None
+    if not isinstance(box, (shards.ShardedBox, deck.DeckBox)):
+        watcher = watch.Watcher(box, save_folder)
+        watcher.start()
+
+
+def pause_watcher():
+    """
+    Returns a context that defers the merges of the watcher while flashcards are learned or edited
+    (see watch.Watcher.paused), so the cards in use are neither removed nor changed by another program until it ends.
+    """
+    if watcher is None:
+        return contextlib.nullcontext()
+    return watcher.paused()
+
+
+def get_existing_card(card_id):
+    """
+    Returns the flashcard an action was selected for. Tells the user if it no longer exists,
+    e.g. because the watcher merged its deletion by another program after it was selected.
+
+    Args:
+        card_id (int): The ID of the flashcard.
+
+    Returns:
+        Card: The flashcard, None if it no longer exists.
+    """
+    card = box.get_card(card_id)
+    if card is None:
+        new_screen()
+        ui.backend.print("\nFLASHCARD NO LONGER EXISTS")
         continue_enter()
+    return card
 
 
 def check_box(name):
@@ -228,29 +320,80 @@ def check_box(name):
         return False
 
 
+def search_boxes_ui(save_folder="data"):
+    """
+    Menu action for "SEARCH BOXES".
+    Prompts the user for words and lists the flashcards of all boxes mentioning them, using the search index (see search.py).
+
+    Args:
+        save_folder (str, optional): The subfolder in root with the save files. Defaults to 'data'.
+    """
+    text = get_input(
+        "ENTER", "WORDS TO SEARCH FOR (END WITH * FOR PREFIXES) OR 'X' TO GO BACK"
+    )
+    if text == "X":
+        return
+    hits = search.search(text, save_folder)
+    new_screen()
+    ui.backend.print(f"{len(hits)} FLASHCARDS FOUND")
+    for line in search.format_hits(hits):
+        ui.backend.print(line)
+    continue_enter()
+
+
 def load_box_ui(filename, save_folder="data"):
     """
     Menu action for "LOAD BOX". Load an existing flashcard box from a JSON file and start the main menu.
+    A sharded box (a folder '<name>' with a manifest, see shards.py) is preferred over a file with the same name.
+    Without a JSON file, a progress file '<name>.progress' is opened with its shared deck (see deck.py).
 
     Args:
         filename (str): The name of the box to load (without file extension).
         save_folder (str, optional): The subfolder in root where the JSON file is saved. Defaults to 'data'.
     """
-    global box
+    global box, box_folder
+    folder_path = os.path.join(save_folder, filename)
     file_path = os.path.join(save_folder, f"{filename}.json")
     try:
-        box = box.Box.load_from_json(file_path)
-        print(f"\nBOX '{filename}' LOADED")
+        progress_path = os.path.join(save_folder, f"{filename}.progress")
+        if shards.is_sharded(folder_path):
+            box = shards.ShardedBox.open(folder_path)
+        elif not os.path.exists(file_path) and deck.is_progress(progress_path):
+            box = deck.DeckBox.load(progress_path)
+        else:
+            box = box.Box.load_from_json(file_path)
+        box_folder = save_folder
+        watch_box(save_folder)
+        ui.backend.print(f"\nBOX '{filename}' LOADED")
+        duplicates = box.dedupe()
+        if duplicates:
+            ui.backend.print(f"\n{duplicates} DUPLICATE FLASHCARDS MERGED")
+        conflicts = box.list_conflicts()
+        if conflicts:
+            ui.backend.print(
+                f"\n{len(conflicts)} QUESTIONS HAVE SEVERAL FLASHCARDS WITH DIFFERENT ANSWERS OR CATEGORIES - EDIT OR DELETE THEM:"
+            )
+            for question in conflicts:
+                ui.backend.print(f"- {question}")
         continue_enter()
         run_main(box)
     except FileNotFoundError:
-        print(f"\nCOULD NOT LOAD BOX '{filename}' - MAKE SURE THE FILE EXISTS")
+        ui.backend.print(
+            f"\nCOULD NOT LOAD BOX '{filename}' - MAKE SURE THE FILE EXISTS"
+        )
+        continue_enter()
+    except ValueError as e:
+        ui.backend.print(f"\nCOULD NOT LOAD BOX '{filename}' - THE FILE IS DAMAGED:\n")
+        ui.backend.print(e)
         continue_enter()
 
 
 def list_save_files(save_folder="data"):
     """
-    Returns a list of all JSON files in a folder without the file extension.
+    Returns a list of all save files in a folder without the file extension.
+    Save files are named '<name>.json' and recognised by their magic bytes, so compressed boxes are listed too.
+    Sharded boxes are folders '<name>' with a manifest (see shards.py),
+    learners of shared decks are progress files '<name>.progress' (see deck.py).
     Uses os.path to get the folder of the script.
 
     Args:
@@ -265,10 +408,19 @@ def list_save_files(save_folder="data"):
 
     for filename in os.listdir(save_folder_path):
         file_path = os.path.join(save_folder_path, filename)
-        if os.path.isfile(file_path) and filename.endswith(".json"):
+        if (
+            os.path.isfile(file_path)
+            and filename.endswith(".json")
+            and compression.detect_file(file_path) is not None
+        ):
             name, _ = os.path.splitext(filename)
             list_json_files_folder.append(name)
-    return list_json_files_folder
+        elif shards.is_sharded(file_path):
+            list_json_files_folder.append(filename)
+        elif deck.is_progress(file_path):
+            name, _ = os.path.splitext(filename)
+            list_json_files_folder.append(name)
+    return list(dict.fromkeys(list_json_files_folder))
 
 
 # ______functions related to the LEARN Menu______
@@ -299,28 +451,123 @@ def learn_level(level):
     learn_cards_ui(cards)
 
 
+def learn_filter_ui():
+    """
+    Menu action for "LEARN FILTER".
+    Starts learn_cards_ui for flashcards matching a filter expression.
+    """
+    cards = filter_cards_ui()
+    if cards is not None:
+        learn_cards_ui(cards)
+
+
 def learn_cards_ui(cards=None):
     """
     Menu action for "LEARN ALL" (if cards is default).
     Shuffles cards and calls learn_cards for a given set of flashcards (or all flashcards if default).
+    The session is checkpointed after every answer and can be resumed with "RESUME SESSION" (see session.py).
 
     Args:
         cards (list, optional): The list of flashcards to learn. Defaults to None.
     """
     if cards == None:
-        cards = box.cards
+        box.ensure_loaded()
+        cards = box.cards.copy()
     if cards == []:
-        print("\nNO CARDS HERE")
+        ui.backend.print("\nNO CARDS HERE")
         continue_enter()
     else:
         random.shuffle(cards)
-        count_all, count_correct = learn_cards(cards)
+        checkpoint = session.Session.start(
+            box.name, [card.id for card in cards], box_folder
+        )
+        learn_session(cards, checkpoint)
+
+
+def resume_session_ui():
+    """
+    Menu action for "RESUME SESSION".
+    Continues the last unfinished session of the box at the card where it stopped, in the same order.
+    """
+    try:
+        checkpoint = session.Session.open(box.name, box_folder)
+    except ValueError as e:
+        ui.backend.print(f"\nCOULD NOT RESUME SESSION - {str(e).upper()}")
+        continue_enter()
+        return
+    if checkpoint is None:
+        ui.backend.print("\nNO SESSION TO RESUME")
+        continue_enter()
+    else:
+        learn_session(session_cards(checkpoint), checkpoint)
+
+
+def session_cards(checkpoint):
+    """
+    Yields the flashcards a session has not learned yet. Cards deleted since the session started are skipped.
+
+    Args:
+        checkpoint (Session): The session.
+
+    Yields:
+        Card: The next flashcard.
+    """
+    for card_id in checkpoint.remaining():
+        card = box.get_card(card_id)
+        if card is None:
+            checkpoint.record()
+        else:
+            yield card
+
+
+def learn_session(cards, checkpoint):
+    """
+    Learns flashcards in a checkpointed session and prints the score of the whole session.
+    Deletes the session file once every card is learned, otherwise keeps it for "RESUME SESSION".
+
+    Args:
+        cards (list or iterator): The flashcards to learn.
+        checkpoint (Session): The session.
+    """
+    try:
+        with pause_watcher():
+            learn_cards(cards, checkpoint)
+    finally:
+        if checkpoint.done:
+            checkpoint.finish()
+        else:
+            checkpoint.close()
+    new_screen()
+    ui.backend.print(
+        f"{checkpoint.count_correct} OUT OF {checkpoint.count_all} ANSWERS CORRECT"
+    )
+    if not checkpoint.done:
+        ui.backend.print(
+            f"{checkpoint.count - checkpoint.cursor} FLASHCARDS LEFT - CHOOSE 'RESUME SESSION' TO CONTINUE"
+        )
+    continue_enter()
+
+
+def learn_adaptive_ui():
+    """
+    Menu action for "LEARN ADAPTIVE".
+    Draws flashcards at random, preferring cards with a low level and cards that were often answered wrong.
+    The weight of every card is updated after it was learned. A session draws as many cards as there are in the box.
+    """
+    box.ensure_loaded()
+    if box.cards == []:
+        ui.backend.print("\nNO CARDS HERE")
+        continue_enter()
+    else:
+        sampler = WeightedSampler(box.cards)
+        with pause_watcher():
+            count_all, count_correct = learn_cards(sampler.draws(len(sampler.cards)))
         new_screen()
-        print(f"{count_correct} OUT OF {count_all} ANSWERS CORRECT")
+        ui.backend.print(f"{count_correct} OUT OF {count_all} ANSWERS CORRECT")
         continue_enter()
 
 
-def learn_cards(cards):
+def learn_cards(cards, checkpoint=None):
     """
     For a set of flashcards, prints question, prompts user for answer.
     Passes answer to handle_input to check correctnes (result).
@@ -328,7 +575,8 @@ def learn_cards(cards):
     Counts and returns learned cards and correct answers.
 
     Args:
-        cards (list): The list of flashcards to learn.
+        cards (list or iterator): The flashcards to learn.
+        checkpoint (Session, optional): Session to checkpoint after every answer. Defaults to None.
 
     Returns:
         tuple: The total number of questions and the number of correct answers.
@@ -337,8 +585,8 @@ def learn_cards(cards):
     count_correct = 0
     for card in cards:
         new_screen()
-        print(f"QUESTION: {card.question}")
-        answer = clean_input(input(f"\nYOUR ANSWER (OR 'X' TO GO BACK): "))
+        ui.backend.print(f"QUESTION: {card.question}")
+        answer = clean_input(ui.backend.input(f"\nYOUR ANSWER (OR 'X' TO GO BACK): "))
         if answer == "X":
             break
         else:
@@ -346,12 +594,83 @@ def learn_cards(cards):
             count_all += 1
             if result == True:
                 count_correct += 1
-            card.change_level(result)
+            box.change_level(card, result)
+            if checkpoint is not None:
+                checkpoint.record(result)
             print_result(card, result)
             continue_enter()
     return (count_all, count_correct)
 
 
+def learn_batch_ui():
+    """
+    Menu action for "LEARN BATCH".
+    Shuffles all flashcards and learns them in batches of BATCH_SIZE cards per screen (see learn_batch).
+    """
+    box.ensure_loaded()
+    cards = box.cards.copy()
+    if cards == []:
+        ui.backend.print("\nNO CARDS HERE")
+        continue_enter()
+    else:
+        random.shuffle(cards)
+        with pause_watcher():
+            count_all, count_correct = learn_batch(cards)
+        if count_all == 0:
+            return
+        new_screen()
+        ui.backend.print(f"{count_correct} OUT OF {count_all} ANSWERS CORRECT")
+        continue_enter()
+
+
+def learn_batch(cards, batch_size=None):
+    """
+    Learns flashcards in batches. Shows all questions of a batch on one screen and collects the answers without redrawing.
+    Then grades the whole batch with handle_input and change_level and shows the results on a single summary screen.
+    A batch needs one prompt per card and one 'ENTER', instead of three screens per card in learn_cards.
+
+    Args:
+        cards (list): The flashcards to learn.
+        batch_size (int, optional): Number of flashcards per screen. Defaults to None (BATCH_SIZE).
+
+    Returns:
+        tuple: The total number of questions and the number of correct answers.
+    """
+    if batch_size is None:
+        batch_size = BATCH_SIZE
+    count_all = 0
+    count_correct = 0
+    for start in range(0, len(cards), batch_size):
+        batch = cards[start : start + batch_size]
+        new_screen()
+        for i, card in enumerate(batch, start=1):
+            ui.backend.print(f"{i:>2}: {card.question}")
+        ui.backend.print("\nENTER THE ANSWERS (OR 'X' TO GO BACK):\n")
+        answers = []
+        for i in range(1, len(batch) + 1):
+            answer = clean_input(ui.backend.input(f"{i:>2}: "))
+            if answer == "X":
+                break
+            answers.append(answer)
+        if not answers:
+            break
+
+        new_screen()
+        for i, (card, answer) in enumerate(zip(batch, answers), start=1):
+            result = handle_input(card, answer)
+            box.change_level(card, result)
+            count_all += 1
+            if result == True:
+                count_correct += 1
+                ui.backend.print(f"{i:>2}: CORRECT - LEVEL {card.level}")
+            else:
+                ui.backend.print(f"{i:>2}: WRONG - CORRECT ANSWER: {card.answer}")
+        continue_enter()
+        if len(answers) < len(batch):
+            break
+    return (count_all, count_correct)
+
+
 def handle_input(card, answer):
     """
     Compares the user's answer with the answer attribute of the learned flashcard.
@@ -379,13 +698,45 @@ def print_result(card, result):
     """
     if result == True:
         if (card.level - 1) < 10:
-            print(f"\nCORRECT - CARD MOVED TO LEVEL {card.level}")
+            ui.backend.print(f"\nCORRECT - CARD MOVED TO LEVEL {card.level}")
         else:
-            print(f"\nCORRECT")
+            ui.backend.print(f"\nCORRECT")
 
     elif result == False:
-        print(f"\nWRONG - CARD MOVED TO LEVEL 1")
-        print(f"\nCORRECT ANSWER: {card.answer}")
+        ui.backend.print(f"\nWRONG - CARD MOVED TO LEVEL 1")
+        ui.backend.print(f"\nCORRECT ANSWER: {card.answer}")
+
+
+# ______functions related to filter expressions______
+# allow users to select flashcards for learning, progress and deleting with a filter expression (see query.py)
+
+
+def filter_cards_ui():
+    """
+    Prompts the user for a filter expression and shows how many flashcards match and the plan that found them.
+
+    Returns:
+        list: The matching flashcards. None if the expression is invalid or the user went back.
+    """
+    new_screen()
+    expression = clean_filter_input(
+        ui.backend.input(
+            "ENTER FILTER (E.G. CATEGORY IN (A, B) AND LEVEL <= 3) OR 'X' TO GO BACK: "
+        )
+    )
+    if expression == "X":
+        return None
+    try:
+        plan = query.select(box, expression)
+    except query.QueryError as e:
+        ui.backend.print(f"\nINVALID FILTER - {str(e).upper()}")
+        continue_enter()
+        return None
+    ui.backend.print(f"\n{len(plan.cards)} FLASHCARDS FOUND\n")
+    ui.backend.print("PLAN:")
+    ui.backend.print(plan.describe())
+    continue_enter()
+    return plan.cards
 
 
 # ______functions related to the CREATE & MANAGE Menu______
@@ -403,11 +754,11 @@ def new_category_ui():
         name = get_input("ENTER NAME OF NEW", "CATEGORY")
         if box.check_category(name) == False:
             box.add_category(name)
-            print(f"\nCATEGORY '{name}' CREATED")
+            ui.backend.print(f"\nCATEGORY '{name}' CREATED")
             continue_enter()
             break
         elif box.check_category(name) == True:
-            print(
+            ui.backend.print(
                 f"\nCATEGORY WITH NAME '{name}' ALREADY EXISTS - CHOOSE A DIFFERENT NAME"
             )
             continue_enter()
@@ -422,27 +773,92 @@ def delete_category_ui(category):
         category (str): The category to be deleted.
     """
     new_screen()
+    take_snapshot(f"BEFORE DELETING CATEGORY {category}")
     box.delete_category(category)
-    for card in box.cards:
-        if card.category == category:
-            box.cards.remove(card)
-    print(f"CATEGORY '{category} DELETED")
+    box.delete_cards_in_category(category)
+    ui.backend.print(f"CATEGORY '{category} DELETED")
     continue_enter()
 
 
-def show_card_ui(card_question):
+def take_snapshot(label, save_folder="data"):
+    """
+    Takes a snapshot of the box before a mass deletion (see snapshots.py) and tells the user how to undo it.
+
+    Args:
+        label (str): A description of the snapshot.
+        save_folder (str, optional): The subfolder in root with the save files. Defaults to 'data'.
+    """
+    number, _ = snapshots.SnapshotStore(box.name, save_folder).snapshot(box, label)
+    ui.backend.print(
+        f"SNAPSHOT {number} TAKEN - UNDO WITH 'python snapshots.py restore {box.name} {number}'\n"
+    )
+
+
+def show_card_ui(card_id):
     """
     Menu action for "SHOW FLASHCARDS".
-    Displays the details of a flashcard identified by its question.
+    Displays the details of a flashcard identified by its ID.
 
     Args:
-        card_question (str): The question of an existing flashcard.
+        card_id (int): The ID of an existing flashcard.
     """
+    card = get_existing_card(card_id)
+    if card is None:
+        return
     new_screen()
-    box.print_card(card_question)
+    box.print_card(card_id, ui.backend.output)
+    print_attachments(card)
     continue_enter()
 
 
+def print_attachments(card, save_folder="data"):
+    """
+    Prints the attachments of a flashcard with the path and size of their blobs.
+    Blobs are not read, only looked up in the blob store of the save folder.
+
+    Args:
+        card (Card): The flashcard.
+        save_folder (str, optional): The folder with the save files and the blob store. Defaults to 'data'.
+    """
+    if not card.attachments:
+        return
+    store = blobs.BlobStore(os.path.join(save_folder, "blobs"))
+    ui.backend.print("\nATTACHMENTS:")
+    for attachment in card.attachments:
+        size = store.size(attachment["blob"])
+        if size is None:
+            ui.backend.print(f"{attachment['name']}: MISSING")
+        else:
+            path = store.path(attachment["blob"])
+            ui.backend.print(f"{attachment['name']}: {path} ({size} BYTES)")
+
+
+def attach_file_ui(card_id, save_folder="data"):
+    """
+    Menu action for "ATTACH FILE".
+    Stores a file in the blob store and attaches it to a flashcard identified by its ID.
+
+    Args:
+        card_id (int): The ID of an existing flashcard.
+        save_folder (str, optional): The folder with the save files and the blob store. Defaults to 'data'.
+    """
+    with pause_watcher():
+        if get_existing_card(card_id) is None:
+            return
+        new_screen()
+        # file paths are case-sensitive, so the input is not cleaned
+        file_path = ui.backend.input("ENTER PATH OF THE FILE TO ATTACH: ").strip()
+        store = blobs.BlobStore(os.path.join(save_folder, "blobs"))
+        try:
+            blobs.attach_file(box, card_id, file_path, store)
+            ui.backend.print(f"\nFILE '{os.path.basename(file_path)}' ATTACHED")
+        except OSError:
+            ui.backend.print(
+                f"\nCOULD NOT READ '{file_path}' - MAKE SURE THE FILE EXISTS"
+            )
+        continue_enter()
+
+
 def new_card_ui(category):
     """
     Menu action for "NEW FLASHCARD".
@@ -452,27 +868,167 @@ def new_card_ui(category):
         category (str): The category the flashcard is associated with.
     """
     question = get_input("ENTER", "QUESTION")
+    if box.check_card(question) == True:
+        ui.backend.print(
+            f"\nFLASHCARD '{question}' ALREADY EXISTS - CHOOSE A DIFFERENT QUESTION"
+        )
+        continue_enter()
+        return
     answer = get_input("ENTER", "ANSWER")
     new_screen()
     box.add_card(question, answer, category)
-    print(f"\nNEW FLASHCARD '{question}' CREATED")
+    ui.backend.print(f"\nNEW FLASHCARD '{question}' CREATED")
     continue_enter()
 
 
-def delete_card_ui(card_question):
+def edit_card_ui(card_id):
+    """
+    Menu action for "EDIT FLASHCARD".
+    Changes question and answer of a flashcard identified by its ID. Empty input keeps the current text.
+
+    Args:
+        card_id (int): The ID of an existing flashcard.
+    """
+    with pause_watcher():
+        card = get_existing_card(card_id)
+        if card is None:
+            return
+        question = get_input("ENTER NEW QUESTION (EMPTY TO KEEP) FOR", card.question)
+        answer = get_input("ENTER NEW ANSWER (EMPTY TO KEEP) FOR", card.answer)
+        new_screen()
+        try:
+            box.edit_card(card_id, question or None, answer or None)
+            ui.backend.print(f"\nFLASHCARD '{card.question}' CHANGED")
+        except ValueError:
+            ui.backend.print(
+                f"\nFLASHCARD '{question}' ALREADY EXISTS - CHOOSE A DIFFERENT QUESTION"
+            )
+        continue_enter()
+
+
+def delete_card_ui(card_id):
     """
     Menu action for "DELETE FLASHCARD".
-    Deletes a flashcard identified by its question.
+    Deletes a flashcard identified by its ID.
 
     Args:
-        card_question (str): The question of an existing flashcard.
+        card_id (int): The ID of an existing flashcard.
     """
-    new_screen()
-    box.delete_card(card_question)
-    print(f"\nFLASHCARD DELETED")
+    with pause_watcher():
+        if get_existing_card(card_id) is None:
+            return
+        new_screen()
+        box.delete_card(card_id)
+        ui.backend.print(f"\nFLASHCARD DELETED")
+        continue_enter()
+
+
+def delete_filter_ui():
+    """
+    Menu action for "DELETE BY FILTER".
+    Deletes all flashcards matching a filter expression after asking user for confirmation.
+    """
+    cards = filter_cards_ui()
+    if not cards:
+        return
+    if get_input_yes_no(f"DELETE {len(cards)} FLASHCARDS") == True:
+        new_screen()
+        take_snapshot("BEFORE DELETE BY FILTER")
+        deleted = box.delete_cards([card.id for card in cards])
+        ui.backend.print(f"\n{deleted} FLASHCARDS DELETED")
+    else:
+        ui.backend.print(f"\nNO FLASHCARDS DELETED")
     continue_enter()
 
 
+def change_levels_category_ui(category):
+    """
+    Menu action for "CHANGE LEVELS > BY CATEGORY".
+    Changes the levels of all flashcards in a category (see change_levels_ui).
+
+    Args:
+        category (str): The category of the flashcards.
+    """
+    change_levels_ui(category=category)
+
+
+def change_levels_level_ui(level):
+    """
+    Menu action for "CHANGE LEVELS > BY LEVEL".
+    Changes the levels of all flashcards in a level (see change_levels_ui).
+
+    Args:
+        level (int): The level of the flashcards.
+    """
+    change_levels_ui(level=level)
+
+
+def change_levels_ui(category=None, level=None):
+    """
+    Prompts the user for a new level, a shift or a reset and applies it to all flashcards in a category or level
+    after asking for confirmation. Takes a snapshot of the box first.
+
+    Args:
+        category (str, optional): The category of the flashcards. Defaults to None.
+        level (int, optional): The level of the flashcards. Defaults to None.
+    """
+    if category is not None:
+        scope = f"CATEGORY '{category}'"
+        count = len(box.list_card_obj_in_category(category))
+    else:
+        scope = f"LEVEL {level}"
+        count = len(box.list_card_obj_in_level(level))
+    if count == 0:
+        ui.backend.print("\nNO CARDS HERE")
+        continue_enter()
+        return
+    text = get_input(
+        "ENTER", "NEW LEVEL (1-10), +N OR -N TO SHIFT, 'R' TO RESET OR 'X' TO GO BACK"
+    )
+    if text == "X":
+        return
+    change = parse_level_change(text)
+    if change is None:
+        ui.backend.print(f"\nINVALID INPUT - TYPE A LEVEL FROM 1 TO 10, +N, -N OR 'R'")
+    elif get_input_yes_no(f"CHANGE THE LEVEL OF {count} FLASHCARDS IN {scope}") == True:
+        new_screen()
+        take_snapshot(f"BEFORE CHANGING LEVELS IN {scope}")
+        operation, value = change
+        if operation == "SET":
+            changed = box.set_levels(value, category, level)
+        else:
+            changed = box.shift_levels(value, category, level)
+        ui.backend.print(f"{changed} FLASHCARDS CHANGED")
+    else:
+        ui.backend.print(f"\nNO FLASHCARDS CHANGED")
+    continue_enter()
+
+
+def parse_level_change(user_input):  # test
+    """
+    Parses the change of levels typed by the user: a level to set, a shift like '+2' or '-1', or 'R' to reset.
+
+    Args:
+        user_input (str): The cleaned input.
+
+    Returns:
+        tuple: 'SET' and the new level or 'SHIFT' and the number of levels. None if the input is invalid.
+    """
+    if user_input == "R":
+        return ("SET", 1)
+    match = re.fullmatch(r"([+-]?)(\d+)", user_input)
+    if match is None:
+        return None
+    sign, number = match.group(1), int(match.group(2))
+    if sign == "+":
+        return ("SHIFT", number)
+    if sign == "-":
+        return ("SHIFT", -number)
+    if 1 <= number <= 10:
+        return ("SET", number)
+    return None
+
+
 # ______functions related to the PROGRESS Menu______
 # allow users to track progress for the whole box or a specific category
 
@@ -481,20 +1037,18 @@ def progress_ui(list_cards=None):
     """
     Menu action for "PROGRESS TOTAL".
     Displays the recent state of the box by listing the number of flashcards within each level.
-    If no specific list provided, shows result for all flashcards (box.cards).
+    If no specific list provided, shows result for all flashcards of the box.
 
     Args:
         list_cards (list, optional): List of flashcards to consider. Defaults to None.
     """
-    if list_cards is None:
-        list_cards = box.cards
     new_screen()
     cards_per_level = box.count_cards_level(list_cards)
-    print("FLASHCARDS PER LEVEL:\n")
+    ui.backend.print("FLASHCARDS PER LEVEL:\n")
     for level, count in cards_per_level.items():
         formatted_level = f"{level:02}"
-        print(f"LEVEL {formatted_level}: {count}")
-    input("\nPRESS 'ENTER' TO GO BACK")
+        ui.backend.print(f"LEVEL {formatted_level}: {count}")
+    ui.backend.input("\nPRESS 'ENTER' TO GO BACK")
 
 
 def progress_category(category):
@@ -509,6 +1063,16 @@ def progress_category(category):
     progress_ui(cards_in_category)
 
 
+def progress_filter_ui():
+    """
+    Menu action for "BY FILTER".
+    Passes all flashcards matching a filter expression to progress_ui.
+    """
+    cards = filter_cards_ui()
+    if cards is not None:
+        progress_ui(cards)
+
+
 # ______functions related to SAVE and EXIT______
 # allow users to save the current flashcard box and progress
 # allow users to exit the application
@@ -522,16 +1086,50 @@ def save_box_ui():
     while True:
         if get_input_yes_no("SAVE") == True:
             save_folder = "data"
-            box.save_to_json(save_folder)
-            print(f"\nBOX {box.name} SAVED")
+            if watcher is not None and watcher.box is box:
+                save_watched_box()
+            else:
+                box.save_to_json(save_folder)
+                ui.backend.print(f"\nBOX {box.name} SAVED")
+            error = search.update_saved(box, save_folder)
+            if error is not None:
+                ui.backend.print(f"\nSEARCH INDEX NOT UPDATED - {str(error).upper()}")
             continue_enter()
             break
         else:
-            print(f"\nBOX NOT SAVED")
+            ui.backend.print(f"\nBOX NOT SAVED")
             continue_enter()
             break
 
 
+def save_watched_box():
+    """
+    Saves the current box after merging the changes other programs made to its save file (see watch.py).
+    If the save file is damaged, the user can overwrite it.
+    """
+    try:
+        merged = watcher.save()
+    except ValueError as e:
+        ui.backend.print(f"\nTHE FILE OF BOX {box.name} WAS CHANGED AND IS DAMAGED:\n")
+        ui.backend.print(e)
+        if get_input_yes_no("OVERWRITE") != True:
+            ui.backend.print(f"\nBOX NOT SAVED")
+            return
+        merged = watcher.save(overwrite=True)
+    ui.backend.print(f"\nBOX {box.name} SAVED")
+    changes = sum(
+        merged.get(key, 0) for key in ("added", "updated", "removed", "levels")
+    )
+    if changes:
+        ui.backend.print(
+            f"\n{changes} CHANGES BY OTHER PROGRAMS MERGED FROM THE FILE ON DISK"
+        )
+    if merged.get("kept"):
+        ui.backend.print(
+            f"\n{merged['kept']} CHANGES ON DISK CONFLICTED WITH UNSAVED CHANGES - UNSAVED CHANGES KEPT"
+        )
+
+
 def exit_app_ui():
     """
     Menu action for "EXIT".
@@ -540,11 +1138,13 @@ def exit_app_ui():
     while True:
         new_screen()
         if get_input_yes_no("QUIT") == True:
-            print(f"\nTHANK YOU FOR USING 'FLASH LINE_' - COME BACK SOON")
+            ui.backend.print(f"\nTHANK YOU FOR USING 'FLASH LINE_' - COME BACK SOON")
             print_line_h()
-            print(f"\n© 2023 ALEXANDER KADUR")
+            ui.backend.print(f"\n© 2023 ALEXANDER KADUR")
             continue_enter()
             clear_screen()
+            if watcher is not None:
+                watcher.stop()
             sys.exit()
         else:
             break
@@ -560,6 +1160,7 @@ title_menu = Menu(
     {
         "NEW BOX": new_box_ui,
         "LOAD BOX": Selector("BOXES", list_save_files(), load_box_ui),
+        "SEARCH BOXES": search_boxes_ui,
         "EXIT": exit_app_ui,
     },
 )
@@ -577,6 +1178,10 @@ def run_main(box):
                         "CATEGORIES", box.categories, learn_category
                     ),
                     "LEARN LEVEL": Selector("LEVELS", box.levels, learn_level),
+                    "LEARN ADAPTIVE": learn_adaptive_ui,
+                    "LEARN FILTER": learn_filter_ui,
+                    "LEARN BATCH": learn_batch_ui,
+                    "RESUME SESSION": resume_session_ui,
                     "BACK": None,
                 },
             ),
@@ -591,19 +1196,58 @@ def run_main(box):
                         "CATEGORIES",
                         box.categories,
                         Selector(
-                            "FLASHCARDS", box.list_cards_in_category, show_card_ui
+                            "FLASHCARDS",
+                            box.list_card_ids_in_category,
+                            show_card_ui,
+                            box.get_question,
                         ),
                     ),
                     "NEW FLASHCARD": Selector(
                         "CATEGORIES", box.categories, new_card_ui
                     ),
+                    "EDIT FLASHCARD": Selector(
+                        "CATEGORIES",
+                        box.categories,
+                        Selector(
+                            "FLASHCARDS",
+                            box.list_card_ids_in_category,
+                            edit_card_ui,
+                            box.get_question,
+                        ),
+                    ),
+                    "ATTACH FILE": Selector(
+                        "CATEGORIES",
+                        box.categories,
+                        Selector(
+                            "FLASHCARDS",
+                            box.list_card_ids_in_category,
+                            attach_file_ui,
+                            box.get_question,
+                        ),
+                    ),
                     "DELETE FLASHCARD": Selector(
                         "CATEGORIES",
                         box.categories,
                         Selector(
-                            "FLASHCARDS", box.list_cards_in_category, delete_card_ui
+                            "FLASHCARDS",
+                            box.list_card_ids_in_category,
+                            delete_card_ui,
+                            box.get_question,
                         ),
                     ),
+                    "DELETE BY FILTER": delete_filter_ui,
+                    "CHANGE LEVELS": Menu(
+                        "MAIN MENU > CREATE & MANAGE > CHANGE LEVELS:",
+                        {
+                            "BY CATEGORY": Selector(
+                                "CATEGORIES", box.categories, change_levels_category_ui
+                            ),
+                            "BY LEVEL": Selector(
+                                "LEVELS", box.levels, change_levels_level_ui
+                            ),
+                            "BACK": None,
+                        },
+                    ),
                     "BACK": None,
                 },
             ),
@@ -614,6 +1258,7 @@ def run_main(box):
                     "BY CATEGORY": Selector(
                         "CATEGORIES", box.categories, progress_category
                     ),
+                    "BY FILTER": progress_filter_ui,
                     "BACK": None,
                 },
             ),
@@ -621,6 +1266,13 @@ def run_main(box):
             "EXIT": exit_app_ui,
         },
     )
+    if isinstance(box, deck.DeckBox):
+        manage_menu = main_menu.options["CREATE & MANAGE"]
+        manage_menu.options = {
+            key: option
+            for key, option in manage_menu.options.items()
+            if key in DECK_MANAGE_OPTIONS
+        }
 
     main_menu.run()
 
@@ -0,0 +1,509 @@
+import re
+
+import metrics
+
+"""
+The `query.py` script selects flashcards with filter expressions, e.g.:
+
+    category in ("ANIMAL SOUNDS", VERBS) and level <= 3 and question ~ "^DUCK"
+
+Comparisons: `=`, `!=`, `<`, `<=`, `>`, `>=`, `in (...)`, `not in (...)` and `~` (regular expression search).
+Fields: category, question, answer, level, failures and id. Comparisons are combined with `and`, `or`, `not` and parentheses.
+Keywords and fields are case-insensitive. Text is written in quotes, a single word can be written without.
+In quotes, only the quote and the backslash are escaped with a backslash, other backslashes are kept for patterns.
+
+A small planner turns an expression into lookups in the indexes of the box (category, level, question and ID)
+and intersects them, so only the matching part of the box is touched. Comparisons without an index filter the candidates.
+Only if no index applies, the whole box is scanned. The chosen plan is reported with the result.
+"""
+
+# ____________________
+
+
+class QueryError(ValueError):
+    """
+    Raised if a filter expression is invalid.
+    """
+
+
+FIELDS = {
+    "category": str,
+    "question": str,
+    "answer": str,
+    "level": int,
+    "failures": int,
+    "id": int,
+}
+
+COMPARISONS = {
+    "=": lambda value, other: value == other,
+    "!=": lambda value, other: value != other,
+    "<": lambda value, other: value < other,
+    "<=": lambda value, other: value <= other,
+    ">": lambda value, other: value > other,
+    ">=": lambda value, other: value >= other,
+    "in": lambda value, other: value in other,
+    "not in": lambda value, other: value not in other,
+    "~": lambda value, other: other.search(value) is not None,
+}
+
+TOKEN = re.compile(
+    r"""\s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+        |(?P<number>\d+(?![\w-]))
+        |(?P<operator><=|>=|!=|==|=|<|>|~|\(|\)|,)
+        |(?P<word>[^\s"'(),=!<>~]+)
+    )""",
+    re.VERBOSE,
+)
+
+
+def tokenize(expression):
+    """
+    Splits a filter expression into tokens.
+
+    Args:
+        expression (str): The filter expression.
+
+    Returns:
+        list: Tokens as tuples of kind ('string', 'number', 'operator' or 'word') and value.
+
+    Raises:
+        QueryError: If the expression contains an unterminated string.
+    """
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if match is None:
+            raise QueryError(f"unexpected '{expression[position:].strip()}'")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            # only the quote and the backslash are escaped, so patterns like "\d" keep their backslash
+            quote = value[0]
+            value = re.sub(rf"\\([\\{quote}])", r"\1", value[1:-1])
+        elif kind == "operator" and value == "==":
+            value = "="
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+# ______Expressions______
+
+
+class Comparison:
+    """
+    Compares a field of every flashcard with a value.
+
+    Attributes:
+        field (str): The field of the flashcard.
+        operator (str): The comparison, a key of COMPARISONS.
+        value: The value to compare with. A frozenset for 'in', a compiled pattern for '~'.
+        text (str): The comparison as written, for reporting.
+    """
+
+    def __init__(self, field, operator, value, text):
+        self.field = field
+        self.operator = operator
+        self.value = value
+        self.text = text
+        self.compare = COMPARISONS[operator]
+
+    def matches(self, card):
+        """
+        Checks if a flashcard matches the comparison.
+        """
+        return self.compare(getattr(card, self.field), self.value)
+
+    def candidates(self, box):
+        """
+        Looks up the IDs of all flashcards that can match the comparison in the indexes of the box.
+        Caller must hold the lock of the box for reading and its level lock.
+
+        Args:
+            box (Box): The box to search.
+
+        Returns:
+            tuple: The IDs (a set, or None for all flashcards) and whether all of them match.
+        """
+        if self.field == "level":
+            levels = [level for level in box.levels if self.compare(level, self.value)]
+            return set().union(*(box.level_cards[level] for level in levels)), True
+        if self.operator not in ("=", "in"):
+            return None, False
+        values = [self.value] if self.operator == "=" else self.value
+        if self.field == "category":
+            return {
+                card.id
+                for value in values
+                for card in box.category_cards.get(value, [])
+            }, True
+        if self.field == "question":
+            return {box.questions[v].id for v in values if v in box.questions}, True
+        if self.field == "id":
+            return {value for value in values if value in box.ids}, True
+        return None, False
+
+    def describe(self):
+        return self.text
+
+
+class And:
+    """
+    Matches flashcards that match all parts.
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    def matches(self, card):
+        return all(part.matches(card) for part in self.parts)
+
+    def candidates(self, box):
+        """
+        Intersects the candidates of all parts, smallest first. Parts without an index do not narrow the result.
+        """
+        results = [part.candidates(box) for part in self.parts]
+        indexed = sorted((ids for ids, _ in results if ids is not None), key=len)
+        if not indexed:
+            return None, False
+        ids = set(indexed[0])
+        for other in indexed[1:]:
+            ids &= other
+        return ids, all(exact for _, exact in results)
+
+    def describe(self):
+        return " AND ".join(describe_part(part) for part in self.parts)
+
+
+class Or:
+    """
+    Matches flashcards that match any part.
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    def matches(self, card):
+        return any(part.matches(card) for part in self.parts)
+
+    def candidates(self, box):
+        """
+        Unites the candidates of all parts. If one part has no index, every flashcard is a candidate.
+        """
+        results = [part.candidates(box) for part in self.parts]
+        if any(ids is None for ids, _ in results):
+            return None, False
+        return set().union(*(ids for ids, _ in results)), all(
+            exact for _, exact in results
+        )
+
+    def describe(self):
+        return " OR ".join(describe_part(part) for part in self.parts)
+
+
+class Not:
+    """
+    Matches flashcards that do not match its part.
+    """
+
+    def __init__(self, part):
+        self.part = part
+
+    def matches(self, card):
+        return not self.part.matches(card)
+
+    def candidates(self, box):
+        return None, False
+
+    def describe(self):
+        return f"NOT {describe_part(self.part)}"
+
+
+def describe_part(part):
+    """
+    Describes a part of an expression, in parentheses if it combines several parts.
+    """
+    if isinstance(part, (And, Or)):
+        return f"({part.describe()})"
+    return part.describe()
+
+
+# ______Parsing______
+
+
+class Parser:
+    """
+    Parses a list of tokens into an expression by recursive descent.
+
+    Grammar:
+        or         = and { 'or' and }
+        and        = not { 'and' not }
+        not        = 'not' not | '(' or ')' | comparison
+        comparison = field operator value | field ['not'] 'in' '(' value { ',' value } ')'
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def next(self, description):
+        if self.position >= len(self.tokens):
+            raise QueryError(f"expected {description} at the end")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def keyword(self, word):
+        """
+        Consumes the next token if it is a keyword, case-insensitive.
+        """
+        kind, value = self.peek()
+        if kind == "word" and value.lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, operator):
+        kind, value = self.next(f"'{operator}'")
+        if kind != "operator" or value != operator:
+            raise QueryError(f"expected '{operator}', not '{value}'")
+
+    def parse(self):
+        expression = self.parse_or()
+        if self.position < len(self.tokens):
+            raise QueryError(f"unexpected '{self.tokens[self.position][1]}'")
+        return expression
+
+    def parse_or(self):
+        parts = [self.parse_and()]
+        while self.keyword("or"):
+            parts.append(self.parse_and())
+        return parts[0] if len(parts) == 1 else Or(parts)
+
+    def parse_and(self):
+        parts = [self.parse_not()]
+        while self.keyword("and"):
+            parts.append(self.parse_not())
+        return parts[0] if len(parts) == 1 else And(parts)
+
+    def parse_not(self):
+        if self.keyword("not"):
+            return Not(self.parse_not())
+        if self.peek() == ("operator", "("):
+            self.position += 1
+            expression = self.parse_or()
+            self.expect(")")
+            return expression
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        kind, field = self.next("a field")
+        if kind != "word" or field.lower() not in FIELDS:
+            raise QueryError(
+                f"unknown field '{field}', use one of {', '.join(FIELDS).upper()}"
+            )
+        field = field.lower()
+        field_type = FIELDS[field]
+
+        if self.keyword("in"):
+            operator = "in"
+        elif self.keyword("not"):
+            if not self.keyword("in"):
+                raise QueryError("expected 'in' after 'not'")
+            operator = "not in"
+        else:
+            kind, operator = self.next("a comparison")
+            if kind != "operator" or operator not in COMPARISONS:
+                raise QueryError(f"expected a comparison, not '{operator}'")
+
+        if operator in ("in", "not in"):
+            self.expect("(")
+            values = [self.parse_value(field, field_type)]
+            while self.peek() == ("operator", ","):
+                self.position += 1
+                values.append(self.parse_value(field, field_type))
+            self.expect(")")
+            value = frozenset(values)
+            text = f"{field.upper()} {operator.upper()} ({', '.join(map(format_value, values))})"
+        elif operator == "~":
+            if field_type is not str:
+                raise QueryError(f"'~' needs a text field, not {field.upper()}")
+            pattern = self.parse_value(field, str)
+            try:
+                value = re.compile(pattern)
+            except re.error as e:
+                raise QueryError(f"invalid pattern '{pattern}': {e}") from e
+            text = f"{field.upper()} ~ {format_value(pattern)}"
+        else:
+            value = self.parse_value(field, field_type)
+            text = f"{field.upper()} {operator} {format_value(value)}"
+        return Comparison(field, operator, value, text)
+
+    def parse_value(self, field, field_type):
+        kind, value = self.next("a value")
+        if field_type is int:
+            if kind != "number":
+                raise QueryError(f"{field.upper()} needs a number, not '{value}'")
+            return int(value)
+        if kind not in ("string", "word", "number"):
+            raise QueryError(f"expected a value, not '{value}'")
+        return value
+
+
+def format_value(value):
+    """
+    Formats a value for reporting, text in quotes.
+    """
+    if isinstance(value, str):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return str(value)
+
+
+def parse(expression):
+    """
+    Parses a filter expression.
+
+    Args:
+        expression (str): The filter expression.
+
+    Returns:
+        Comparison, And, Or or Not: The parsed expression.
+
+    Raises:
+        QueryError: If the expression is invalid.
+    """
+    tokens = tokenize(expression)
+    if not tokens:
+        raise QueryError("empty filter")
+    return Parser(tokens).parse()
+
+
+# ______Planning______
+
+
+class Plan:
+    """
+    The result of a filter and how it was found.
+
+    Attributes:
+        cards (list): The matching flashcards, in the order of the box for a scan and by ID otherwise.
+        steps (list): Descriptions of the steps taken.
+        touched (int): Number of flashcards taken from the indexes or the scan.
+    """
+
+    def __init__(self):
+        self.cards = []
+        self.steps = []
+        self.touched = 0
+
+    def describe(self):
+        """
+        Returns the steps of the plan as one line each.
+        """
+        return "\n".join(self.steps)
+
+
+def categories(part):
+    """
+    Returns the categories a flashcard must be in to match a part of an expression, used to load only these categories.
+
+    Args:
+        part: The parsed expression or a part of it.
+
+    Returns:
+        set: The categories, or None if flashcards of any category can match.
+    """
+    if isinstance(part, Comparison):
+        if part.field == "category" and part.operator == "=":
+            return {part.value}
+        if part.field == "category" and part.operator == "in":
+            return set(part.value)
+        return None
+    if isinstance(part, And):
+        constraints = [categories(inner) for inner in part.parts]
+        constraints = [
+            constraint for constraint in constraints if constraint is not None
+        ]
+        return set.intersection(*constraints) if constraints else None
+    if isinstance(part, Or):
+        constraints = [categories(inner) for inner in part.parts]
+        if None in constraints:
+            return None
+        return set().union(*constraints)
+    return None
+
+
+def select(box, expression):
+    """
+    Selects all flashcards of a box that match a filter expression.
+    Looks up candidates in the indexes and checks only the candidates one by one, or scans the box if no index applies.
+
+    Args:
+        box (Box): The box to search.
+        expression (str): The filter expression.
+
+    Returns:
+        Plan: The matching flashcards and the plan that found them.
+
+    Raises:
+        QueryError: If the expression is invalid.
+    """
+    parsed = parse(expression)
+    plan = Plan()
+    box.ensure_loaded(categories(parsed))
+    with box.lock.read():
+        with box.level_lock:
+            if isinstance(parsed, And):
+                results = [part.candidates(box) for part in parsed.parts]
+                for part, (ids, _) in zip(parsed.parts, results):
+                    if ids is not None:
+                        plan.steps.append(
+                            f"INDEX {describe_part(part)}: {len(ids)} CARDS"
+                        )
+                indexed = sorted(
+                    (ids for ids, _ in results if ids is not None), key=len
+                )
+                ids = None
+                if indexed:
+                    ids = set(indexed[0])
+                    for other in indexed[1:]:
+                        ids &= other
+                    if len(indexed) > 1:
+                        plan.steps.append(f"INTERSECT: {len(ids)} CARDS")
+                filters = [
+                    part for part, (_, exact) in zip(parsed.parts, results) if not exact
+                ]
+            else:
+                ids, exact = parsed.candidates(box)
+                if ids is not None:
+                    plan.steps.append(f"INDEX {parsed.describe()}: {len(ids)} CARDS")
+                filters = [] if exact else [parsed]
+
+        if ids is None:
+            candidates = box.cards
+            plan.steps.append(f"SCAN ALL {len(candidates)} CARDS")
+        else:
+            candidates = [box.ids[card_id] for card_id in sorted(ids)]
+        plan.touched = len(candidates)
+        if filters:
+            plan.cards = [
+                card
+                for card in candidates
+                if all(part.matches(card) for part in filters)
+            ]
+            description = " AND ".join(describe_part(part) for part in filters)
+            plan.steps.append(f"FILTER {description}: {len(plan.cards)} CARDS")
+        else:
+            plan.cards = list(candidates)
+    if metrics.enabled:
+        metrics.count("cards_touched_total", plan.touched, query="filter")
+    return plan
@@ -0,0 +1,190 @@
+import random
+
+"""
+The `sampling.py` script provides weighted random sampling of flashcards for adaptive learning.
+Flashcards with a low level and flashcards that were often answered wrong are drawn more often.
+It defines a Fenwick tree (binary indexed tree), called `FenwickTree`, and a sampler on top of it, called `WeightedSampler`.
+Drawing a flashcard and updating its weight both take O(log n), so sampling stays fast for very large boxes.
+"""
+
+# ____________________
+
+
+def card_weight(card):
+    """
+    Computes the sampling weight of a flashcard. Weights are integers, so the sums in the tree stay exact.
+    A flashcard in level 1 weighs 10 times more than one in level 10, every failure (up to 10) adds the base weight again.
+
+    Args:
+        card (Card): The flashcard.
+
+    Returns:
+        int: The weight of the flashcard.
+    """
+    return (11 - card.level) * (1 + min(card.failures, 10))
+
+
+# ____________________
+
+
+class FenwickTree:
+    """
+    A Fenwick tree over a list of non-negative integer weights.
+    Supports updating a weight and finding the position of a cumulative weight in O(log n).
+
+    Attributes:
+        size (int): Number of weights.
+        tree (list): The partial sums. Position 0 is unused.
+        weights (list): The current weights.
+    """
+
+    def __init__(self, weights):
+        """
+        Builds the tree from a list of weights in O(n).
+
+        Args:
+            weights (list): The initial weights.
+        """
+        self.size = len(weights)
+        self.weights = list(weights)
+        self.tree = [0] + self.weights
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def total(self):
+        """
+        Returns the sum of all weights.
+
+        Returns:
+            int: The total weight.
+        """
+        return self.prefix_sum(self.size)
+
+    def prefix_sum(self, count):
+        """
+        Returns the sum of the first weights.
+
+        Args:
+            count (int): Number of weights to sum up.
+
+        Returns:
+            int: The sum.
+        """
+        result = 0
+        while count > 0:
+            result += self.tree[count]
+            count -= count & -count
+        return result
+
+    def set(self, index, weight):
+        """
+        Sets the weight at a position.
+
+        Args:
+            index (int): The position of the weight.
+            weight (int): The new weight.
+        """
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, value):
+        """
+        Finds the position whose cumulative weight range contains a value.
+
+        Args:
+            value (int): A value with 0 <= value < total().
+
+        Returns:
+            int: The position of the weight.
+        """
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= value:
+                position = next_position
+                value -= self.tree[next_position]
+            step >>= 1
+        return position
+
+
+# ____________________
+
+
+class WeightedSampler:
+    """
+    Draws flashcards at random, proportionally to their weight.
+
+    Attributes:
+        cards (list): The flashcards to draw from.
+        positions (dict): Position of each flashcard in cards, by ID.
+        weight_function (function): Computes the weight of a flashcard.
+        tree (FenwickTree): The weights of all flashcards.
+    """
+
+    def __init__(self, cards, weight_function=card_weight):
+        """
+        Initializes the sampler in O(n).
+
+        Args:
+            cards (list): The flashcards to draw from.
+            weight_function (function, optional): Computes the weight of a flashcard. Defaults to card_weight.
+        """
+        self.cards = list(cards)
+        self.positions = {card.id: i for i, card in enumerate(self.cards)}
+        self.weight_function = weight_function
+        self.tree = FenwickTree([weight_function(card) for card in self.cards])
+
+    def draw(self):
+        """
+        Draws a flashcard.
+
+        Returns:
+            Card: The drawn flashcard, or None if all weights are 0.
+        """
+        total = self.tree.total()
+        if total <= 0:
+            return None
+        return self.cards[self.tree.find(random.randrange(total))]
+
+    def update(self, card):
+        """
+        Recomputes the weight of a flashcard, e.g. after its level changed.
+
+        Args:
+            card (Card): The flashcard.
+        """
+        self.tree.set(self.positions[card.id], self.weight_function(card))
+
+    def remove(self, card):
+        """
+        Excludes a flashcard from further draws.
+
+        Args:
+            card (Card): The flashcard.
+        """
+        self.tree.set(self.positions[card.id], 0)
+
+    def draws(self, count):
+        """
+        Draws a number of flashcards. The weight of every flashcard is updated before the next draw,
+        so the caller can change its level in between.
+
+        Args:
+            count (int): Number of flashcards to draw.
+
+        Yields:
+            Card: The drawn flashcards.
+        """
+        for _ in range(count):
+            card = self.draw()
+            if card is None:
+                break
+            yield card
+            self.update(card)
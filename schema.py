@@ -0,0 +1,249 @@
+"""
+The `schema.py` script describes the save format of a flashcard box.
+Every save file carries a schema version. Older files are migrated to the current version when they are loaded,
+and every file is validated in a single pass over its cards, so damaged files fail at load instead of mid-session.
+
+Versions:
+    1: The original format without a version field. Cards have category, question, answer and level.
+    2: Cards have an ID, failures and the time of their last review. The box has next_id.
+       Cards can have 'attachments', a list of file names and blob hashes.
+
+A file can store its categories as a column: the box has a 'category_table' with every category once,
+and the 'category' of every card is the number of its category in the table.
+Loading expands the column before migrating and validating the box.
+"""
+
+# ____________________
+
+SCHEMA_VERSION = 2
+
+
+class SchemaError(ValueError):
+    """
+    Raised if a save file does not match the schema.
+
+    Attributes:
+        errors (list): All problems found, as tuples of position (card index or None for the box) and description.
+    """
+
+    def __init__(self, errors):
+        """
+        Initializes a new SchemaError.
+
+        Args:
+            errors (list): All problems found.
+        """
+        self.errors = errors
+        lines = [
+            f"card {position}: {message}" if position is not None else message
+            for position, message in errors
+        ]
+        super().__init__(f"{len(errors)} problem(s) in save file:\n" + "\n".join(lines))
+
+
+# ______Migrations______
+
+
+def migrate_1_to_2(data):
+    """
+    Gives every card an ID, failures and the time of its last review, and the box its next_id.
+
+    Args:
+        data (dict): A box in version 1. Changed in place.
+    """
+    cards = [card for card in data.get("cards", []) if isinstance(card, dict)]
+    # cards that already have an ID keep it, new IDs start after the highest one
+    next_id = (
+        max([card["id"] for card in cards if is_int(card.get("id"))], default=0) + 1
+    )
+    for card in cards:
+        if "id" not in card:
+            card["id"] = next_id
+            next_id += 1
+        card.setdefault("failures", 0)
+        card.setdefault("last_review", None)
+    if is_int(data.get("next_id")):
+        data["next_id"] = max(data["next_id"], next_id)
+    else:
+        data.setdefault("next_id", next_id)
+
+
+# Migrations by the version they migrate from
+MIGRATIONS = {
+    1: migrate_1_to_2,
+}
+
+
+def migrate(data):
+    """
+    Migrates a box to the current schema version in place.
+
+    Args:
+        data (dict): A box in any known version.
+
+    Raises:
+        SchemaError: If the version is unknown or newer than this application.
+    """
+    version = data.get("version", 1)
+    if not isinstance(version, int) or not 1 <= version <= SCHEMA_VERSION:
+        raise SchemaError(
+            [(None, f"unknown schema version {version!r}, newest is {SCHEMA_VERSION}")]
+        )
+    while version < SCHEMA_VERSION:
+        MIGRATIONS[version](data)
+        version += 1
+    data["version"] = version
+
+
+# ______Category column______
+
+
+def encode_categories(data):
+    """
+    Stores the categories of all cards as a column, each card refers to its category by number.
+
+    Args:
+        data (dict): A box in the current version. Changed in place.
+    """
+    codes = {}
+    for card in data["cards"]:
+        card["category"] = codes.setdefault(card["category"], len(codes))
+    data["category_table"] = list(codes)
+
+
+def decode_categories(data):
+    """
+    Expands a category column back to the category names. Does nothing if the box has no column.
+    Numbers outside of the table are kept, so validation reports them.
+
+    Args:
+        data (dict): A box in any version. Changed in place.
+    """
+    table = data.pop("category_table", None)
+    if not isinstance(table, list):
+        return
+    for card in data.get("cards", []):
+        if isinstance(card, dict):
+            code = card.get("category")
+            if is_int(code) and 0 <= code < len(table):
+                card["category"] = table[code]
+
+
+# ______Validation______
+
+
+def is_int(value):
+    """
+    Checks if a value is an integer (bool does not count).
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_blob(value):
+    """
+    Checks if a value is the hash of a blob, 64 lowercase hex digits (see blobs.py).
+    """
+    return (
+        isinstance(value, str)
+        and len(value) == 64
+        and all(character in "0123456789abcdef" for character in value)
+    )
+
+
+def iter_errors(data):
+    """
+    Checks a box in the current version and yields every problem found. Makes a single pass over the cards.
+
+    Args:
+        data (dict): A box.
+
+    Yields:
+        tuple: Position (card index, None for the box) and description of a problem.
+    """
+    if not isinstance(data, dict):
+        yield None, "save file must contain an object"
+        return
+    if not isinstance(data.get("name"), str):
+        yield None, "'name' must be a string"
+    categories = data.get("categories")
+    if not isinstance(categories, list) or not all(
+        isinstance(category, str) for category in categories
+    ):
+        yield None, "'categories' must be a list of strings"
+    if not is_int(data.get("next_id")):
+        yield None, "'next_id' must be an integer"
+    cards = data.get("cards")
+    if not isinstance(cards, list):
+        yield None, "'cards' must be a list"
+        return
+
+    ids = set()
+    for position, card in enumerate(cards):
+        if not isinstance(card, dict):
+            yield position, "must be an object"
+            continue
+        for key in ("category", "question", "answer"):
+            if not isinstance(card.get(key), str):
+                yield position, f"'{key}' must be a string"
+        level = card.get("level")
+        if not is_int(level) or not 1 <= level <= 10:
+            yield position, f"'level' must be a number from 1 to 10, not {level!r}"
+        card_id = card.get("id")
+        if not is_int(card_id) or card_id < 1:
+            yield position, f"'id' must be a positive integer, not {card_id!r}"
+        elif card_id in ids:
+            yield position, f"duplicate id {card_id}"
+        else:
+            ids.add(card_id)
+        failures = card.get("failures")
+        if not is_int(failures) or failures < 0:
+            yield position, f"'failures' must be a non-negative integer, not {failures!r}"
+        last_review = card.get("last_review")
+        if last_review is not None and (
+            not isinstance(last_review, (int, float)) or isinstance(last_review, bool)
+        ):
+            yield position, f"'last_review' must be a number or null, not {last_review!r}"
+        attachments = card.get("attachments", [])
+        if not isinstance(attachments, list) or not all(
+            isinstance(attachment, dict)
+            and isinstance(attachment.get("name"), str)
+            and is_blob(attachment.get("blob"))
+            for attachment in attachments
+        ):
+            yield position, "'attachments' must be a list of names and blob hashes"
+
+
+def validate(data):
+    """
+    Validates a box in the current version.
+
+    Args:
+        data (dict): A box.
+
+    Raises:
+        SchemaError: With every problem found.
+    """
+    errors = list(iter_errors(data))
+    if errors:
+        raise SchemaError(errors)
+
+
+def load(data):
+    """
+    Expands the category column, migrates a box to the current version and validates it. Used when loading a save file.
+
+    Args:
+        data (dict): A box in any known version. Changed in place.
+
+    Returns:
+        dict: The migrated box.
+
+    Raises:
+        SchemaError: If the box is damaged or its version unknown.
+    """
+    if not isinstance(data, dict):
+        raise SchemaError([(None, "save file must contain an object")])
+    decode_categories(data)
+    migrate(data)
+    validate(data)
+    return data
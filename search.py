@@ -0,0 +1,357 @@
+import argparse
+import contextlib
+import hashlib
+import os
+import re
+import sqlite3
+
+import box
+import compression
+import metrics
+import shards
+
+"""
+The `search.py` script keeps an inverted index over the questions, answers and categories of all boxes in a save folder.
+It answers "which boxes and cards mention X" without loading any box.
+
+The index is an SQLite database next to the save files ('data/search.db'):
+    boxes       the number of every box, to keep the other tables small
+    cards       one row per card: box, ID, category, question, its words and a hash of the indexed text
+    postings    one row per word and card, with the word first, so a word is found with one index lookup
+
+Saving a box in the application ("SAVE" or the save endpoint of server.py) updates the index incrementally
+(`update_saved`): only cards whose text changed are indexed again. Boxes saved by other programs or copied into the folder
+by hand are not indexed until they are saved in the application once or the index is rebuilt.
+
+Run it as a command:
+    python search.py DUCK QUACK     cards mentioning both words, in any box
+    python search.py "QUA*"         cards with a word starting with 'QUA'
+    python search.py --rebuild      index all boxes in the save folder again
+"""
+
+# ____________________
+
+INDEX_FILE = "search.db"
+
+WORD = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boxes (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS cards (
+    box INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    question TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    words TEXT NOT NULL,
+    PRIMARY KEY (box, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    word TEXT NOT NULL,
+    box INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (word, box, id)
+) WITHOUT ROWID;
+"""
+
+
+def words(text):
+    """
+    Splits a text into the words that are indexed, case-insensitive.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        set: The words.
+    """
+    return set(WORD.findall(text.casefold()))
+
+
+def text_hash(card):
+    """
+    Hashes the indexed text of a card, to detect cards that need to be indexed again.
+    """
+    content = "\x1f".join([card.category, card.question, card.answer])
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+def connect(save_folder="data"):
+    """
+    Opens the index of a save folder and creates it if it does not exist.
+
+    Args:
+        save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+
+    Returns:
+        sqlite3.Connection: The connection. Use it as a context manager to commit changes,
+        and close it with contextlib.closing, the context manager of sqlite3 does not close it.
+    """
+    connection = sqlite3.connect(os.path.join(save_folder, INDEX_FILE), timeout=30)
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(SCHEMA)
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return connection
+
+
+# ______Updates______
+
+
+@metrics.timed("search_update_seconds")
+def update(current_box, save_folder="data", categories=None):
+    """
+    Updates the index with the cards of a box. Cards that are new or whose text changed are indexed again,
+    cards that are gone are removed.
+
+    Args:
+        current_box (Box): The box.
+        save_folder (str, optional): The folder the box is saved to. Defaults to 'data'.
+        categories (set, optional): Only the cards of these categories changed. Cards of categories
+            that are no longer in the box are removed as well. Defaults to None (the whole box).
+    """
+    with current_box.lock.read():
+        cards = {
+            card.id: card
+            for card in current_box.cards
+            if categories is None or card.category in categories
+        }
+        known = set(current_box.categories) | set(categories or ())
+    hashes = {card_id: text_hash(card) for card_id, card in cards.items()}
+
+    with contextlib.closing(connect(save_folder)) as connection, connection:
+        connection.execute(
+            "INSERT OR IGNORE INTO boxes (name) VALUES (?)", (current_box.name,)
+        )
+        (box_id,) = connection.execute(
+            "SELECT id FROM boxes WHERE name = ?", (current_box.name,)
+        ).fetchone()
+        rows = connection.execute(
+            "SELECT id, category, hash FROM cards WHERE box = ?", (box_id,)
+        ).fetchall()
+        stale = {
+            card_id
+            for card_id, category, stored in rows
+            if (categories is None or category in categories or category not in known)
+            and hashes.get(card_id) != stored
+        }
+        indexed = {row[0] for row in rows}
+        changed = [
+            card_id for card_id in hashes if card_id not in indexed or card_id in stale
+        ]
+        # The words of a card are kept with it, so its postings are removed by primary key
+        for card_id in stale:
+            (indexed_words,) = connection.execute(
+                "SELECT words FROM cards WHERE box = ? AND id = ?", (box_id, card_id)
+            ).fetchone()
+            connection.executemany(
+                "DELETE FROM postings WHERE word = ? AND box = ? AND id = ?",
+                [(word, box_id, card_id) for word in indexed_words.split()],
+            )
+        connection.executemany(
+            "DELETE FROM cards WHERE box = ? AND id = ?",
+            [(box_id, card_id) for card_id in stale],
+        )
+        card_words = {
+            card_id: words(
+                " ".join(
+                    [
+                        cards[card_id].category,
+                        cards[card_id].question,
+                        cards[card_id].answer,
+                    ]
+                )
+            )
+            for card_id in changed
+        }
+        connection.executemany(
+            "INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    box_id,
+                    card_id,
+                    cards[card_id].category,
+                    cards[card_id].question,
+                    hashes[card_id],
+                    " ".join(card_words[card_id]),
+                )
+                for card_id in changed
+            ],
+        )
+        # Inserting in the order of the primary key keeps the writes to the B-tree local
+        connection.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?)",
+            sorted(
+                (word, box_id, card_id)
+                for card_id in changed
+                for word in card_words[card_id]
+            ),
+        )
+
+
+def update_saved(current_box, save_folder="data"):
+    """
+    Updates the index after the application saved a box. Sharded boxes only update the categories their last save wrote.
+    The box is saved already, so errors of the index are returned instead of raised.
+
+    Args:
+        current_box (Box): The saved box.
+        save_folder (str, optional): The folder the box was saved to. Defaults to 'data'.
+
+    Returns:
+        Exception: The error if the index could not be updated, None otherwise.
+    """
+    # only ShardedBox knows which categories it saved (see shards.py)
+    categories = getattr(current_box, "saved_categories", None)
+    try:
+        update(current_box, save_folder, categories)
+    except (sqlite3.Error, OSError) as e:
+        return e
+    return None
+
+
+def remove_box(name, save_folder="data"):
+    """
+    Removes all cards of a box from the index.
+
+    Args:
+        name (str): The name of the box.
+        save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+    """
+    with contextlib.closing(connect(save_folder)) as connection, connection:
+        row = connection.execute(
+            "SELECT id FROM boxes WHERE name = ?", (name,)
+        ).fetchone()
+        if row is not None:
+            connection.execute("DELETE FROM cards WHERE box = ?", row)
+            connection.execute("DELETE FROM postings WHERE box = ?", row)
+            connection.execute("DELETE FROM boxes WHERE id = ?", row)
+
+
+def rebuild(save_folder="data"):
+    """
+    Indexes all boxes in a save folder again and removes boxes that no longer exist. Loads every box.
+
+    Args:
+        save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+
+    Returns:
+        int: The number of indexed boxes.
+    """
+    names = []
+    for filename in sorted(os.listdir(save_folder)):
+        file_path = os.path.join(save_folder, filename)
+        if shards.is_sharded(file_path):
+            current_box = shards.ShardedBox.open(file_path)
+            current_box.ensure_loaded()
+        elif (
+            filename.endswith(".json")
+            and os.path.isfile(file_path)
+            and compression.detect_file(file_path) is not None
+        ):
+            current_box = box.Box.load_from_json(file_path)
+        else:
+            continue
+        update(current_box, save_folder)
+        names.append(current_box.name)
+
+    with contextlib.closing(connect(save_folder)) as connection, connection:
+        indexed = connection.execute("SELECT name FROM boxes").fetchall()
+    for (name,) in indexed:
+        if name not in names:
+            remove_box(name, save_folder)
+    return len(names)
+
+
+# ______Queries______
+
+
+@metrics.timed("search_query_seconds")
+def search(text, save_folder="data"):
+    """
+    Finds all cards mentioning every word of a text in their question, answer or category.
+    A word ending in '*' matches all words starting with it.
+
+    Args:
+        text (str): The words to search for.
+        save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+
+    Returns:
+        list: Tuples of box name, card ID, category and question, sorted by box and ID.
+    """
+    conditions = []
+    parameters = []
+    for term in text.casefold().split():
+        found = WORD.findall(term)
+        for position, word in enumerate(found):
+            if term.endswith("*") and position == len(found) - 1:
+                conditions.append(
+                    "SELECT box, id FROM postings WHERE word >= ? AND word < ?"
+                )
+                parameters += [word, word + "\U0010ffff"]
+            else:
+                conditions.append("SELECT box, id FROM postings WHERE word = ?")
+                parameters.append(word)
+    if not conditions:
+        return []
+    matches = " INTERSECT ".join(conditions)
+    with contextlib.closing(connect(save_folder)) as connection, connection:
+        hits = connection.execute(
+            "SELECT boxes.name, cards.id, cards.category, cards.question "
+            "FROM cards JOIN boxes ON boxes.id = cards.box "
+            f"WHERE (cards.box, cards.id) IN ({matches}) "
+            "ORDER BY boxes.name, cards.id",
+            parameters,
+        ).fetchall()
+    return hits
+
+
+def format_hits(hits):
+    """
+    Formats the cards found by a search, grouped by box.
+
+    Args:
+        hits (list): The result of search.
+
+    Returns:
+        list: The lines to print.
+    """
+    lines = []
+    current = None
+    for name, card_id, category, question in hits:
+        if name != current:
+            lines.append(f"\nBOX '{name}':")
+            current = name
+        lines.append(f"  #{card_id} {category}: {question}")
+    return lines
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search all FlashLine_ boxes.")
+    parser.add_argument("words", nargs="*", help="words the cards must mention")
+    parser.add_argument("--data", default="data", help="folder with the save-files")
+    parser.add_argument(
+        "--rebuild", action="store_true", help="index all boxes in the folder again"
+    )
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"{rebuild(args.data)} BOXES INDEXED")
+    if args.words:
+        hits = search(" ".join(args.words), args.data)
+        print(f"{len(hits)} FLASHCARDS FOUND")
+        for line in format_hits(hits):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+import argparse
+import asyncio
+import http
+import json
+import os
+import random
+from urllib.parse import parse_qs
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+import box
+import deck
+import search
+from project import clean_input
+from project import handle_input
+
+"""
+The `server.py` script provides a local HTTP/JSON API on top of `box.py`.
+It allows many learners to use flashcard boxes at the same time, each one through their own HTTP client.
+It defines a cache for loaded boxes, called `BoxCache`, and the request handling of the server.
+
+Endpoints:
+    GET  /boxes                         List all boxes in the save folder.
+    GET  /boxes/<name>/next             Next card to learn. Optional query: category, level.
+    POST /boxes/<name>/answer           Submit an answer. Body: {"id": ..., "answer": ...}.
+    GET  /boxes/<name>/progress         Number of flashcards per level. Optional query: category.
+    POST /boxes/<name>/save             Save the box to its JSON file.
+"""
+
+# ____________________
+
+
+class HTTPError(Exception):
+    """
+    Raised while handling a request to answer with an error status.
+
+    Attributes:
+        status (int): The HTTP status code.
+        message (str): A short description of the error, sent to the client.
+    """
+
+    def __init__(self, status, message):
+        """
+        Initializes a new HTTPError.
+
+        Args:
+            status (int): The HTTP status code.
+            message (str): A short description of the error.
+        """
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# ____________________
+
+
+class BoxCache:
+    """
+    Keeps loaded boxes in memory and hands out one lock per box.
+    Every box is only loaded once, no matter how many sessions use it.
+
+    Attributes:
+        save_folder (str): Folder with the JSON save-files.
+        boxes (dict): Loaded boxes by name.
+        locks (dict): One asyncio.Lock per box name. Guards all reads and writes of that box.
+    """
+
+    def __init__(self, save_folder):
+        """
+        Initializes an empty box cache.
+
+        Args:
+            save_folder (str): Folder with the JSON save-files.
+        """
+        self.save_folder = save_folder
+        self.boxes = {}
+        self.locks = {}
+
+    def lock(self, name):
+        """
+        Returns the lock of a box. Creates it on first use.
+
+        Args:
+            name (str): The name of the box.
+
+        Returns:
+            asyncio.Lock: The lock of the box.
+        """
+        if name not in self.locks:
+            self.locks[name] = asyncio.Lock()
+        return self.locks[name]
+
+    async def get(self, name):
+        """
+        Returns a box from the cache. Loads it from its JSON file on first use,
+        or from its progress file and shared deck if there is no JSON file (see deck.py).
+        Loading is done in a worker thread so other sessions are not blocked. Caller must hold the lock of the box.
+
+        Args:
+            name (str): The name of the box.
+
+        Returns:
+            Box: The loaded box.
+
+        Raises:
+            HTTPError: If the box is not in the save folder or its file is damaged.
+        """
+        if name not in self.boxes:
+            if name not in self.list_boxes():
+                raise HTTPError(404, f"box '{name}' not found")
+            file_path = os.path.join(self.save_folder, f"{name}.json")
+            progress_path = os.path.join(self.save_folder, f"{name}.progress")
+            if os.path.isfile(file_path):
+                load, path = box.Box.load_from_json, file_path
+            elif deck.is_progress(progress_path):
+                load, path = deck.DeckBox.load, progress_path
+            else:
+                raise HTTPError(404, f"box '{name}' not found")
+            loop = asyncio.get_running_loop()
+            try:
+                loaded_box = await loop.run_in_executor(None, load, path)
+            except FileNotFoundError:
+                raise HTTPError(404, f"deck of box '{name}' not found")
+            except ValueError as e:
+                raise HTTPError(500, f"box '{name}' is damaged: {e}")
+            self.boxes[name] = loaded_box
+        return self.boxes[name]
+
+    async def save(self, name):
+        """
+        Saves a cached box to its JSON file in a worker thread and updates the search index (see search.py).
+        Caller must hold the lock of the box.
+
+        Args:
+            name (str): The name of the box.
+        """
+        loop = asyncio.get_running_loop()
+        current_box = await self.get(name)
+        await loop.run_in_executor(None, current_box.save_to_json, self.save_folder)
+        # the box is saved, an error of the index does not fail the request
+        await loop.run_in_executor(
+            None, search.update_saved, current_box, self.save_folder
+        )
+
+    def list_boxes(self):
+        """
+        Lists all boxes in the save folder, learners of shared decks included.
+
+        Returns:
+            list: Names of all boxes without file extension.
+        """
+        return sorted(
+            {
+                os.path.splitext(filename)[0]
+                for filename in os.listdir(self.save_folder)
+                if filename.endswith(".json")
+                or deck.is_progress(os.path.join(self.save_folder, filename))
+            }
+        )
+
+
+# ____________________
+# actions for the endpoints of the API
+
+
+def select_cards(current_box, query):
+    """
+    Selects the flashcards of a box matching the optional 'category' or 'level' query parameters.
+
+    Args:
+        current_box (Box): The box to select from.
+        query (dict): Parsed query parameters.
+
+    Returns:
+        list: List of Card objects.
+    """
+    if "category" in query:
+        return current_box.list_card_obj_in_category(query["category"])
+    if "level" in query:
+        try:
+            level = int(query["level"])
+        except ValueError:
+            raise HTTPError(400, "level must be a number")
+        if level not in current_box.levels:
+            raise HTTPError(400, "level does not exist")
+        return current_box.list_card_obj_in_level(level)
+    return current_box.cards
+
+
+def check_name(name):
+    """
+    Checks that a box name from a request target names a file in the save folder, not a path.
+
+    Args:
+        name (str): The unquoted name of the box.
+
+    Raises:
+        HTTPError: If the name contains a path separator or '..'.
+    """
+    if not name or "/" in name or os.sep in name or ".." in name:
+        raise HTTPError(400, "invalid box name")
+
+
+def find_card(current_box, card_id):
+    """
+    Finds a flashcard by its ID.
+
+    Args:
+        current_box (Box): The box to search.
+        card_id (int): The ID of the flashcard.
+
+    Returns:
+        Card: The flashcard.
+    """
+    card = current_box.get_card(card_id)
+    if card is None:
+        raise HTTPError(404, "card not found")
+    return card
+
+
+async def next_card(cache, name, query, body):
+    """
+    Endpoint action for "GET /boxes/<name>/next". Picks a random flashcard to learn.
+    The answer is not included.
+    """
+    async with cache.lock(name):
+        current_box = await cache.get(name)
+        cards = select_cards(current_box, query)
+        if not cards:
+            raise HTTPError(404, "no cards here")
+        card = random.choice(cards)
+        return {
+            "id": card.id,
+            "question": card.question,
+            "category": card.category,
+            "level": card.level,
+        }
+
+
+async def submit_answer(cache, name, query, body):
+    """
+    Endpoint action for "POST /boxes/<name>/answer".
+    Checks the answer with handle_input and moves the flashcard with change_level.
+    """
+    if not isinstance(body, dict) or "id" not in body or "answer" not in body:
+        raise HTTPError(400, "body must contain 'id' and 'answer'")
+    if type(body["id"]) is not int:
+        raise HTTPError(400, "id must be a number")
+    async with cache.lock(name):
+        current_box = await cache.get(name)
+        card = find_card(current_box, body["id"])
+        result = handle_input(card, clean_input(str(body["answer"])))
+        current_box.change_level(card, result)
+        return {"correct": result, "level": card.level, "answer": card.answer}
+
+
+async def progress(cache, name, query, body):
+    """
+    Endpoint action for "GET /boxes/<name>/progress". Counts the flashcards per level.
+    """
+    async with cache.lock(name):
+        current_box = await cache.get(name)
+        level_count = current_box.count_cards_level(select_cards(current_box, query))
+        return {"levels": level_count, "total": sum(level_count.values())}
+
+
+async def save(cache, name, query, body):
+    """
+    Endpoint action for "POST /boxes/<name>/save". Saves the box to its JSON file.
+    """
+    async with cache.lock(name):
+        await cache.save(name)
+        return {"saved": name}
+
+
+ROUTES = {
+    ("GET", "next"): next_card,
+    ("POST", "answer"): submit_answer,
+    ("GET", "progress"): progress,
+    ("POST", "save"): save,
+}
+
+
+# ____________________
+# HTTP handling
+
+
+async def dispatch(cache, method, target, body):
+    """
+    Routes a request to the matching endpoint action.
+
+    Args:
+        cache (BoxCache): The box cache of the server.
+        method (str): The HTTP method.
+        target (str): The request target (path and query).
+        body (bytes): The request body.
+
+    Returns:
+        dict or list: JSON serializable response.
+    """
+    url = urlsplit(target)
+    parts = [unquote(part) for part in url.path.split("/") if part]
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    if parts == ["boxes"] and method == "GET":
+        return cache.list_boxes()
+    if len(parts) != 3 or parts[0] != "boxes":
+        raise HTTPError(404, "unknown endpoint")
+    action = ROUTES.get((method, parts[2]))
+    if action is None:
+        raise HTTPError(404, "unknown endpoint")
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        raise HTTPError(400, "body must be JSON")
+    check_name(parts[1])
+    return await action(cache, parts[1], query, data)
+
+
+async def handle_connection(cache, reader, writer):
+    """
+    Serves all requests of a single connection. Keeps the connection open between requests (HTTP/1.1 keep-alive).
+
+    Args:
+        cache (BoxCache): The box cache of the server.
+        reader (asyncio.StreamReader): Reader of the connection.
+        writer (asyncio.StreamWriter): Writer of the connection.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            try:
+                status, response = 200, await dispatch(cache, method, target, body)
+            except HTTPError as e:
+                status, response = e.status, {"error": e.message}
+            except Exception:
+                # answer instead of dropping the connection, the server keeps running
+                status, response = 500, {"error": "internal error"}
+            payload = json.dumps(response).encode()
+            writer.write(
+                f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host="127.0.0.1", port=8080, save_folder="data"):
+    """
+    Starts the server. Use the returned server object to stop it again.
+
+    Args:
+        host (str, optional): The interface to listen on. Defaults to localhost.
+        port (int, optional): The port to listen on (0 for any free port). Defaults to 8080.
+        save_folder (str, optional): Folder with the JSON save-files. Defaults to 'data'.
+
+    Returns:
+        asyncio.Server: The running server.
+    """
+    cache = BoxCache(save_folder)
+    return await asyncio.start_server(
+        lambda reader, writer: handle_connection(cache, reader, writer), host, port
+    )
+
+
+async def serve(host, port, save_folder):
+    """
+    Starts the server and serves until interrupted.
+    """
+    server = await start_server(host, port, save_folder)
+    print(f"FLASH LINE_ SERVER LISTENING ON http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local HTTP/JSON server for FlashLine_ boxes."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--data", default="data", help="folder with the JSON save-files"
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.data))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import os
+import struct
+import time
+
+"""
+The `session.py` script checkpoints learn sessions, so a session can be resumed after going back with 'X' or after a crash.
+A session is stored in '<name>.session' next to the save file of its box:
+
+    header      fixed size: magic, version, cursor, number of cards, answers, correct answers, start time
+    card IDs    the order of the session, one unsigned 32-bit integer per card, written once when the session starts
+
+After every answer only the header is rewritten in place, so a checkpoint costs a single small write
+however long the session is. Resuming reads the header and seeks to the cursor in the list of IDs,
+without reshuffling or reading the cards that were already learned.
+"""
+
+# ____________________
+
+MAGIC = b"FLSN"
+VERSION = 1
+
+# magic, version, cursor, number of cards, answers, correct answers, start time (seconds since epoch)
+HEADER = struct.Struct("<4sHIIIId")
+CARD_ID = struct.Struct("<I")
+
+# Number of card IDs read at once when resuming
+CHUNK_SIZE = 1024
+
+
+def session_path(box_name, save_folder="data"):
+    """
+    Returns the path of the session file of a box.
+    """
+    return os.path.join(save_folder, f"{box_name}.session")
+
+
+class Session:
+    """
+    A checkpointed learn session of a box.
+
+    Attributes:
+        file_path (str): The path of the session file.
+        cursor (int): Position of the next card in the order of the session.
+        count (int): Number of cards in the session.
+        count_all (int): Number of answers given so far.
+        count_correct (int): Number of correct answers so far.
+        started (float): Time the session was started, in seconds since epoch.
+    """
+
+    def __init__(
+        self, file_path, file, cursor, count, count_all, count_correct, started
+    ):
+        """
+        Initializes a session for an open session file. Use Session.start or Session.open instead.
+        """
+        self.file_path = file_path
+        self.file = file
+        self.cursor = cursor
+        self.count = count
+        self.count_all = count_all
+        self.count_correct = count_correct
+        self.started = started
+
+    @classmethod
+    def start(cls, box_name, card_ids, save_folder="data"):
+        """
+        Starts a new session and replaces any unfinished session of the box.
+
+        Args:
+            box_name (str): The name of the box.
+            card_ids (list): The IDs of the cards to learn, in the order of the session.
+            save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+
+        Returns:
+            Session: The session, positioned at the first card.
+        """
+        os.makedirs(save_folder, exist_ok=True)
+        file_path = session_path(box_name, save_folder)
+        started = time.time()
+        temporary_path = f"{file_path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, 0, len(card_ids), 0, 0, started))
+            file.write(struct.pack(f"<{len(card_ids)}I", *card_ids))
+        os.replace(temporary_path, file_path)
+        return cls(file_path, open(file_path, "r+b"), 0, len(card_ids), 0, 0, started)
+
+    @classmethod
+    def open(cls, box_name, save_folder="data"):
+        """
+        Opens the unfinished session of a box. Reads the header only.
+
+        Args:
+            box_name (str): The name of the box.
+            save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+
+        Returns:
+            Session: The session, or None if the box has no unfinished session.
+
+        Raises:
+            ValueError: If the session file is damaged.
+        """
+        file_path = session_path(box_name, save_folder)
+        try:
+            file = open(file_path, "r+b")
+        except FileNotFoundError:
+            return None
+        header = file.read(HEADER.size)
+        size = os.fstat(file.fileno()).st_size
+        try:
+            if len(header) < HEADER.size:
+                raise ValueError("session file is too short")
+            magic, version, cursor, count, count_all, count_correct, started = (
+                HEADER.unpack(header)
+            )
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("not a session file of this version")
+            if size != HEADER.size + count * CARD_ID.size or cursor > count:
+                raise ValueError("session file is damaged")
+        except ValueError:
+            file.close()
+            raise
+        return cls(file_path, file, cursor, count, count_all, count_correct, started)
+
+    @property
+    def done(self):
+        """
+        True if every card of the session was learned or skipped.
+        """
+        return self.cursor >= self.count
+
+    def remaining(self):
+        """
+        Yields the IDs of the cards that were not learned yet, in the order of the session.
+        The IDs are read in chunks from the cursor on, so resuming does not read the whole session.
+
+        Yields:
+            int: The ID of the next card.
+        """
+        position = self.cursor
+        while position < self.count:
+            size = min(CHUNK_SIZE, self.count - position)
+            self.file.seek(HEADER.size + position * CARD_ID.size)
+            data = self.file.read(size * CARD_ID.size)
+            for (card_id,) in CARD_ID.iter_unpack(data):
+                yield card_id
+            position += size
+
+    def record(self, result=None):
+        """
+        Moves the cursor past the current card and checkpoints the session by rewriting the header in place.
+
+        Args:
+            result (bool, optional): The result of the answer. Defaults to None (the card was skipped, e.g. because it was deleted).
+        """
+        self.cursor += 1
+        if result is not None:
+            self.count_all += 1
+            if result:
+                self.count_correct += 1
+        self.file.seek(0)
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                self.cursor,
+                self.count,
+                self.count_all,
+                self.count_correct,
+                self.started,
+            )
+        )
+        self.file.flush()
+
+    def close(self):
+        """
+        Closes the session file. The session can be resumed with Session.open.
+        """
+        self.file.close()
+
+    def finish(self):
+        """
+        Closes and deletes the session file.
+        """
+        self.file.close()
+        os.remove(self.file_path)
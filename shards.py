@@ -0,0 +1,441 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import box
+import compression
+import schema
+
+"""
+The `shards.py` script stores a box as a folder with one shard file per category instead of a single JSON file:
+
+    data/<name>/manifest.json     name, categories, next_id and every shard with the level counts of its cards
+    data/<name>/<hash>.json       the cards of one category, named by a hash of the category
+
+`ShardedBox` loads only the manifest when it is opened. The cards of a category are loaded when they are first needed,
+e.g. by learning, editing or showing the progress of that category. On save, only the shards that changed are written,
+in parallel, and the manifest is replaced last, so it never refers to a shard that was not written completely.
+Operations on the whole box (LEARN ALL, filters without a category, checking a new question) load all shards.
+
+Run it as a command:
+    python shards.py split data/BOX.json    store a box as shards in data/BOX/
+    python shards.py join data/BOX          store a sharded box as data/BOX.json again
+"""
+
+# ____________________
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = "flashline-sharded"
+SHARD_FORMAT = "flashline-shard"
+
+# Number of threads writing shards on save
+SAVE_WORKERS = 8
+
+
+def is_sharded(path):
+    """
+    Checks if a path is the folder of a sharded box.
+    """
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def shard_filename(category):
+    """
+    Returns the file name of the shard of a category. Categories can contain any character, so they are hashed.
+    """
+    digest = hashlib.blake2b(category.encode(), digest_size=8).hexdigest()
+    return f"{digest}.json"
+
+
+def read_file(file_path):
+    """
+    Reads a JSON file, plain or compressed (see compression.py).
+
+    Returns:
+        tuple: The parsed data and the compression method (None for plain JSON).
+    """
+    with open(file_path, "rb") as file:
+        content, method = compression.decompress(file.read())
+    return json.loads(content), method
+
+
+def write_file(file_path, data, method=None):
+    """
+    Writes a JSON file, compressed if a method is given. Writes to a temporary file first, so a crash never leaves a half-written file.
+    """
+    content = compression.compress(
+        json.dumps(data, separators=(",", ":")).encode(), method
+    )
+    temporary_path = f"{file_path}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(content)
+    os.replace(temporary_path, file_path)
+
+
+def count_levels(cards):
+    """
+    Counts the flashcards in every level.
+
+    Returns:
+        list: The counts for level 1 to 10.
+    """
+    counts = [0] * 10
+    for card in cards:
+        counts[card.level - 1] += 1
+    return counts
+
+
+# ____________________
+
+
+class ShardedBox(box.Box):
+    """
+    A box stored as one shard file per category, loaded and saved by category.
+    box.cards and the indexes only hold the flashcards of the loaded categories.
+
+    Attributes:
+        folder (str): The folder of the box, None if it was never saved.
+        shards (dict): File name of the shard of every category with cards.
+        shard_levels (dict): Level counts of every shard, as saved in the manifest. Used for categories that are not loaded.
+        loaded (set): Categories whose shards are loaded.
+        dirty (set): Categories changed since the last save.
+        removed (set): File names of shards to delete on the next save.
+        saved_categories (set): Categories written by the last save, None if the box was not saved yet.
+    """
+
+    def __init__(self, name, folder=None):
+        """
+        Initializes a new, empty sharded box.
+
+        Args:
+            name (str): The name of the box.
+            folder (str, optional): The folder of the box. Defaults to None.
+        """
+        super().__init__(name)
+        self.folder = folder
+        self.shards = {}
+        self.shard_levels = {}
+        self.loaded = set()
+        self.dirty = set()
+        self.removed = set()
+        self.saved_categories = None
+
+    @classmethod
+    def open(cls, folder):
+        """
+        Opens a sharded box. Only reads the manifest.
+
+        Args:
+            folder (str): The folder of the box.
+
+        Returns:
+            ShardedBox: The box, without any loaded category.
+
+        Raises:
+            ValueError: If the manifest is damaged.
+        """
+        data, method = read_file(os.path.join(folder, MANIFEST_FILE))
+        if not isinstance(data, dict) or data.get("format") != MANIFEST_FORMAT:
+            raise ValueError(f"'{folder}' is not a sharded box")
+        sharded_box = cls(data["name"], folder)
+        sharded_box.categories = sorted(data["categories"])
+        sharded_box.next_id = data["next_id"]
+        sharded_box.compression = method
+        for category, shard in data["shards"].items():
+            sharded_box.shards[category] = shard["file"]
+            sharded_box.shard_levels[category] = shard["levels"]
+        return sharded_box
+
+    @classmethod
+    def from_box(cls, source_box):
+        """
+        Creates a sharded box with all flashcards of a box. Every category is dirty, so the first save writes all shards.
+
+        Args:
+            source_box (Box): The box to copy.
+
+        Returns:
+            ShardedBox: The sharded box.
+        """
+        sharded_box = cls.from_dict(source_box.to_dict())
+        sharded_box.compression = source_box.compression
+        categories = {card.category for card in sharded_box.cards}
+        sharded_box.loaded = set(categories)
+        sharded_box.dirty = set(categories)
+        return sharded_box
+
+    # methods related to loading and saving shards__________
+
+    def ensure_loaded(self, categories=None):
+        """
+        Loads the shards of categories that are not loaded yet. Shards are read and parsed in parallel.
+
+        Args:
+            categories (iterable, optional): The categories to load. Defaults to None (all categories).
+
+        Raises:
+            ValueError: If a shard is damaged.
+        """
+        if categories is None:
+            categories = list(self.shards)
+        missing = [
+            category
+            for category in categories
+            if category in self.shards and category not in self.loaded
+        ]
+        if not missing:
+            return
+        with ThreadPoolExecutor(max_workers=SAVE_WORKERS) as executor:
+            shards = list(executor.map(self.read_shard, missing))
+        with self.lock.write():
+            for category, cards in zip(missing, shards):
+                if category in self.loaded:
+                    continue
+                for card in cards:
+                    self.ids[card.id] = card
+                    self.questions.setdefault(card.question, card)
+                    self.level_cards[card.level][card.id] = card
+                self.cards.extend(cards)
+                self.category_cards[category] = sorted(cards, key=box.question_key)
+                self.listings.pop(category, None)
+                self.loaded.add(category)
+
+    def read_shard(self, category):
+        """
+        Reads and validates the shard of a category.
+
+        Args:
+            category (str): The category.
+
+        Returns:
+            list: The flashcards of the category.
+
+        Raises:
+            ValueError: If the shard is damaged or holds cards of another category.
+        """
+        data, _ = read_file(os.path.join(self.folder, self.shards[category]))
+        if not isinstance(data, dict) or data.get("format") != SHARD_FORMAT:
+            raise ValueError(f"shard of category '{category}' is damaged")
+        cards = schema.load(
+            {
+                "version": data.get("version"),
+                "name": self.name,
+                "categories": [category],
+                "next_id": self.next_id,
+                "cards": data.get("cards"),
+            }
+        )["cards"]
+        errors = [
+            (position, f"belongs to category '{card['category']}', not '{category}'")
+            for position, card in enumerate(cards)
+            if card["category"] != category
+        ]
+        if errors:
+            raise schema.SchemaError(errors)
+        return [box.Card.from_dict(card) for card in cards]
+
+    def save_to_json(self, save_folder="data"):
+        """
+        Saves the box to the folder '<name>' in the save folder. Writes only the shards of changed categories, in parallel,
+        and then the manifest. Saving to another folder than the one the box was opened from writes all shards.
+        Reviews since the last save are appended to the review log of the box (see save_reviews).
+        The written categories are kept in saved_categories, so the search index only updates them (see search.update_saved).
+
+        Args:
+            save_folder (str): Folder in root to save the box folder to. By default 'data'.
+        """
+        folder = os.path.join(save_folder, self.name)
+        if self.folder is None or os.path.abspath(folder) != os.path.abspath(
+            self.folder
+        ):
+            self.ensure_loaded()
+            with self.lock.read():
+                self.dirty = {card.category for card in self.cards}
+                self.removed = set()
+                self.shards = {}
+            self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+        with self.lock.read():
+            dirty, self.dirty = self.dirty, set()
+            writes = []
+            for category in sorted(dirty):
+                cards = self.category_cards.get(category, [])
+                if cards:
+                    self.shards[category] = shard_filename(category)
+                    self.shard_levels[category] = count_levels(cards)
+                    data = {
+                        "format": SHARD_FORMAT,
+                        "version": schema.SCHEMA_VERSION,
+                        "cards": [card.to_dict() for card in cards],
+                    }
+                    writes.append((os.path.join(folder, self.shards[category]), data))
+                elif category in self.shards:
+                    self.removed.add(self.shards.pop(category))
+                    self.shard_levels.pop(category)
+            manifest = {
+                "format": MANIFEST_FORMAT,
+                "version": schema.SCHEMA_VERSION,
+                "name": self.name,
+                "categories": list(self.categories),
+                "next_id": self.next_id,
+                "shards": {
+                    category: {"file": filename, "levels": self.shard_levels[category]}
+                    for category, filename in sorted(self.shards.items())
+                },
+            }
+
+        with ThreadPoolExecutor(max_workers=SAVE_WORKERS) as executor:
+            list(
+                executor.map(lambda write: write_file(*write, self.compression), writes)
+            )
+        write_file(os.path.join(folder, MANIFEST_FILE), manifest, self.compression)
+        removed, self.removed = self.removed, set()
+        for filename in removed - set(self.shards.values()):
+            try:
+                os.remove(os.path.join(folder, filename))
+            except FileNotFoundError:
+                pass
+        self.save_reviews(save_folder)
+        self.saved_categories = dirty
+
+    # methods loading the categories they touch__________
+
+    def listing(self, category):
+        self.ensure_loaded([category])
+        return super().listing(category)
+
+    def list_card_obj_in_category(self, category):
+        self.ensure_loaded([category])
+        return super().list_card_obj_in_category(category)
+
+    def add_card(self, question, answer, category):
+        # questions are unique in the whole box, not per category
+        self.ensure_loaded()
+        return super().add_card(question, answer, category)
+
+    def get_card(self, card_id):
+        """
+        Returns the flashcard with an ID. Loads all categories if the flashcard is not in a loaded one.
+        """
+        card = super().get_card(card_id)
+        if card is None and len(self.loaded) < len(self.shards):
+            self.ensure_loaded()
+            card = super().get_card(card_id)
+        return card
+
+    def get_question(self, card_id):
+        return self.get_card(card_id).question
+
+    def edit_card(self, card_id, question=None, answer=None):
+        if question is not None:
+            # the new question must be unique in the whole box
+            self.ensure_loaded()
+        self.get_card(card_id)
+        super().edit_card(card_id, question, answer)
+
+    def delete_card(self, card_id):
+        if self.get_card(card_id) is not None:
+            super().delete_card(card_id)
+
+    def delete_cards(self, card_ids):
+        card_ids = list(card_ids)
+        if any(card_id not in self.ids for card_id in card_ids):
+            self.ensure_loaded()
+        return super().delete_cards(card_ids)
+
+    def delete_cards_in_category(self, category):
+        self.ensure_loaded([category])
+        super().delete_cards_in_category(category)
+
+    def delete_category(self, category):
+        super().delete_category(category)
+        if category in self.shards and category not in self.loaded:
+            self.removed.add(self.shards.pop(category))
+            self.shard_levels.pop(category)
+
+    def update_levels(self, compute, category=None, level=None):
+        self.ensure_loaded(None if category is None else [category])
+        return super().update_levels(compute, category, level)
+
+    def add_attachment(self, card_id, name, blob):
+        self.get_card(card_id)
+        super().add_attachment(card_id, name, blob)
+
+    def remove_attachment(self, card_id, blob):
+        self.get_card(card_id)
+        super().remove_attachment(card_id, blob)
+
+    def mark_changed(self, card):
+        super().mark_changed(card)
+        self.dirty.add(card.category)
+
+    # methods loading all categories__________
+
+    def check_card(self, question):
+        self.ensure_loaded()
+        return super().check_card(question)
+
+    def find_card(self, question):
+        self.ensure_loaded()
+        return super().find_card(question)
+
+    def list_card_obj_in_level(self, level):
+        self.ensure_loaded()
+        return super().list_card_obj_in_level(level)
+
+    def to_dict(self):
+        self.ensure_loaded()
+        return super().to_dict()
+
+    def dedupe(self, keep="max"):
+        """
+        Merges exact duplicates in the loaded categories only, so opening a box does not load all of them.
+        """
+        return super().dedupe(keep)
+
+    def count_cards_level(self, list_cards=None):
+        """
+        Counts the flashcards in every level. Without a list, loaded categories are counted
+        and the counts of all other categories are taken from the manifest, so no shard is loaded.
+        """
+        level_count = super().count_cards_level(list_cards)
+        if list_cards is None:
+            for category, counts in self.shard_levels.items():
+                if category not in self.loaded:
+                    for level, count in zip(self.levels, counts):
+                        level_count[level] += count
+        return level_count
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded FlashLine_ boxes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    split_parser = commands.add_parser("split", help="store a box as shards")
+    split_parser.add_argument("box", help="JSON file of the box")
+    join_parser = commands.add_parser("join", help="store a sharded box as one file")
+    join_parser.add_argument("folder", help="folder of the sharded box")
+    args = parser.parse_args()
+
+    if args.command == "split":
+        save_folder = os.path.dirname(args.box) or "."
+        sharded_box = ShardedBox.from_box(box.Box.load_from_json(args.box))
+        sharded_box.save_to_json(save_folder)
+        print(f"BOX '{sharded_box.name}' SAVED AS {len(sharded_box.shards)} SHARDS")
+        print(f"YOU CAN DELETE {args.box} - THE SHARDED BOX IS LOADED INSTEAD")
+    elif args.command == "join":
+        sharded_box = ShardedBox.open(args.folder)
+        single = box.Box.from_dict(sharded_box.to_dict())
+        single.compression = sharded_box.compression
+        save_folder = os.path.dirname(os.path.normpath(args.folder)) or "."
+        single.save_to_json(save_folder)
+        print(f"BOX '{single.name}' SAVED TO {save_folder}/{single.name}.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import blobs
+import box
+import shards
+
+"""
+The `snapshots.py` script keeps a history of the states of a box, to roll back bad imports or mass deletions.
+Snapshots share structure: every card record (the card as in the save file) is stored once, named by its hash,
+and a version only lists which record every card ID has. A card that did not change between versions is not stored again.
+
+The history of a box lives next to its save file:
+    data/<name>.snapshots/objects/ab/abcdef...    a card record, in a content-addressed store (see blobs.BlobStore)
+    data/<name>.snapshots/versions/000001.json     a version: categories, next ID and the records of all cards
+
+Most versions only store the records that changed since the version before (`changed`, `removed`).
+Every KEYFRAME_INTERVAL-th version lists all records (`cards`), so restoring never replays more than that many versions.
+The first snapshot of an open box hashes every card, like sync.compute_delta. Later snapshots of the same box
+only hash the cards changed since (see Box.mark_changed), and all snapshots write only the records that changed.
+
+Run it as a command:
+    python snapshots.py take BOX [--label TEXT]    snapshot the saved box
+    python snapshots.py list BOX                   list all versions
+    python snapshots.py diff BOX 3 [5]             compare version 3 with version 5 or the saved box
+    python snapshots.py restore BOX 3              save version 3 as the box, after taking a snapshot of the current one
+"""
+
+# ____________________
+
+KEYFRAME_INTERVAL = 20
+
+
+def card_record(card):
+    """
+    Serializes a card to the record stored in a snapshot.
+
+    Returns:
+        tuple: The record as bytes and its hash (SHA-256, as used by blobs.BlobStore).
+    """
+    record = json.dumps(
+        card.to_dict(), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode()
+    return record, hashlib.sha256(record).hexdigest()
+
+
+def saved_state(current_box):
+    """
+    Returns the size and modification time of the manifest of a sharded box (see shards.py).
+    Every save replaces the manifest, so an unchanged state means the shards were not written since.
+
+    Returns:
+        list: Size and modification time, None for other boxes and sharded boxes that were not saved yet.
+    """
+    if not isinstance(current_box, shards.ShardedBox) or current_box.folder is None:
+        return None
+    try:
+        stat = os.stat(os.path.join(current_box.folder, shards.MANIFEST_FILE))
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class SnapshotStore:
+    """
+    The snapshots of a box.
+
+    Attributes:
+        name (str): The name of the box.
+        folder (str): The folder of the snapshots.
+        objects (BlobStore): The card records.
+    """
+
+    def __init__(self, name, save_folder="data"):
+        """
+        Initializes the snapshot store of a box. The folder is created by the first snapshot.
+
+        Args:
+            name (str): The name of the box.
+            save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+        """
+        self.name = name
+        self.folder = os.path.join(save_folder, f"{name}.snapshots")
+        self.objects = blobs.BlobStore(os.path.join(self.folder, "objects"))
+
+    def version_path(self, number):
+        """
+        Returns the path of the file of a version.
+        """
+        return os.path.join(self.folder, "versions", f"{number:06}.json")
+
+    def versions(self):
+        """
+        Lists the numbers of all versions, oldest first.
+        """
+        folder = os.path.join(self.folder, "versions")
+        if not os.path.isdir(folder):
+            return []
+        return sorted(
+            int(filename[:-5])
+            for filename in os.listdir(folder)
+            if filename.endswith(".json")
+        )
+
+    def read_version(self, number):
+        """
+        Reads the file of a version.
+
+        Raises:
+            ValueError: If the version does not exist.
+        """
+        try:
+            with open(self.version_path(number)) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise ValueError(f"box '{self.name}' has no snapshot {number}") from None
+
+    def cards(self, number):
+        """
+        Returns the records of all cards in a version. Replays the versions since the last keyframe.
+
+        Args:
+            number (int): The version.
+
+        Returns:
+            dict: The hash of the record of every card, by ID.
+        """
+        chain = []
+        data = self.read_version(number)
+        while "cards" not in data:
+            chain.append(data)
+            data = self.read_version(data["parent"])
+        records = {int(card_id): blob for card_id, blob in data["cards"].items()}
+        for data in reversed(chain):
+            for card_id in data["removed"]:
+                records.pop(card_id, None)
+            records.update(
+                {int(card_id): blob for card_id, blob in data["changed"].items()}
+            )
+        return records
+
+    def record(self, blob):
+        """
+        Reads a card record.
+
+        Returns:
+            dict: The card as in the save file.
+        """
+        return json.loads(self.objects.get(blob))
+
+    def snapshot(self, current_box, label=""):
+        """
+        Takes a snapshot of a box. Writes only the records that are not stored yet and the changes since the last version.
+        Nothing is written if the box did not change.
+
+        If the last version is the last snapshot of this box (box.snapshot_base), only the flashcards changed since
+        (box.changed_cards) are hashed and compared with it, so the cost grows with the changes, not with the box.
+        Otherwise all flashcards are compared with the last version. The shards of a sharded box that are not loaded
+        are taken from the last version if the box was not saved since and had no unsaved changes then (see saved_state),
+        otherwise all shards are loaded.
+
+        Args:
+            current_box (Box): The box.
+            label (str, optional): A description of the snapshot. Defaults to "".
+
+        Returns:
+            tuple: The number of the version and the number of changed cards.
+        """
+        versions = self.versions()
+        parent = versions[-1] if versions else None
+        base = current_box.snapshot_base
+        incremental = base is not None and base[:2] == (self.folder, parent)
+        complete = True
+        if incremental:
+            _, _, previous, base_categories, base_next_id = base
+        else:
+            previous = {}
+            if parent is not None:
+                previous = self.cards(parent)
+                data = self.read_version(parent)
+                base_categories, base_next_id = data["categories"], data["next_id"]
+                # the changes since the box was opened are all in changed_cards only without an earlier snapshot
+                complete = not (
+                    base is None
+                    and data.get("saved") is not None
+                    and data["saved"] == saved_state(current_box)
+                    and not data.get("unsaved")
+                )
+            if complete:
+                current_box.ensure_loaded()
+
+        with current_box.lock.write():
+            changed_cards, current_box.changed_cards = current_box.changed_cards, set()
+        try:
+            with current_box.lock.read():
+                categories = list(current_box.categories)
+                next_id = current_box.next_id
+                ids = current_box.ids
+                candidates = set(changed_cards)
+                if not incremental:
+                    candidates.update(ids)
+                    if complete:
+                        candidates.update(previous)
+                records = {
+                    card_id: card_record(ids[card_id])
+                    for card_id in candidates
+                    if card_id in ids
+                }
+                state = saved_state(current_box)
+                unsaved = sorted(getattr(current_box, "dirty", ()))
+
+            changed = {
+                card_id: blob
+                for card_id, (_, blob) in records.items()
+                if previous.get(card_id) != blob
+            }
+            removed = sorted(
+                card_id
+                for card_id in candidates
+                if card_id not in records and card_id in previous
+            )
+            if parent is not None and not changed and not removed:
+                if base_categories == categories and base_next_id == next_id:
+                    current_box.snapshot_base = (
+                        self.folder,
+                        parent,
+                        previous,
+                        categories,
+                        next_id,
+                    )
+                    return parent, 0
+
+            for card_id in changed:
+                self.objects.put(records[card_id][0])
+            for card_id in removed:
+                del previous[card_id]
+            previous.update(changed)
+            number = (parent or 0) + 1
+            data = {
+                "version": number,
+                "parent": parent,
+                "time": time.time(),
+                "label": label,
+                "categories": categories,
+                "next_id": next_id,
+                "count": len(previous),
+                "changes": len(changed) + len(removed),
+            }
+            if state is not None:
+                data["saved"] = state
+                data["unsaved"] = unsaved
+            if parent is None or number % KEYFRAME_INTERVAL == 0:
+                data["cards"] = {
+                    str(card_id): blob for card_id, blob in sorted(previous.items())
+                }
+            else:
+                data["changed"] = {
+                    str(card_id): blob for card_id, blob in changed.items()
+                }
+                data["removed"] = removed
+            file_path = self.version_path(number)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            temporary_path = f"{file_path}.tmp"
+            with open(temporary_path, "w") as file:
+                json.dump(data, file, separators=(",", ":"))
+            os.replace(temporary_path, file_path)
+        except BaseException:
+            # the changes were not recorded, the next snapshot compares them again
+            current_box.snapshot_base = None
+            with current_box.lock.write():
+                current_box.changed_cards |= changed_cards
+            raise
+        current_box.snapshot_base = (self.folder, number, previous, categories, next_id)
+        return number, data["changes"]
+
+    def history(self):
+        """
+        Lists all versions without their cards.
+
+        Returns:
+            list: Tuples of number, time, label, number of cards and number of changed cards, oldest first.
+        """
+        history = []
+        for number in self.versions():
+            data = self.read_version(number)
+            history.append(
+                (number, data["time"], data["label"], data["count"], data["changes"])
+            )
+        return history
+
+    def diff(self, old, new):
+        """
+        Compares two versions, or a version and a box.
+
+        Args:
+            old (int): The older version.
+            new (int or Box): The newer version, or a box to compare with its current state.
+
+        Returns:
+            tuple: The added, removed and changed cards as lists of tuples of ID, old record and new record (None if missing).
+        """
+        before = self.cards(old)
+        current = {}
+        if isinstance(new, int):
+            after = self.cards(new)
+        else:
+            new.ensure_loaded()
+            with new.lock.read():
+                current = {card.id: card for card in new.cards}
+            after = {card_id: card_record(card)[1] for card_id, card in current.items()}
+
+        def read(records, card_id):
+            if card_id not in records:
+                return None
+            if records is after and card_id in current:
+                return current[card_id].to_dict()
+            return self.record(records[card_id])
+
+        added, removed, changed = [], [], []
+        for card_id in sorted(set(before) | set(after)):
+            if before.get(card_id) == after.get(card_id):
+                continue
+            old_record = read(before, card_id)
+            new_record = read(after, card_id)
+            if old_record is None:
+                added.append((card_id, None, new_record))
+            elif new_record is None:
+                removed.append((card_id, old_record, None))
+            else:
+                changed.append((card_id, old_record, new_record))
+        return added, removed, changed
+
+    def restore(self, number):
+        """
+        Rebuilds the box of a version.
+
+        Args:
+            number (int): The version.
+
+        Returns:
+            Box: The box as it was when the snapshot was taken.
+        """
+        data = self.read_version(number)
+        records = self.cards(number)
+        return box.Box.from_dict(
+            {
+                "name": self.name,
+                "categories": data["categories"],
+                "next_id": data["next_id"],
+                "cards": [self.record(blob) for _, blob in sorted(records.items())],
+            }
+        )
+
+    def referenced_blobs(self):
+        """
+        Collects the hashes of all attachments referenced by the card records of the snapshots (see blobs.py).
+        """
+        referenced = set()
+        for blob in self.objects.blobs():
+            for attachment in self.record(blob).get("attachments", []):
+                referenced.add(attachment["blob"])
+        return referenced
+
+
+def describe_change(card_id, old, new):
+    """
+    Describes how a card differs between two versions in one line.
+
+    Args:
+        card_id (int): The ID of the card.
+        old (dict): The old record, None if the card was added.
+        new (dict): The new record, None if the card was removed.
+
+    Returns:
+        str: The description.
+    """
+    if old is None:
+        return f"+ #{card_id} {new['category']}: {new['question']}"
+    if new is None:
+        return f"- #{card_id} {old['category']}: {old['question']}"
+    fields = [
+        f"{field.upper()} {old.get(field)!r} -> {new.get(field)!r}"
+        for field in sorted(set(old) | set(new))
+        if old.get(field) != new.get(field)
+    ]
+    return f"~ #{card_id} {new['question']}: {', '.join(fields)}"
+
+
+# ______Entry point______
+
+
+def load_box(name, save_folder):
+    """
+    Loads a saved box, sharded or not.
+    """
+    folder = os.path.join(save_folder, name)
+    if shards.is_sharded(folder):
+        return shards.ShardedBox.open(folder)
+    return box.Box.load_from_json(os.path.join(save_folder, f"{name}.json"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshots of FlashLine_ boxes.")
+    parser.add_argument("--data", default="data", help="folder with the save-files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    take_parser = commands.add_parser("take", help="snapshot the saved box")
+    take_parser.add_argument("box", help="name of the box")
+    take_parser.add_argument("--label", default="", help="description")
+    list_parser = commands.add_parser("list", help="list all versions")
+    list_parser.add_argument("box", help="name of the box")
+    diff_parser = commands.add_parser("diff", help="compare two versions")
+    diff_parser.add_argument("box", help="name of the box")
+    diff_parser.add_argument("old", type=int, help="the older version")
+    diff_parser.add_argument("new", type=int, nargs="?", help="default: the saved box")
+    restore_parser = commands.add_parser("restore", help="restore a version")
+    restore_parser.add_argument("box", help="name of the box")
+    restore_parser.add_argument("version", type=int, help="the version")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.box, args.data)
+    if args.command == "take":
+        number, changes = store.snapshot(load_box(args.box, args.data), args.label)
+        print(f"SNAPSHOT {number} TAKEN - {changes} FLASHCARDS CHANGED")
+    elif args.command == "list":
+        for number, taken, label, count, changes in store.history():
+            date = time.strftime("%Y-%m-%d %H:%M", time.localtime(taken))
+            print(
+                f"{number:>4}  {date}  {count:>8} CARDS  {changes:>8} CHANGED  {label}"
+            )
+    elif args.command == "diff":
+        new = args.new if args.new is not None else load_box(args.box, args.data)
+        added, removed, changed = store.diff(args.old, new)
+        for card_id, old_record, new_record in added + removed + changed:
+            print(describe_change(card_id, old_record, new_record))
+        print(f"{len(added)} ADDED, {len(removed)} REMOVED, {len(changed)} CHANGED")
+    elif args.command == "restore":
+        current_box = load_box(args.box, args.data)
+        number, _ = store.snapshot(current_box, f"BEFORE RESTORING {args.version}")
+        restored = store.restore(args.version)
+        restored.compression = current_box.compression
+        restored.category_column = current_box.category_column
+        if isinstance(current_box, shards.ShardedBox):
+            restored = shards.ShardedBox.from_box(restored)
+        restored.save_to_json(args.data)
+        print(
+            f"SNAPSHOT {args.version} RESTORED - THE PREVIOUS STATE IS SNAPSHOT {number}"
+        )
+
+
+if __name__ == "__main__":
+    main()
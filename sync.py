@@ -0,0 +1,543 @@
+import argparse
+import hashlib
+import json
+import os
+
+import box
+import compression
+import schema
+
+"""
+The `sync.py` script combines divergent copies of a flashcard box.
+A three-way merge (`merge`) takes the common ancestor of two copies and combines added, deleted and edited cards,
+learning progress and categories of both copies. Cards are joined by ID in hash maps, so merging takes linear time.
+A delta (`compute_delta`, `apply_delta`) ships only the cards that changed between two versions of a box.
+Versions are compared by per-card content hashes, which can be kept in a small manifest (`manifest`) instead of the old box.
+A delta can also be merged into a box that changed itself since (`merge_delta`), keeping the changes of the box.
+
+Run it as a command:
+    python sync.py merge BASE OURS THEIRS [--policy max|min|latest] [--name NAME]
+    python sync.py manifest BOX [-o MANIFEST]
+    python sync.py delta OLD NEW [-o PATCH]         (OLD is a box or a manifest)
+    python sync.py apply BOX PATCH
+"""
+
+# ____________________
+
+POLICIES = ("max", "min", "latest")
+
+
+def pick(base, ours, theirs):
+    """
+    Three-way merge of a single value. Takes the changed side, ours if both changed.
+
+    Args:
+        base: The value in the common ancestor.
+        ours: The value in our copy.
+        theirs: The value in their copy.
+
+    Returns:
+        The merged value.
+    """
+    if ours == base:
+        return theirs
+    return ours
+
+
+def merge_level(base, ours, theirs, policy):
+    """
+    Merges the level of a card. If only one copy changed it, that change wins. Otherwise the policy decides:
+    'max' keeps the higher level, 'min' the lower one and 'latest' the level of the copy that reviewed the card last.
+
+    Args:
+        base (Card): The card in the common ancestor, or None if both copies added it.
+        ours (Card): The card in our copy.
+        theirs (Card): The card in their copy.
+        policy (str): One of POLICIES.
+
+    Returns:
+        int: The merged level.
+    """
+    if base is not None:
+        if ours.level == base.level:
+            return theirs.level
+        if theirs.level == base.level:
+            return ours.level
+    if policy == "max":
+        return max(ours.level, theirs.level)
+    if policy == "min":
+        return min(ours.level, theirs.level)
+    if (theirs.last_review or 0) > (ours.last_review or 0):
+        return theirs.level
+    return ours.level
+
+
+def merge_card(base, ours, theirs, policy):
+    """
+    Merges two versions of a card into a new card.
+
+    Args:
+        base (Card): The card in the common ancestor, or None if both copies added it.
+        ours (Card): The card in our copy.
+        theirs (Card): The card in their copy.
+        policy (str): One of POLICIES, decides level conflicts.
+
+    Returns:
+        Card: The merged card, with the ID of our card.
+    """
+    card = copy_card(ours)
+    card.level = merge_level(base, ours, theirs, policy)
+    card.last_review = max(ours.last_review or 0, theirs.last_review or 0) or None
+    if base is None:
+        card.failures = max(ours.failures, theirs.failures)
+        return card
+    card.question = pick(base.question, ours.question, theirs.question)
+    card.answer = pick(base.answer, ours.answer, theirs.answer)
+    card.category = pick(base.category, ours.category, theirs.category)
+    card.attachments = pick(base.attachments, ours.attachments, theirs.attachments)
+    card.failures = ours.failures + theirs.failures - base.failures
+    return card
+
+
+def copy_card(card):
+    """
+    Copies a card, so the merged box does not share cards with its inputs.
+    """
+    return box.Card.from_dict(card.to_dict())
+
+
+def merge(base, ours, theirs, policy="max"):
+    """
+    Three-way merge of two copies of a box with their common ancestor.
+
+    - Cards added in one copy are added. Cards added in both copies with the same question are merged.
+    - Cards deleted in one copy are deleted.
+    - Questions, answers and categories changed in one copy are taken over. If both changed them, ours wins.
+    - Levels changed in one copy are taken over. If both changed them, the policy decides (see merge_level).
+    - Categories added in one copy are added, categories deleted in one copy are deleted.
+
+    Args:
+        base (Box): The common ancestor.
+        ours (Box): Our copy. Its name is kept.
+        theirs (Box): Their copy.
+        policy (str, optional): 'max', 'min' or 'latest'. Defaults to 'max'.
+
+    Returns:
+        Box: The merged box.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+
+    cards = {}
+    # cards of the common ancestor, joined by ID
+    for card_id, base_card in base.ids.items():
+        our_card = ours.ids.get(card_id)
+        their_card = theirs.ids.get(card_id)
+        if our_card is not None and their_card is not None:
+            cards[card_id] = merge_card(base_card, our_card, their_card, policy)
+
+    # cards added in one or both copies, joined by question
+    questions = {card.question: card for card in cards.values()}
+    next_id = max(base.next_id, ours.next_id, theirs.next_id)
+    for card in ours.cards:
+        if card.id not in base.ids:
+            new_card = copy_card(card)
+            cards[new_card.id] = new_card
+            questions.setdefault(new_card.question, new_card)
+    for card in theirs.cards:
+        if card.id in base.ids:
+            continue
+        existing = questions.get(card.question)
+        if existing is not None:
+            merged_card = merge_card(None, existing, card, policy)
+            cards[existing.id] = merged_card
+            questions[card.question] = merged_card
+            continue
+        new_card = copy_card(card)
+        if new_card.id in cards:
+            new_card.id = next_id
+            next_id += 1
+        cards[new_card.id] = new_card
+        questions[new_card.question] = new_card
+
+    base_categories = set(base.categories)
+    our_categories = set(ours.categories)
+    their_categories = set(theirs.categories)
+    categories = (our_categories | their_categories) - (
+        base_categories - (our_categories & their_categories)
+    )
+    categories |= {card.category for card in cards.values()}
+
+    merged = box.Box(ours.name)
+    merged.categories = sorted(categories)
+    merged.cards = list(cards.values())
+    merged.ids = dict(cards)
+    merged.next_id = max([next_id] + [card_id + 1 for card_id in cards])
+    merged.rebuild_indexes()
+    merged.dedupe("min" if policy == "min" else "max")
+    return merged
+
+
+# ______Delta between versions of a box______
+
+DELTA_FORMAT = "flashline-delta"
+MANIFEST_FORMAT = "flashline-manifest"
+
+
+def content_hash(card):
+    """
+    Hashes the content of a card (category, question, answer and attachments), but not its progress.
+
+    Args:
+        card (Card): The card.
+
+    Returns:
+        str: A short hex digest.
+    """
+    fields = [card.category, card.question, card.answer]
+    fields += [f"{item['name']}:{item['blob']}" for item in card.attachments]
+    content = "\x1f".join(fields)
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+def progress(card):
+    """
+    Returns the learning progress of a card: level, failures and time of the last review.
+    """
+    return [card.level, card.failures, card.last_review]
+
+
+def manifest(current_box):
+    """
+    Creates the manifest of a box: content hash and progress of every card, by ID.
+    A manifest is all that is needed of an old version to compute a delta to a new one.
+
+    Args:
+        current_box (Box): The box.
+
+    Returns:
+        dict: The manifest.
+    """
+    with current_box.lock.read():
+        return {
+            "format": MANIFEST_FORMAT,
+            "name": current_box.name,
+            "categories": list(current_box.categories),
+            "next_id": current_box.next_id,
+            "cards": {
+                str(card.id): [content_hash(card)] + progress(card)
+                for card in current_box.cards
+            },
+        }
+
+
+def compute_delta(old, new_box):
+    """
+    Computes the delta from an old version of a box to a new one.
+
+    Args:
+        old (Box or dict): The old version, as box or as its manifest.
+        new_box (Box): The new version.
+
+    Returns:
+        dict: The patch, with added and updated cards, removed card IDs and changed progress by card ID.
+    """
+    if not isinstance(old, dict):
+        old = manifest(old)
+    old_cards = old["cards"]
+    added = []
+    updated = []
+    levels = {}
+    seen = set()
+    with new_box.lock.read():
+        for card in new_box.cards:
+            key = str(card.id)
+            seen.add(key)
+            entry = old_cards.get(key)
+            if entry is None:
+                added.append(card.to_dict())
+            elif entry[0] != content_hash(card):
+                updated.append(card.to_dict())
+            elif entry[1:] != progress(card):
+                levels[key] = progress(card)
+        categories = list(new_box.categories)
+        next_id = new_box.next_id
+    return {
+        "format": DELTA_FORMAT,
+        "name": new_box.name,
+        "categories": categories,
+        "next_id": next_id,
+        "added": added,
+        "updated": updated,
+        "removed": [int(key) for key in old_cards if key not in seen],
+        "levels": levels,
+    }
+
+
+def apply_delta(current_box, patch):
+    """
+    Applies a patch to a box in place. The box must be the version the patch was computed from.
+
+    Args:
+        current_box (Box): The box to change.
+        patch (dict): The patch from compute_delta.
+
+    Raises:
+        ValueError: If the patch does not fit the box.
+    """
+    if patch.get("format") != DELTA_FORMAT:
+        raise ValueError("not a delta")
+    with current_box.lock.write():
+        ids = current_box.ids
+        changed_ids = [card["id"] for card in patch["updated"]] + patch["removed"]
+        changed_ids += [int(key) for key in patch["levels"]]
+        missing = [card_id for card_id in changed_ids if card_id not in ids]
+        if missing or any(card["id"] in ids for card in patch["added"]):
+            raise ValueError("patch does not fit the box")
+
+        removed = set(patch["removed"])
+        for card_id in removed:
+            card = ids.pop(card_id)
+            current_box.unindex_card(card)
+            current_box.mark_changed(card)
+        if removed:
+            current_box.cards[:] = [
+                card for card in current_box.cards if card.id not in removed
+            ]
+        # unindex all updated cards first, so questions can be swapped between them
+        for card_data in patch["updated"]:
+            current_box.unindex_card(ids[card_data["id"]])
+        for card_data in patch["updated"]:
+            card = ids[card_data["id"]]
+            card.question = card_data["question"]
+            card.answer = card_data["answer"]
+            card.category = card_data["category"]
+            card.level = card_data["level"]
+            card.failures = card_data.get("failures", 0)
+            card.last_review = card_data.get("last_review")
+            card.attachments = card_data.get("attachments", [])
+            current_box.index_card(card)
+            current_box.mark_changed(card)
+        for key, (level, failures, last_review) in patch["levels"].items():
+            card = ids[int(key)]
+            card.level = level
+            card.failures = failures
+            card.last_review = last_review
+            current_box.reindex_level(card)
+            current_box.mark_changed(card)
+        for card_data in patch["added"]:
+            card = box.Card.from_dict(card_data)
+            ids[card.id] = card
+            current_box.cards.append(card)
+            current_box.index_card(card)
+            current_box.mark_changed(card)
+        current_box.categories[:] = sorted(patch["categories"])
+        current_box.next_id = max(current_box.next_id, patch["next_id"])
+
+
+def merge_delta(current_box, base, patch):
+    """
+    Applies a patch to a box that changed since the version the patch was computed from, keeping its own changes.
+    Used to take over changes another program made to the save file of an open box (see watch.py).
+
+    - Cards added by the patch are added. If the box added a card with the same ID, the added card gets a new ID,
+      so the IDs of the box stay valid for open sessions (see session.py) and its review log.
+      If it added a card with the same question, the card of the box is kept.
+    - Cards removed or updated by the patch are removed or updated, unless the box changed or deleted them itself.
+    - Progress changed by the patch is taken over, unless the box changed it too. Then the later review wins.
+    - Categories added or deleted by the patch are added or deleted.
+
+    Args:
+        current_box (Box): The box to change.
+        base (dict): The manifest of the version the patch was computed from.
+        patch (dict): The patch from compute_delta.
+
+    Returns:
+        dict: The number of added, updated, removed and kept cards and of changed levels. Kept cards are changes
+        of the patch that were not taken over because the box changed the same card.
+
+    Raises:
+        ValueError: If the patch is no delta.
+    """
+    if patch.get("format") != DELTA_FORMAT:
+        raise ValueError("not a delta")
+    base_cards = base["cards"]
+    counts = {"added": 0, "updated": 0, "removed": 0, "levels": 0, "kept": 0}
+
+    def changed_content(card):
+        return content_hash(card) != base_cards[str(card.id)][0]
+
+    def take_progress(card, level, failures, last_review):
+        if progress(card) != base_cards[str(card.id)][1:]:
+            if (last_review or 0) <= (card.last_review or 0):
+                counts["kept"] += 1
+                return
+        card.level = level
+        card.failures = failures
+        card.last_review = last_review
+        current_box.reindex_level(card)
+        current_box.mark_changed(card)
+        counts["levels"] += 1
+
+    with current_box.lock.write():
+        ids = current_box.ids
+        removed = set()
+        for card_id in patch["removed"]:
+            card = ids.get(card_id)
+            if card is None:
+                continue
+            if changed_content(card):
+                counts["kept"] += 1
+                continue
+            current_box.unindex_card(ids.pop(card_id))
+            current_box.mark_changed(card)
+            removed.add(card_id)
+        if removed:
+            current_box.cards[:] = [
+                card for card in current_box.cards if card.id not in removed
+            ]
+            counts["removed"] = len(removed)
+
+        for card_data in patch["updated"]:
+            card = ids.get(card_data["id"])
+            if card is None:
+                counts["kept"] += 1
+                continue
+            other = current_box.questions.get(card_data["question"])
+            if changed_content(card) or other not in (None, card):
+                counts["kept"] += 1
+            else:
+                current_box.unindex_card(card)
+                card.question = card_data["question"]
+                card.answer = card_data["answer"]
+                card.category = card_data["category"]
+                card.attachments = card_data.get("attachments", [])
+                current_box.index_card(card)
+                current_box.mark_changed(card)
+                counts["updated"] += 1
+            their_progress = [
+                card_data["level"],
+                card_data.get("failures", 0),
+                card_data.get("last_review"),
+            ]
+            if their_progress != base_cards[str(card.id)][1:]:
+                take_progress(card, *their_progress)
+
+        for key, (level, failures, last_review) in patch["levels"].items():
+            card = ids.get(int(key))
+            if card is None:
+                counts["kept"] += 1
+            else:
+                take_progress(card, level, failures, last_review)
+
+        next_id = max([current_box.next_id, patch["next_id"]] + list(ids))
+        for card_data in patch["added"]:
+            if card_data["question"] in current_box.questions:
+                counts["kept"] += 1
+                continue
+            card = box.Card.from_dict(card_data)
+            if card.id in ids:
+                # the box added a card with the same ID since the base version, their card moves to a new ID
+                card.id = next_id
+                next_id += 1
+            ids[card.id] = card
+            current_box.cards.append(card)
+            current_box.index_card(card)
+            current_box.mark_changed(card)
+            counts["added"] += 1
+        current_box.next_id = max(next_id, max(ids, default=0) + 1)
+
+        base_categories = set(base["categories"])
+        their_categories = set(patch["categories"])
+        categories = (
+            set(current_box.categories) | their_categories - base_categories
+        ) - (base_categories - their_categories)
+        categories |= {card.category for card in current_box.cards}
+        current_box.categories[:] = sorted(categories)
+    return counts
+
+
+def write_json(data, file_path):
+    """
+    Writes a patch or manifest as compact JSON.
+    """
+    with open(file_path, "w") as file:
+        json.dump(data, file, separators=(",", ":"))
+
+
+def read_json(file_path):
+    """
+    Reads a patch, manifest or save file, plain or compressed (see compression.py).
+    """
+    with open(file_path, "rb") as file:
+        content, _ = compression.decompress(file.read())
+    return json.loads(content)
+
+
+# ______Entry point______
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Combine copies of FlashLine_ boxes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    merge_parser = commands.add_parser("merge", help="three-way merge of two copies")
+    merge_parser.add_argument("base", help="JSON file of the common ancestor")
+    merge_parser.add_argument("ours", help="JSON file of our copy")
+    merge_parser.add_argument("theirs", help="JSON file of their copy")
+    merge_parser.add_argument("--policy", choices=POLICIES, default="max")
+    merge_parser.add_argument("--name", help="name of the merged box (default: ours)")
+    merge_parser.add_argument("--data", default="data", help="folder to save to")
+    manifest_parser = commands.add_parser(
+        "manifest", help="write the manifest of a box"
+    )
+    manifest_parser.add_argument("box", help="JSON file of the box")
+    manifest_parser.add_argument("-o", "--output", help="default: BOX.manifest")
+    delta_parser = commands.add_parser("delta", help="write the delta between versions")
+    delta_parser.add_argument("old", help="JSON file or manifest of the old version")
+    delta_parser.add_argument("new", help="JSON file of the new version")
+    delta_parser.add_argument("-o", "--output", help="default: NEW.patch")
+    apply_parser = commands.add_parser("apply", help="apply a delta to a box")
+    apply_parser.add_argument("box", help="JSON file of the box, changed in place")
+    apply_parser.add_argument("patch", help="the delta")
+    args = parser.parse_args()
+
+    if args.command == "manifest":
+        output = args.output or f"{os.path.splitext(args.box)[0]}.manifest"
+        write_json(manifest(box.Box.load_from_json(args.box)), output)
+        print(f"MANIFEST SAVED TO {output}")
+    elif args.command == "delta":
+        old = read_json(args.old)
+        if not isinstance(old, dict) or old.get("format") != MANIFEST_FORMAT:
+            # a save file, in any version and with or without category column, like Box.load_from_json
+            old = box.Box.from_dict(schema.load(old))
+        new_box = box.Box.load_from_json(args.new)
+        output = args.output or f"{os.path.splitext(args.new)[0]}.patch"
+        patch = compute_delta(old, new_box)
+        write_json(patch, output)
+        print(
+            f"DELTA SAVED TO {output}: {len(patch['added'])} ADDED, "
+            f"{len(patch['updated'])} UPDATED, {len(patch['removed'])} REMOVED, "
+            f"{len(patch['levels'])} LEVELS CHANGED"
+        )
+    elif args.command == "apply":
+        current_box = box.Box.load_from_json(args.box)
+        apply_delta(current_box, read_json(args.patch))
+        current_box.save_to_json(os.path.dirname(args.box) or ".", args.box)
+        print(f"DELTA APPLIED TO {args.box}")
+    elif args.command == "merge":
+        merged = merge(
+            box.Box.load_from_json(args.base),
+            box.Box.load_from_json(args.ours),
+            box.Box.load_from_json(args.theirs),
+            args.policy,
+        )
+        if args.name:
+            merged.name = args.name
+        merged.save_to_json(args.data)
+        print(
+            f"BOX '{merged.name}' SAVED TO {os.path.join(args.data, merged.name)}.json"
+        )
+
+
+if __name__ == "__main__":
+    main()
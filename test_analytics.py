@@ -0,0 +1,73 @@
+import numpy as np
+
+import analytics
+import shards
+from box import Box
+
+
+def test_review_log_round_trip(tmp_path):
+    test_box = Box("TEST")
+    test_box.add_category("A")
+    test_box.add_category("B")
+    first = test_box.add_card("Q1", "A1", "A")
+    second = test_box.add_card("Q2", "A2", "B")
+    test_box.change_level(first, True)
+    test_box.change_level(first, True)
+    test_box.change_level(second, False)
+    test_box.save_to_json(tmp_path)
+    test_box.change_level(first, False)
+    test_box.save_to_json(tmp_path)
+
+    log = analytics.load_reviews(tmp_path / "TEST.reviews")
+    assert list(log["card"]) == [first.id, first.id, second.id, first.id]
+    assert list(log["level"]) == [1, 2, 1, 3]
+    assert list(log["correct"]) == [1, 1, 0, 0]
+
+    cards, reviews, categories = analytics.load_boxes(tmp_path)
+    assert categories == ["A", "B"]
+    assert analytics.retention_by_category(cards, reviews, categories) == {
+        "A": (3, 2 / 3),
+        "B": (1, 0.0),
+    }
+    matrix = analytics.transition_matrix(reviews)
+    assert matrix[0, 1] == 1 and matrix[1, 2] == 1 and matrix[0, 0] == 1
+    assert matrix[2, 0] == 1 and matrix.sum() == 4
+
+
+def test_sharded_boxes_are_included(tmp_path):
+    plain = Box("PLAIN")
+    plain.add_category("A")
+    plain.change_level(plain.add_card("Q1", "A1", "A"), True)
+    plain.save_to_json(tmp_path)
+    sharded = shards.ShardedBox("SHARDED")
+    sharded.add_category("B")
+    sharded.change_level(sharded.add_card("Q2", "A2", "B"), False)
+    sharded.save_to_json(tmp_path)
+
+    cards, reviews, categories = analytics.load_boxes(tmp_path)
+    assert categories == ["A", "B"]
+    assert len(cards["key"]) == len(reviews["key"]) == 2
+    assert analytics.retention_by_category(cards, reviews, categories) == {
+        "A": (1, 1.0),
+        "B": (1, 0.0),
+    }
+
+
+def test_time_to_mastery():
+    day = analytics.SECONDS_PER_DAY
+    reviews = {
+        "key": np.array([1, 1, 1, 2, 2]),
+        "time": np.array([3 * day, 0.0, 5 * day, 0.0, day]),
+        "level": np.array([9, 1, 9, 1, 2]),
+        "correct": np.array([1, 1, 1, 1, 1]),
+    }
+    assert list(analytics.time_to_mastery(reviews)) == [3.0]
+
+
+def test_forecast_review_load():
+    day = analytics.SECONDS_PER_DAY
+    cards = {
+        "level": np.array([1, 2, 3, 1]),
+        "last_review": np.array([0.0, 0.0, -10 * day, np.nan]),
+    }
+    assert list(analytics.forecast_review_load(cards, days=4, now=0.0)) == [2, 1, 1, 0]
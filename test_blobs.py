@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import blobs
+import schema
+import sync
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    test_box.add_card("Q1", "A", "C")
+    test_box.add_card("Q2", "A", "C")
+    return test_box
+
+
+def test_put_deduplicates(tmp_path):
+    store = blobs.BlobStore(tmp_path / "blobs")
+    blob = store.put(b"QUACK")
+    assert store.put(b"QUACK") == blob
+    assert store.blobs() == [blob]
+    assert store.get(blob) == b"QUACK"
+    assert store.size(blob) == 5
+
+
+def test_attachments_are_saved_as_references(tmp_path):
+    store = blobs.BlobStore(tmp_path / "blobs")
+    audio = tmp_path / "duck.mp3"
+    audio.write_bytes(b"\x00" * 10000)
+    test_box = make_box()
+    blob = blobs.attach_file(test_box, 1, str(audio), store)
+    blobs.attach_file(test_box, 2, str(audio), store)
+    test_box.save_to_json(tmp_path)
+
+    assert os.path.getsize(tmp_path / "TEST.json") < 1000
+    loaded = Box.load_from_json(tmp_path / "TEST.json")
+    assert loaded.get_card(1).attachments == [{"name": "duck.mp3", "blob": blob}]
+    assert store.blobs() == [blob]
+
+
+def test_collect(tmp_path):
+    store = blobs.BlobStore(tmp_path / "blobs")
+    test_box = make_box()
+    kept = store.put(b"KEPT")
+    dropped = store.put(b"DROPPED")
+    test_box.add_attachment(1, "kept.png", kept)
+    test_box.save_to_json(tmp_path)
+
+    referenced = blobs.referenced_blobs(tmp_path)
+    assert store.collect(referenced) == 0  # too young
+    assert store.collect(referenced, grace_seconds=0) == 1
+    assert store.blobs() == [kept]
+    assert dropped not in store.blobs()
+
+
+def test_put_again_renews_grace_period(tmp_path):
+    store = blobs.BlobStore(tmp_path / "blobs")
+    blob = store.put(b"OLD")
+    os.utime(store.path(blob), (0, 0))
+    assert store.put(b"OLD") == blob
+    assert store.collect(set()) == 0
+    assert store.blobs() == [blob]
+
+
+def test_invalid_reference():
+    data = make_box().to_dict()
+    data["cards"][0]["attachments"] = [{"name": "x", "blob": "not a hash"}]
+    with pytest.raises(schema.SchemaError):
+        schema.load(data)
+
+
+def test_delta_ships_attachments():
+    old = make_box()
+    new = Box.from_dict(old.to_dict())
+    new.add_attachment(1, "duck.mp3", "a" * 64)
+    patch = sync.compute_delta(old, new)
+    assert [card["id"] for card in patch["updated"]] == [1]
+    sync.apply_delta(old, patch)
+    assert old.get_card(1).attachments == [{"name": "duck.mp3", "blob": "a" * 64}]
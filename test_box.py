@@ -0,0 +1,205 @@
+import pytest
+import random
+import threading
+
+import schema
+from box import Box
+
+
+def test_concurrent_learning_and_editing():
+    test_box = Box("STRESS")
+    test_box.add_category("LEARN")
+    test_box.add_category("EDIT")
+    for i in range(500):
+        test_box.add_card(f"Q{i}", f"A{i}", "LEARN")
+    learn_cards = test_box.list_card_obj_in_category("LEARN")
+    errors = []
+
+    def learner():
+        # every learner promotes every card once, 9 learners move all cards from level 1 to 10
+        for card in random.sample(learn_cards, len(learn_cards)):
+            test_box.change_level(card, True)
+
+    def editor(n):
+        for i in range(200):
+            card = test_box.add_card(f"E{n}-{i}", "A", "EDIT")
+            if i % 2:
+                test_box.delete_card(card.id)
+
+    def reader():
+        for _ in range(200):
+            count = test_box.count_cards_level()
+            if sum(count.values()) < 500:
+                errors.append(count)
+            test_box.list_cards_in_category("EDIT")
+
+    threads = [threading.Thread(target=learner) for _ in range(9)]
+    threads += [threading.Thread(target=editor, args=(n,)) for n in range(4)]
+    threads += [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert test_box.count_cards_level(learn_cards)[10] == 500
+    assert len(test_box.list_card_obj_in_category("EDIT")) == 4 * 100
+    assert len(test_box.cards) == 500 + 4 * 100
+
+
+def test_add_card_unique():
+    test_box = Box("TEST")
+    card = test_box.add_card("Q", "A", "C")
+    with pytest.raises(ValueError):
+        test_box.add_card("Q", "B", "C")
+    assert test_box.check_card("Q") == True
+    assert test_box.check_card("R") == False
+    test_box.delete_card(card.id)
+    assert test_box.check_card("Q") == False
+    assert test_box.cards == []
+
+
+def test_dedupe():
+    data = {
+        "name": "TEST",
+        "categories": ["C"],
+        "cards": [
+            {"category": "C", "question": "Q1", "answer": "A", "level": 3},
+            {"category": "C", "question": "Q2", "answer": "A", "level": 1},
+            {"category": "C", "question": "Q1", "answer": "A", "level": 7},
+            {"category": "C", "question": "Q1", "answer": "A", "level": 2},
+        ],
+    }
+    test_box = Box.from_dict(schema.load(data))
+    assert test_box.dedupe("max") == 2
+    assert [card.question for card in test_box.cards] == ["Q1", "Q2"]
+    assert test_box.find_card("Q1").level == 7
+
+    test_box = Box.from_dict(schema.load(data))
+    assert test_box.dedupe("min") == 2
+    assert test_box.find_card("Q1").level == 2
+    assert test_box.dedupe() == 0
+    assert test_box.list_conflicts() == []
+
+
+def test_dedupe_keeps_conflicting_duplicates():
+    data = {
+        "name": "TEST",
+        "categories": ["C", "D"],
+        "cards": [
+            {"category": "C", "question": "Q1", "answer": "A", "level": 3},
+            {"category": "C", "question": "Q1", "answer": "B", "level": 1},
+            {"category": "D", "question": "Q1", "answer": "A", "level": 1},
+            {"category": "C", "question": "Q1", "answer": "A", "level": 5},
+        ],
+    }
+    test_box = Box.from_dict(schema.load(data))
+    assert test_box.dedupe() == 1
+    assert [(card.answer, card.category) for card in test_box.cards] == [
+        ("A", "C"),
+        ("B", "C"),
+        ("A", "D"),
+    ]
+    assert test_box.cards[0].level == 5
+    assert test_box.list_conflicts() == ["Q1"]
+
+
+def test_card_ids():
+    test_box = Box("TEST")
+    first = test_box.add_card("Q1", "A1", "C")
+    second = test_box.add_card("Q2", "A2", "C")
+    assert (first.id, second.id) == (1, 2)
+    test_box.delete_card(first.id)
+    assert test_box.add_card("Q3", "A3", "C").id == 3
+
+    test_box.edit_card(second.id, question="Q2-NEW", answer="A2-NEW")
+    assert test_box.get_card(second.id) is second
+    assert test_box.find_card("Q2-NEW") is second
+    assert test_box.check_card("Q2") == False
+    with pytest.raises(ValueError):
+        test_box.edit_card(second.id, question="Q3")
+
+    loaded = Box.from_dict(test_box.to_dict())
+    assert [card.id for card in loaded.cards] == [2, 3]
+    assert loaded.add_card("Q4", "A4", "C").id == 4
+    assert loaded.list_card_ids_in_category("C") == [2, 3, 4]
+
+
+def test_card_ids_old_save_file():
+    data = {
+        "name": "TEST",
+        "categories": ["C"],
+        "cards": [
+            {"category": "C", "question": "Q1", "answer": "A", "level": 1},
+            {"category": "C", "question": "Q2", "answer": "A", "level": 1},
+        ],
+    }
+    test_box = Box.from_dict(schema.load(data))
+    assert [card.id for card in test_box.cards] == [1, 2]
+    assert test_box.next_id == 3
+    # from_dict takes the current schema only, where every flashcard has a unique ID
+    data = test_box.to_dict()
+    del data["cards"][0]["id"]
+    with pytest.raises(ValueError):
+        Box.from_dict(data)
+    data["cards"][0]["id"] = data["cards"][1]["id"]
+    with pytest.raises(ValueError):
+        Box.from_dict(data)
+
+
+def test_sorted_listings():
+    test_box = Box("TEST")
+    for category in ["B", "C", "A"]:
+        test_box.add_category(category)
+    assert test_box.categories == ["A", "B", "C"]
+
+    second = test_box.add_card("Q2", "A", "A")
+    first = test_box.add_card("Q1", "A", "A")
+    test_box.add_card("Q0", "A", "B")
+    assert test_box.list_cards_in_category("A") == ["Q1", "Q2"]
+    assert test_box.list_cards_in_category("A") is test_box.list_cards_in_category("A")
+
+    test_box.edit_card(first.id, question="Q3")
+    assert test_box.list_cards_in_category("A") == ["Q2", "Q3"]
+    assert test_box.list_card_ids_in_category("A") == [second.id, first.id]
+    test_box.delete_card(second.id)
+    assert test_box.list_cards_in_category("A") == ["Q3"]
+    assert test_box.list_cards_in_category("B") == ["Q0"]
+
+
+def test_bulk_levels():
+    test_box = Box("TEST")
+    for category in ["A", "B"]:
+        test_box.add_category(category)
+        for i in range(5):
+            test_box.add_card(f"{category}{i}", "A", category)
+
+    assert test_box.set_levels(4, category="A") == 5
+    assert test_box.shift_levels(3, level=4) == 5
+    assert test_box.count_cards_level()[7] == 5
+    assert test_box.shift_levels(-10) == 5
+    assert test_box.count_cards_level()[1] == 10
+    assert test_box.shift_levels(20, category="B") == 5
+    assert [card.level for card in test_box.list_card_obj_in_level(10)] == [10] * 5
+    assert test_box.reset_levels(category="B", level=10) == 5
+    assert test_box.list_card_obj_in_level(10) == []
+    assert test_box.reset_levels() == 0
+    assert test_box.reviews == []
+    with pytest.raises(ValueError):
+        test_box.set_levels(11)
+
+
+def test_indexes_with_shared_questions():
+    data = {
+        "name": "TEST",
+        "categories": ["C"],
+        "cards": [
+            {"id": 1, "category": "C", "question": "Q1", "answer": "A", "level": 1},
+            {"id": 2, "category": "C", "question": "Q1", "answer": "B", "level": 1},
+        ],
+    }
+    test_box = Box.from_dict(data)
+    test_box.delete_card(2)
+    assert test_box.list_card_ids_in_category("C") == [1]
+    assert test_box.find_card("Q1").id == 1
+    assert test_box.list_card_obj_in_level(42) == []
@@ -0,0 +1,57 @@
+import pytest
+
+import compression
+import schema
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    for category in ("C1", "C2"):
+        test_box.add_category(category)
+        for i in range(50):
+            test_box.add_card(f"{category} Q{i}", f"A{i}", category)
+    return test_box
+
+
+@pytest.mark.parametrize("method", [None, "gzip", "zlib", "lzma"])
+@pytest.mark.parametrize("category_column", [False, True])
+def test_round_trip(tmp_path, method, category_column):
+    test_box = make_box()
+    test_box.compression = method
+    test_box.category_column = category_column
+    test_box.save_to_json(tmp_path)
+    file_path = tmp_path / "TEST.json"
+    assert compression.detect_file(file_path) == (method or "json")
+
+    loaded = Box.load_from_json(file_path)
+    assert loaded.compression == method
+    assert loaded.category_column == category_column
+    assert [card.to_dict() for card in loaded.cards] == [
+        card.to_dict() for card in test_box.cards
+    ]
+
+
+def test_compressed_is_smaller(tmp_path):
+    test_box = make_box()
+    test_box.save_to_json(tmp_path)
+    plain = (tmp_path / "TEST.json").stat().st_size
+    test_box.compression = "gzip"
+    test_box.category_column = True
+    test_box.save_to_json(tmp_path)
+    assert (tmp_path / "TEST.json").stat().st_size < plain / 3
+
+
+def test_detect():
+    assert compression.detect(b'  {"na') == "json"
+    assert compression.detect(b"\x00\x01\x02") is None
+    with pytest.raises(ValueError):
+        compression.decompress(b"\x1f\x8bnot gzip")
+
+
+def test_bad_category_code():
+    data = make_box().to_dict()
+    data["category_table"] = ["C1"]
+    data["cards"][0]["category"] = 5
+    with pytest.raises(ValueError):
+        schema.load(data)
@@ -0,0 +1,129 @@
+import pytest
+
+import driver
+import project
+import ui
+from box import Box
+from deck import Deck
+from deck import DeckBox
+from deck import DeckQuestions
+from deck import Progress
+from deck import build_deck
+
+
+def test_deck_box(tmp_path):
+    source = Box.load_from_json("data/DEMO.json")
+    build_deck(source, tmp_path / "DEMO.deck")
+
+    learner = DeckBox.open(tmp_path / "DEMO.deck", tmp_path / "ALICE.progress")
+    assert learner.name == "ALICE"
+    assert learner.categories == source.categories
+    assert learner.list_cards_in_category(
+        "ANIMAL SOUNDS"
+    ) == source.list_cards_in_category("ANIMAL SOUNDS")
+    card = learner.find_card("DUCK MAKES _____ ?")
+    assert card.answer == "QUACK"
+    assert card.id == source.find_card("DUCK MAKES _____ ?").id
+
+    learner.change_level(card, True)
+    learner.change_level(learner.cards[1], False)
+    learner.save_to_json(tmp_path)
+    with pytest.raises(ValueError):
+        learner.add_card("Q", "A", "ANIMAL SOUNDS")
+
+    reopened = DeckBox.open(tmp_path / "DEMO.deck", tmp_path / "ALICE.progress")
+    assert reopened.find_card("DUCK MAKES _____ ?").level == 2
+    assert reopened.cards[1].failures == 1
+    assert reopened.cards[1].last_review is not None
+    assert reopened.count_cards_level()[1] == len(source.cards) - 1
+
+    other = DeckBox.open(tmp_path / "DEMO.deck", tmp_path / "BOB.progress")
+    assert other.count_cards_level()[1] == len(source.cards)
+
+
+def test_deck_box_is_read_only(tmp_path):
+    source = Box.load_from_json("data/DEMO.json")
+    build_deck(source, tmp_path / "DEMO.deck")
+    learner = DeckBox.open(tmp_path / "DEMO.deck", tmp_path / "ALICE.progress")
+    card_id = learner.cards[0].id
+    for change in (
+        lambda: learner.delete_cards([card_id]),
+        lambda: learner.add_attachment(card_id, "A.PNG", "0" * 64),
+        lambda: learner.remove_attachment(card_id, "0" * 64),
+    ):
+        with pytest.raises(ValueError):
+            change()
+    assert len(learner.cards) == len(source.cards)
+
+
+def test_deck_indexes_are_read_from_the_file(tmp_path):
+    source = Box.load_from_json("data/DEMO.json")
+    build_deck(source, tmp_path / "DEMO.deck")
+    learner = DeckBox.open(tmp_path / "DEMO.deck", tmp_path / "ALICE.progress")
+    assert isinstance(learner.questions, DeckQuestions)
+    for card in source.cards:
+        assert learner.find_card(card.question).id == card.id
+        assert learner.check_card(card.question)
+    assert not learner.check_card("NOT IN THE DECK")
+    for category in source.categories:
+        assert learner.list_card_ids_in_category(
+            category
+        ) == source.list_card_ids_in_category(category)
+    assert sorted(learner.questions) == sorted(source.questions)
+
+
+def test_deck_keeps_empty_categories(tmp_path):
+    source = Box("TEST")
+    source.add_category("EMPTY")
+    source.add_category("C")
+    source.add_card("Q", "A", "C")
+    build_deck(source, tmp_path / "TEST.deck")
+    learner = DeckBox.open(tmp_path / "TEST.deck", tmp_path / "ALICE.progress")
+    assert learner.categories == ["C", "EMPTY"]
+    assert learner.list_cards_in_category("EMPTY") == []
+    assert learner.list_cards_in_category("C") == ["Q"]
+
+
+def test_progress_must_match_the_deck(tmp_path):
+    build_deck(Box.load_from_json("data/DEMO.json"), tmp_path / "DEMO.deck")
+    deck = Deck(tmp_path / "DEMO.deck")
+    Progress(deck).save(tmp_path / "ALICE.progress")
+    with open(tmp_path / "ALICE.progress", "rb") as file:
+        content = file.read()
+    with open(tmp_path / "ALICE.progress", "wb") as file:
+        file.write(content[:-1])
+    with pytest.raises(ValueError):
+        Progress.load(tmp_path / "ALICE.progress", deck)
+
+
+def test_progress_finds_its_deck(tmp_path):
+    source = Box.load_from_json("data/DEMO.json")
+    build_deck(source, tmp_path / "DEMO.deck")
+    other = Box("OTHER")
+    other.add_category("C")
+    other.add_card("Q", "A", "C")
+    build_deck(other, tmp_path / "A_OTHER.deck")
+    Progress(Deck(tmp_path / "DEMO.deck")).save(tmp_path / "ALICE.progress")
+    learner = DeckBox.load(str(tmp_path / "ALICE.progress"))
+    assert len(learner.cards) == len(source.cards)
+    (tmp_path / "DEMO.deck").unlink()
+    with pytest.raises(FileNotFoundError):
+        DeckBox.load(str(tmp_path / "ALICE.progress"))
+
+
+def test_load_box_opens_progress_files(tmp_path, monkeypatch):
+    build_deck(Box.load_from_json("data/DEMO.json"), tmp_path / "DEMO.deck")
+    Progress(Deck(tmp_path / "DEMO.deck")).save(tmp_path / "ALICE.progress")
+    assert project.list_save_files(tmp_path) == ["ALICE"]
+    for name in ("box", "box_folder", "watcher"):
+        monkeypatch.setattr(project, name, getattr(project, name))
+    with ui.use_backend(ui.ScriptedIO(["", driver.MANAGE])) as backend:
+        with pytest.raises(ui.ScriptEnd):
+            project.load_box_ui("ALICE", str(tmp_path))
+    assert isinstance(project.box, DeckBox)
+    assert project.watcher is None
+    output = backend.output.getvalue()
+    assert "BOX 'ALICE' LOADED" in output
+    # the content of the deck is read-only, only showing cards and changing levels is offered
+    assert "SHOW FLASHCARDS" in output and "CHANGE LEVELS" in output
+    assert "NEW FLASHCARD" not in output
@@ -0,0 +1,81 @@
+import driver
+import project
+import ui
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    test_box.add_category("C")
+    test_box.add_card("Q1", "A", "C")
+    test_box.add_card("Q2", "A", "C")
+    return test_box
+
+
+def test_navigate():
+    keys = driver.navigate_keys() * 3
+    backend = driver.run(keys, make_box())
+    assert backend.inputs == len(keys)
+    output = backend.output.getvalue()
+    assert "MAIN MENU > CREATE & MANAGE:" in output
+    assert "QUESTION:\nQ1" in output
+
+
+def test_learn(tmp_path):
+    test_box = make_box()
+    keys = driver.learn_keys(2, "A")
+    backend = driver.run(keys, test_box, save_folder=tmp_path)
+    assert "2 OUT OF 2 ANSWERS CORRECT" in backend.output.getvalue()
+    assert [card.level for card in test_box.cards] == [2, 2]
+    assert len(test_box.reviews) == 2
+
+
+def test_exit():
+    backend = driver.run(["X", "Y", "", "never read"], make_box())
+    assert list(backend.keys) == ["never read"]
+
+
+def test_use_backend_restores():
+    terminal = ui.backend
+    with ui.use_backend(ui.ScriptedIO([])):
+        assert ui.backend is not terminal
+    assert ui.backend is terminal
+
+
+def test_learn_batch(monkeypatch):
+    monkeypatch.setattr(project, "BATCH_SIZE", 5)
+    test_box = make_box()
+    for i in range(3, 13):
+        test_box.add_card(f"Q{i}", "A", "C")
+    keys = driver.batch_keys(12, "A")
+    assert keys.count("") == 3 + 1
+    backend = driver.run(keys, test_box)
+    assert backend.inputs == len(keys)
+    assert "12 OUT OF 12 ANSWERS CORRECT" in backend.output.getvalue()
+    assert all(card.level == 2 for card in test_box.cards)
+
+
+def test_learn_batch_back():
+    test_box = make_box()
+    backend = driver.run(["1", driver.LEARN_BATCH, "A", "X", "", "", "X"], test_box)
+    assert "1 OUT OF 1 ANSWERS CORRECT" in backend.output.getvalue()
+    assert not backend.keys
+
+
+def test_learn_batch_back_before_any_answer():
+    test_box = make_box()
+    backend = driver.run([driver.LEARN, driver.LEARN_BATCH, "X", "X"], test_box)
+    assert "ANSWERS CORRECT" not in backend.output.getvalue()
+    assert "WRONG" not in backend.output.getvalue()
+    assert not backend.keys
+    assert [card.level for card in test_box.cards] == [1, 1]
+
+
+def test_change_levels(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    test_box = make_box()
+    keys = [driver.MANAGE, driver.CHANGE_LEVELS, "1", "1", "+2", "Y", ""]
+    backend = driver.run(keys, test_box)
+    assert "2 FLASHCARDS CHANGED" in backend.output.getvalue()
+    assert "SNAPSHOT 1 TAKEN" in backend.output.getvalue()
+    assert [card.level for card in test_box.cards] == [3, 3]
@@ -0,0 +1,95 @@
+import json
+
+import driver
+import metrics
+from box import Box
+
+
+def test_disabled_collects_nothing():
+    metrics.reset()
+    metrics.disable()
+    test_box = Box("TEST")
+    test_box.add_card("Q", "A", "C")
+    test_box.list_card_obj_in_level(1)
+    with metrics.Timer("test_seconds"):
+        pass
+    assert metrics.to_dict() == {"counters": [], "histograms": []}
+
+
+def test_export(tmp_path):
+    metrics.reset()
+    metrics.enable()
+    try:
+        test_box = Box("TEST")
+        test_box.add_card("Q", "A", "C")
+        test_box.save_to_json(tmp_path)
+        Box.load_from_json(tmp_path / "TEST.json")
+        test_box.list_card_obj_in_level(1)
+    finally:
+        metrics.disable()
+
+    metrics.export(str(tmp_path / "metrics.json"))
+    with open(tmp_path / "metrics.json") as file:
+        data = json.load(file)
+    names = {histogram["name"] for histogram in data["histograms"]}
+    assert names == {
+        "box_save_seconds",
+        "box_load_seconds",
+        "box_to_dict_seconds",
+        "box_from_dict_seconds",
+        "box_list_level_seconds",
+    }
+    assert {
+        "name": "cards_touched_total",
+        "labels": {"query": "level"},
+        "value": 1,
+    } in data["counters"]
+
+    metrics.export(str(tmp_path / "metrics.prom"))
+    with open(tmp_path / "metrics.prom") as file:
+        text = file.read()
+    assert "# TYPE flashline_box_load_seconds histogram" in text
+    assert 'flashline_box_load_seconds_bucket{le="+Inf"} 1' in text
+    assert 'flashline_cards_touched_total{query="level"} 1' in text
+    metrics.reset()
+
+
+def test_memory_report(tmp_path):
+    metrics.reset()
+    metrics.enable_memory()
+    try:
+        test_box = Box("TEST")
+        for i in range(1000):
+            test_box.add_card(f"Q{i}", "A" * 100, "C")
+        data = test_box.to_dict()
+        Box.from_dict(data)
+        metrics.export_memory(str(tmp_path / "memory.txt"))
+    finally:
+        metrics.disable_memory()
+
+    lines = (tmp_path / "memory.txt").read_text().splitlines()
+    operations = {line.split()[0]: line.split()[1:] for line in lines[1:] if line}
+    assert operations["box_to_dict"][0] == "1"
+    assert float(operations["box_to_dict"][1]) > 100
+    assert float(operations["box_from_dict"][1]) > 100
+    assert "ALLOCATION SITE" in "\n".join(lines)
+    metrics.reset()
+
+
+def test_only_ui_actions_are_timed():
+    metrics.reset()
+    metrics.enable()
+    try:
+        backend = driver.run(
+            driver.navigate_keys(), Box.load_from_json("data/DEMO.json")
+        )
+    finally:
+        metrics.disable()
+    assert not backend.keys
+    actions = {
+        histogram["labels"]["action"]
+        for histogram in metrics.to_dict()["histograms"]
+        if histogram["name"] == "ui_action_seconds"
+    }
+    assert actions == {"show_card_ui"}
+    metrics.reset()
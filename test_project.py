@@ -1,7 +1,9 @@
 import pytest
 from project import clean_input
+from project import clean_filter_input
 from project import validate_input_yes_no
 from project import validate_input_general
+from project import parse_level_change
 
 
 def test_clean_input():
@@ -16,6 +18,12 @@ def test_clean_input():
     assert clean_input(" ") == ""
 
 
+def test_clean_filter_input():
+    assert clean_filter_input(" category = verbs ") == "CATEGORY = VERBS"
+    assert clean_filter_input('question ~ "\\d" or x') == 'QUESTION ~ "\\d" OR X'
+    assert clean_filter_input("answer = 'it\\'s' and 'a") == "ANSWER = 'it\\'s' AND 'a"
+
+
 def test_validate_input_yes_no():
     assert validate_input_yes_no("Y") == True
     assert validate_input_yes_no("YES") == True
@@ -55,3 +63,16 @@ def test_validate_input_general():
     assert validate_input_general("TEST&TEST") == False
     assert validate_input_general(" ") == False
     assert validate_input_general("") == False
+
+
+def test_parse_level_change():
+    assert parse_level_change("R") == ("SET", 1)
+    assert parse_level_change("1") == ("SET", 1)
+    assert parse_level_change("10") == ("SET", 10)
+    assert parse_level_change("+2") == ("SHIFT", 2)
+    assert parse_level_change("-3") == ("SHIFT", -3)
+    assert parse_level_change("0") == None
+    assert parse_level_change("11") == None
+    assert parse_level_change("2.5") == None
+    assert parse_level_change("UP") == None
+    assert parse_level_change("") == None
@@ -0,0 +1,106 @@
+import pytest
+
+import query
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    for category in ("NOUNS", "VERBS", "ANIMAL SOUNDS"):
+        test_box.add_category(category)
+        for i in range(20):
+            test_box.add_card(f"{category[:4]} {i}", f"A{i % 2}", category)
+    for card in test_box.list_card_obj_in_category("VERBS")[:5]:
+        test_box.change_level(card, True)
+    return test_box
+
+
+def brute_force(test_box, predicate):
+    return sorted(card.id for card in test_box.cards if predicate(card))
+
+
+@pytest.mark.parametrize(
+    "expression, predicate",
+    [
+        (
+            'category in ("ANIMAL SOUNDS", VERBS) and level <= 1 and question ~ "^VERB"',
+            lambda card: card.category in ("ANIMAL SOUNDS", "VERBS")
+            and card.level <= 1
+            and card.question.startswith("VERB"),
+        ),
+        ("LEVEL = 2", lambda card: card.level == 2),
+        ("answer = A1", lambda card: card.answer == "A1"),
+        (
+            "category = NOUNS or level > 1",
+            lambda card: card.category == "NOUNS" or card.level > 1,
+        ),
+        ("not category = NOUNS", lambda card: card.category != "NOUNS"),
+        (
+            "category = VERBS and (level = 2 or answer != A0)",
+            lambda card: card.category == "VERBS"
+            and (card.level == 2 or card.answer != "A0"),
+        ),
+        ("id in (1, 2, 999)", lambda card: card.id in (1, 2)),
+        (
+            "category not in (NOUNS, VERBS)",
+            lambda card: card.category == "ANIMAL SOUNDS",
+        ),
+    ],
+)
+def test_matches_brute_force(expression, predicate):
+    test_box = make_box()
+    plan = query.select(test_box, expression)
+    assert sorted(card.id for card in plan.cards) == brute_force(test_box, predicate)
+
+
+def test_plan_uses_indexes():
+    test_box = make_box()
+    plan = query.select(test_box, 'category = VERBS and level = 2 and question ~ "1"')
+    assert plan.touched == 5
+    assert plan.steps[0].startswith("INDEX CATEGORY")
+    assert plan.steps[-1].startswith("FILTER QUESTION")
+
+    plan = query.select(test_box, "answer = A0")
+    assert plan.steps[0] == "SCAN ALL 60 CARDS"
+
+
+def test_level_index_follows_changes():
+    test_box = make_box()
+    card = test_box.list_card_obj_in_level(2)[0]
+    test_box.change_level(card, False)
+    assert card not in test_box.list_card_obj_in_level(2)
+    assert card in test_box.list_card_obj_in_level(1)
+    test_box.delete_card(card.id)
+    assert card not in test_box.list_card_obj_in_level(1)
+
+
+def test_delete_cards():
+    test_box = make_box()
+    plan = query.select(test_box, "category = NOUNS")
+    assert test_box.delete_cards([card.id for card in plan.cards]) == 20
+    assert len(test_box.cards) == 40
+    assert query.select(test_box, "category = NOUNS").cards == []
+
+
+def test_string_escapes():
+    test_box = make_box()
+    assert len(query.select(test_box, r'question ~ "\d$"').cards) == 60
+    assert len(query.select(test_box, r'question ~ "VERB \d\b"').cards) == 10
+    assert query.tokenize(r'"A \"B\" \\ \d"') == [("string", r'A "B" \ \d')]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "",
+        "level ~ 1",
+        "foo = 1",
+        "level in (1,",
+        "level = A",
+        'question ~ "["',
+        "level",
+    ],
+)
+def test_invalid(expression):
+    with pytest.raises(query.QueryError):
+        query.select(make_box(), expression)
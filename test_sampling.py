@@ -0,0 +1,49 @@
+import random
+
+from box import Box
+from sampling import FenwickTree
+from sampling import WeightedSampler
+from sampling import card_weight
+
+
+def test_fenwick_tree():
+    weights = [random.randrange(5) for _ in range(100)]
+    tree = FenwickTree(weights)
+    assert tree.total() == sum(weights)
+    for count in range(101):
+        assert tree.prefix_sum(count) == sum(weights[:count])
+    tree.set(10, 7)
+    weights[10] = 7
+    for value in range(tree.total()):
+        index = tree.find(value)
+        assert sum(weights[:index]) <= value < sum(weights[: index + 1])
+
+
+def test_card_weight():
+    test_box = Box("TEST")
+    card = test_box.add_card("Q", "A", "C")
+    assert card_weight(card) == 10
+    test_box.change_level(card, False)
+    assert card_weight(card) == 20
+    card.level = 10
+    assert card_weight(card) == 2
+
+
+def test_weighted_sampler():
+    test_box = Box("TEST")
+    low = test_box.add_card("LOW", "A", "C")
+    high = test_box.add_card("HIGH", "A", "C")
+    high.level = 10
+    sampler = WeightedSampler(test_box.cards)
+    draws = [sampler.draw() for _ in range(2000)]
+    assert draws.count(low) > draws.count(high) * 5
+
+    sampler.remove(low)
+    assert {sampler.draw() for _ in range(100)} == {high}
+
+    drawn = []
+    for card in sampler.draws(5):
+        drawn.append(card)
+        test_box.change_level(card, False)
+    assert drawn[0] is high
+    assert sampler.tree.weights == [0, 10 * (1 + 5)]
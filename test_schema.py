@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import schema
+from box import Box
+
+
+def test_migrate_version_1():
+    data = {
+        "name": "TEST",
+        "categories": ["C"],
+        "cards": [
+            {"category": "C", "question": "Q1", "answer": "A", "level": 2},
+            {"category": "C", "question": "Q2", "answer": "A", "level": 1},
+        ],
+    }
+    schema.load(data)
+    assert data["version"] == schema.SCHEMA_VERSION
+    assert data["next_id"] == 3
+    assert [card["id"] for card in data["cards"]] == [1, 2]
+    assert data["cards"][0]["failures"] == 0
+
+
+def test_migrate_version_1_keeps_existing_ids():
+    data = {
+        "name": "TEST",
+        "categories": ["C"],
+        "cards": [
+            {"id": 7, "category": "C", "question": "Q1", "answer": "A", "level": 2},
+            {"category": "C", "question": "Q2", "answer": "A", "level": 1},
+            {"id": 3, "category": "C", "question": "Q3", "answer": "A", "level": 1},
+        ],
+    }
+    test_box = Box.from_dict(schema.load(data))
+    assert [card.id for card in test_box.cards] == [7, 8, 3]
+    assert test_box.add_card("Q4", "A", "C").id == 9
+
+
+def test_unknown_version():
+    with pytest.raises(schema.SchemaError):
+        schema.load({"version": schema.SCHEMA_VERSION + 1})
+
+
+def test_reports_every_bad_card():
+    data = Box("TEST").to_dict()
+    data["cards"] = [
+        {
+            "id": 1,
+            "category": "C",
+            "question": "Q1",
+            "answer": "A",
+            "level": 11,
+            "failures": 0,
+            "last_review": None,
+        },
+        {
+            "id": 2,
+            "category": "C",
+            "question": "Q2",
+            "answer": "A",
+            "level": 1,
+            "failures": 0,
+            "last_review": None,
+        },
+        {
+            "id": 1,
+            "category": "C",
+            "answer": "A",
+            "level": 1,
+            "failures": 0,
+            "last_review": "yesterday",
+        },
+    ]
+    with pytest.raises(schema.SchemaError) as error:
+        schema.load(data)
+    positions = [position for position, _ in error.value.errors]
+    assert positions == [0, 2, 2, 2]
+
+
+def test_load_from_json_fails_fast(tmp_path):
+    data = Box("TEST").to_dict()
+    data["cards"] = [{"category": "C", "question": "Q", "answer": "A", "level": 0}]
+    with open(tmp_path / "TEST.json", "w") as file:
+        json.dump(data, file)
+    with pytest.raises(schema.SchemaError):
+        Box.load_from_json(tmp_path / "TEST.json")
+
+
+def test_save_load_round_trip(tmp_path):
+    test_box = Box("TEST")
+    test_box.add_card("Q", "A", "C")
+    test_box.save_to_json(tmp_path)
+    loaded = Box.load_from_json(tmp_path / "TEST.json")
+    assert loaded.to_dict() == test_box.to_dict()
+    assert Box.load_from_json("data/DEMO.json").next_id == 26
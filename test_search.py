@@ -0,0 +1,116 @@
+import os
+import sqlite3
+
+import pytest
+
+import search
+import shards
+from box import Box
+
+
+def make_box(name="TEST"):
+    test_box = Box(name)
+    test_box.add_category("ANIMAL SOUNDS")
+    test_box.add_card("WHAT DOES THE DUCK SAY?", "QUACK", "ANIMAL SOUNDS")
+    test_box.add_card("WHAT DOES THE COW SAY?", "MOO", "ANIMAL SOUNDS")
+    test_box.add_category("VERBS")
+    test_box.add_card("TO QUACK", "QUAKEN", "VERBS")
+    return test_box
+
+
+def save(test_box, save_folder):
+    test_box.save_to_json(save_folder)
+    assert search.update_saved(test_box, save_folder) is None
+
+
+def test_index_is_only_updated_by_the_application(tmp_path):
+    make_box().save_to_json(tmp_path)
+    assert not os.path.exists(tmp_path / search.INDEX_FILE)
+
+    (tmp_path / search.INDEX_FILE).mkdir()
+    assert search.update_saved(make_box(), tmp_path) is not None
+
+
+def test_save_indexes_box(tmp_path):
+    save(make_box(), tmp_path)
+    assert search.search("quack", tmp_path) == [
+        ("TEST", 1, "ANIMAL SOUNDS", "WHAT DOES THE DUCK SAY?"),
+        ("TEST", 3, "VERBS", "TO QUACK"),
+    ]
+    assert search.search("duck QUACK", tmp_path) == [
+        ("TEST", 1, "ANIMAL SOUNDS", "WHAT DOES THE DUCK SAY?")
+    ]
+    assert [hit[1] for hit in search.search("qua*", tmp_path)] == [1, 3]
+    assert [hit[1] for hit in search.search("sounds", tmp_path)] == [1, 2]
+    assert search.search("horse", tmp_path) == []
+
+
+def test_save_updates_changed_cards_only(tmp_path):
+    test_box = make_box()
+    save(test_box, tmp_path)
+    test_box.edit_card(2, answer="MUH")
+    test_box.delete_card(3)
+    test_box.add_card("WHAT DOES THE HORSE SAY?", "NEIGH", "ANIMAL SOUNDS")
+    save(test_box, tmp_path)
+
+    assert search.search("moo", tmp_path) == []
+    assert [hit[1] for hit in search.search("muh", tmp_path)] == [2]
+    assert [hit[1] for hit in search.search("quack", tmp_path)] == [1]
+    assert [hit[1] for hit in search.search("neigh", tmp_path)] == [4]
+
+
+def test_search_spans_boxes(tmp_path):
+    save(make_box("ONE"), tmp_path)
+    save(make_box("TWO"), tmp_path)
+    hits = search.search("cow", tmp_path)
+    assert [(hit[0], hit[1]) for hit in hits] == [("ONE", 2), ("TWO", 2)]
+    assert search.format_hits(hits)[0] == "\nBOX 'ONE':"
+
+
+def test_sharded_save_updates_changed_categories(tmp_path):
+    save(shards.ShardedBox.from_box(make_box()), tmp_path)
+    sharded_box = shards.ShardedBox.open(tmp_path / "TEST")
+    card = sharded_box.list_card_obj_in_category("VERBS")[0]
+    sharded_box.edit_card(card.id, answer="MUHEN")
+    sharded_box.delete_category("ANIMAL SOUNDS")
+    save(sharded_box, tmp_path)
+
+    assert sharded_box.loaded == {"VERBS"}
+    assert [hit[1] for hit in search.search("muhen", tmp_path)] == [3]
+    assert search.search("quaken", tmp_path) == []
+    assert search.search("duck", tmp_path) == []
+
+
+def test_rebuild_drops_missing_boxes(tmp_path):
+    save(make_box("ONE"), tmp_path)
+    save(make_box("TWO"), tmp_path)
+    os.remove(tmp_path / "TWO.json")
+    save(make_box("THREE"), tmp_path)
+
+    assert search.rebuild(tmp_path) == 2
+    assert {hit[0] for hit in search.search("cow", tmp_path)} == {"ONE", "THREE"}
+
+
+def test_connections_are_closed_after_errors(tmp_path, monkeypatch):
+    connections = []
+    connect = search.connect
+
+    def recording_connect(save_folder="data"):
+        connections.append(connect(save_folder))
+        return connections[-1]
+
+    def broken_words(text):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(search, "connect", recording_connect)
+    save(make_box(), tmp_path)
+    assert search.search("quack", tmp_path)
+    monkeypatch.setattr(search, "words", broken_words)
+    test_box = make_box()
+    test_box.edit_card(1, answer="QUACK QUACK")
+    with pytest.raises(RuntimeError):
+        search.update(test_box, tmp_path)
+    assert len(connections) == 3
+    for connection in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
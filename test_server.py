@@ -0,0 +1,184 @@
+import asyncio
+
+import load_test
+import schema
+import search
+import server
+from box import Box
+from deck import Deck
+from deck import Progress
+from deck import build_deck
+
+
+def make_box(tmp_path):
+    test_box = Box("DEMO")
+    test_box.add_category("C")
+    test_box.add_card("Q1", "A", "C")
+    test_box.add_card("Q2", "B", "C")
+    test_box.save_to_json(tmp_path)
+
+
+def call(tmp_path, requests):
+    """
+    Starts a server on the save folder, sends the requests on one connection and returns the responses.
+    """
+
+    async def run():
+        test_server = await server.start_server(port=0, save_folder=tmp_path)
+        port = test_server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            return [
+                await load_test.request(reader, writer, method, path, data)
+                for method, path, data in requests
+            ]
+        finally:
+            writer.close()
+            test_server.close()
+            await test_server.wait_closed()
+
+    return asyncio.run(run())
+
+
+def test_routes(tmp_path):
+    make_box(tmp_path)
+    responses = call(
+        tmp_path,
+        [
+            ("GET", "/boxes", None),
+            ("GET", "/boxes/DEMO/next?level=1", None),
+            ("POST", "/boxes/DEMO/answer", {"id": 1, "answer": "a"}),
+            ("GET", "/boxes/DEMO/progress", None),
+            ("POST", "/boxes/DEMO/save", None),
+        ],
+    )
+    assert responses[0] == (200, ["DEMO"])
+    assert responses[1][0] == 200 and responses[1][1]["id"] in (1, 2)
+    assert responses[2] == (200, {"correct": True, "level": 2, "answer": "A"})
+    assert responses[3][1]["total"] == 2 and responses[3][1]["levels"]["2"] == 1
+    assert responses[4] == (200, {"saved": "DEMO"})
+    assert Box.load_from_json(tmp_path / "DEMO.json").get_card(1).level == 2
+    assert [hit[1] for hit in search.search("q1", tmp_path)] == [1]
+
+
+def test_duplicates_are_kept_on_load(tmp_path):
+    data = {
+        "name": "DEMO",
+        "categories": ["C"],
+        "cards": [
+            {"category": "C", "question": "Q1", "answer": "A", "level": 1},
+            {"category": "C", "question": "Q1", "answer": "A", "level": 3},
+        ],
+    }
+    Box.from_dict(schema.load(data)).save_to_json(tmp_path)
+    responses = call(
+        tmp_path,
+        [("GET", "/boxes/DEMO/progress", None), ("POST", "/boxes/DEMO/save", None)],
+    )
+    # the server does not merge duplicates behind the user's back, see project.load_box_ui
+    assert responses[0][1]["total"] == 2
+    assert len(Box.load_from_json(tmp_path / "DEMO.json").cards) == 2
+
+
+def test_status_lines(tmp_path):
+    make_box(tmp_path)
+
+    async def run():
+        test_server = await server.start_server(port=0, save_folder=tmp_path)
+        port = test_server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            lines = []
+            for path in ("/boxes", "/boxes/OTHER/next", "/boxes/DEMO/next?level=x"):
+                writer.write(f"GET {path} HTTP/1.1\r\n\r\n".encode("latin-1"))
+                lines.append(await reader.readline())
+                length = 0
+                while (line := await reader.readline()) != b"\r\n":
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                await reader.readexactly(length)
+            return lines
+        finally:
+            writer.close()
+            test_server.close()
+            await test_server.wait_closed()
+
+    assert asyncio.run(run()) == [
+        b"HTTP/1.1 200 OK\r\n",
+        b"HTTP/1.1 404 Not Found\r\n",
+        b"HTTP/1.1 400 Bad Request\r\n",
+    ]
+
+
+def test_bad_requests(tmp_path):
+    make_box(tmp_path)
+    responses = call(
+        tmp_path,
+        [
+            ("GET", "/boxes/DEMO/next?level=42", None),
+            ("GET", "/boxes/DEMO/next?level=one", None),
+            ("POST", "/boxes/DEMO/answer", 5),
+            ("POST", "/boxes/DEMO/answer", {"id": [1], "answer": "A"}),
+            ("POST", "/boxes/DEMO/answer", {"id": 99, "answer": "A"}),
+            ("GET", "/boxes/OTHER/next", None),
+            ("GET", "/boxes/DEMO/unknown", None),
+            ("GET", "/boxes", None),
+        ],
+    )
+    assert [status for status, _ in responses] == [
+        400,
+        400,
+        400,
+        400,
+        404,
+        404,
+        404,
+        200,
+    ]
+
+
+def test_box_names_cannot_leave_save_folder(tmp_path):
+    make_box(tmp_path)
+    (tmp_path / "data").mkdir()
+    responses = call(
+        tmp_path / "data",
+        [
+            ("GET", "/boxes/..%2FDEMO/progress", None),
+            ("GET", "/boxes/..%5CDEMO/progress", None),
+            ("GET", "/boxes/DEMO/progress", None),
+        ],
+    )
+    assert [status for status, _ in responses] == [400, 400, 404]
+
+
+def test_unexpected_error_answers_500(tmp_path, monkeypatch):
+    make_box(tmp_path)
+
+    async def broken(cache, name, query, body):
+        raise KeyError(name)
+
+    monkeypatch.setitem(server.ROUTES, ("GET", "progress"), broken)
+    responses = call(
+        tmp_path,
+        [("GET", "/boxes/DEMO/progress", None), ("GET", "/boxes", None)],
+    )
+    assert responses == [(500, {"error": "internal error"}), (200, ["DEMO"])]
+
+
+def test_deck_learner(tmp_path):
+    make_box(tmp_path)
+    build_deck(Box.load_from_json(tmp_path / "DEMO.json"), tmp_path / "DEMO.deck")
+    Progress(Deck(tmp_path / "DEMO.deck")).save(tmp_path / "ALICE.progress")
+    responses = call(
+        tmp_path,
+        [
+            ("GET", "/boxes", None),
+            ("POST", "/boxes/ALICE/answer", {"id": 1, "answer": "a"}),
+            ("POST", "/boxes/ALICE/save", None),
+        ],
+    )
+    assert responses[0] == (200, ["ALICE", "DEMO"])
+    assert responses[1][1]["level"] == 2
+    assert responses[2] == (200, {"saved": "ALICE"})
+    deck = Deck(tmp_path / "DEMO.deck")
+    assert Progress.load(tmp_path / "ALICE.progress", deck).levels[0] == 2
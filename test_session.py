@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+import driver
+import session
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    test_box.add_category("C")
+    for i in range(1, 6):
+        test_box.add_card(f"Q{i}", "A", "C")
+    return test_box
+
+
+def test_checkpoint_rewrites_header_only(tmp_path):
+    checkpoint = session.Session.start("TEST", [5, 3, 1], tmp_path)
+    size = os.path.getsize(session.session_path("TEST", tmp_path))
+    checkpoint.record(True)
+    checkpoint.record(False)
+    checkpoint.close()
+    assert os.path.getsize(session.session_path("TEST", tmp_path)) == size
+
+    resumed = session.Session.open("TEST", tmp_path)
+    assert (resumed.cursor, resumed.count_all, resumed.count_correct) == (2, 2, 1)
+    assert list(resumed.remaining()) == [1]
+    resumed.record()
+    assert resumed.done and resumed.count_all == 2
+    resumed.finish()
+    assert session.Session.open("TEST", tmp_path) is None
+
+
+def test_remaining_reads_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(session, "CHUNK_SIZE", 4)
+    card_ids = list(range(10, 0, -1))
+    checkpoint = session.Session.start("TEST", card_ids, tmp_path)
+    for _ in range(3):
+        checkpoint.record(True)
+    assert list(checkpoint.remaining()) == card_ids[3:]
+    checkpoint.close()
+
+
+def test_damaged_session_is_rejected(tmp_path):
+    session.Session.start("TEST", [1, 2], tmp_path).close()
+    with open(session.session_path("TEST", tmp_path), "ab") as file:
+        file.write(b"\x00")
+    with pytest.raises(ValueError):
+        session.Session.open("TEST", tmp_path)
+
+
+def test_resume_after_going_back(tmp_path):
+    test_box = make_box()
+    keys = [driver.LEARN, driver.LEARN_ALL, "A", "", "B", "", "X", ""]
+    backend = driver.run(keys + [driver.BACK], test_box, save_folder=tmp_path)
+    assert "1 OUT OF 2 ANSWERS CORRECT" in backend.output.getvalue()
+    assert "3 FLASHCARDS LEFT" in backend.output.getvalue()
+
+    assert os.path.exists(session.session_path("TEST", tmp_path))
+    pending = session.Session.open("TEST", tmp_path)
+    test_box.delete_card(next(pending.remaining()))
+    pending.close()
+    keys = [driver.LEARN, driver.LEARN_RESUME] + ["A", ""] * 2 + ["", driver.BACK]
+    backend = driver.run(keys, test_box, save_folder=tmp_path)
+    assert "3 OUT OF 4 ANSWERS CORRECT" in backend.output.getvalue()
+    assert not os.path.exists(session.session_path("TEST", tmp_path))
+    assert sorted(card.level for card in test_box.cards) == [1, 2, 2, 2]
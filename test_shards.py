@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+import query
+import schema
+import shards
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    for category in ("ANIMALS", "COLORS", "NUMBERS"):
+        test_box.add_category(category)
+        for number in range(3):
+            test_box.add_card(f"{category} {number}", "A", category)
+    return test_box
+
+
+def split(tmp_path):
+    shards.ShardedBox.from_box(make_box()).save_to_json(tmp_path)
+    return shards.ShardedBox.open(tmp_path / "TEST")
+
+
+def test_split_writes_one_shard_per_category(tmp_path):
+    sharded_box = split(tmp_path)
+    assert shards.is_sharded(tmp_path / "TEST")
+    assert sorted(os.listdir(tmp_path / "TEST")) == sorted(
+        [shards.MANIFEST_FILE]
+        + [shards.shard_filename(category) for category in sharded_box.categories]
+    )
+    assert sharded_box.categories == ["ANIMALS", "COLORS", "NUMBERS"]
+    assert sharded_box.next_id == 10
+
+
+def test_categories_load_on_demand(tmp_path):
+    sharded_box = split(tmp_path)
+    assert sharded_box.cards == []
+    assert sharded_box.count_cards_level()[1] == 9
+
+    questions = sharded_box.list_cards_in_category("COLORS")
+    assert questions == ["COLORS 0", "COLORS 1", "COLORS 2"]
+    assert sharded_box.loaded == {"COLORS"}
+    assert len(sharded_box.cards) == 3
+    assert sharded_box.count_cards_level()[1] == 9
+
+    assert sharded_box.get_card(1).question == "ANIMALS 0"
+    assert sharded_box.loaded == {"ANIMALS", "COLORS", "NUMBERS"}
+
+
+def test_save_writes_only_dirty_shards(tmp_path):
+    sharded_box = split(tmp_path)
+    folder = tmp_path / "TEST"
+    colors = folder / shards.shard_filename("COLORS")
+    numbers = folder / shards.shard_filename("NUMBERS")
+    os.utime(numbers, (0, 0))
+
+    card = sharded_box.list_card_obj_in_category("COLORS")[0]
+    sharded_box.change_level(card, True)
+    sharded_box.save_to_json(tmp_path)
+
+    assert os.path.getmtime(numbers) == 0
+    assert os.path.getmtime(colors) > 0
+    reopened = shards.ShardedBox.open(folder)
+    assert reopened.count_cards_level()[2] == 1
+    assert reopened.find_card(card.question).level == 2
+
+
+def test_deleted_category_removes_its_shard(tmp_path):
+    sharded_box = split(tmp_path)
+    sharded_box.delete_category("NUMBERS")
+    sharded_box.delete_cards_in_category("NUMBERS")
+    sharded_box.add_card("COLORS 3", "A", "COLORS")
+    sharded_box.save_to_json(tmp_path)
+
+    assert not os.path.exists(tmp_path / "TEST" / shards.shard_filename("NUMBERS"))
+    reopened = shards.ShardedBox.open(tmp_path / "TEST")
+    assert reopened.categories == ["ANIMALS", "COLORS"]
+    assert reopened.count_cards_level()[1] == 7
+    assert reopened.get_card(10).question == "COLORS 3"
+
+
+def test_query_loads_only_filtered_categories(tmp_path):
+    sharded_box = split(tmp_path)
+    plan = query.select(sharded_box, "category = COLORS and level = 1")
+    assert len(plan.cards) == 3
+    assert sharded_box.loaded == {"COLORS"}
+
+
+def test_compressed_shards_roundtrip(tmp_path):
+    sharded_box = shards.ShardedBox.from_box(make_box())
+    sharded_box.compression = "zlib"
+    sharded_box.save_to_json(tmp_path)
+
+    reopened = shards.ShardedBox.open(tmp_path / "TEST")
+    assert reopened.compression == "zlib"
+    assert Box.from_dict(reopened.to_dict()).to_dict() == make_box().to_dict()
+
+
+def test_shard_with_foreign_card_is_rejected(tmp_path):
+    sharded_box = split(tmp_path)
+    shard_path = tmp_path / "TEST" / shards.shard_filename("COLORS")
+    data, _ = shards.read_file(shard_path)
+    data["cards"][0]["category"] = "ANIMALS"
+    shards.write_file(shard_path, data)
+
+    with pytest.raises(schema.SchemaError):
+        sharded_box.ensure_loaded(["COLORS"])
+
+
+def test_bulk_levels_mark_category_dirty(tmp_path):
+    sharded_box = split(tmp_path)
+    assert sharded_box.set_levels(5, category="NUMBERS") == 3
+    assert sharded_box.loaded == sharded_box.dirty == {"NUMBERS"}
+    sharded_box.save_to_json(tmp_path)
+    assert shards.ShardedBox.open(tmp_path / "TEST").count_cards_level()[5] == 3
+
+
+def test_questions_are_unique_across_shards(tmp_path):
+    sharded_box = split(tmp_path)
+    with pytest.raises(ValueError):
+        sharded_box.add_card("ANIMALS 0", "A", "COLORS")
+    card = sharded_box.list_card_obj_in_category("NUMBERS")[0]
+    with pytest.raises(ValueError):
+        sharded_box.edit_card(card.id, question="COLORS 1")
+    sharded_box.edit_card(card.id, question="NUMBERS 9")
+    assert sharded_box.dirty == {"NUMBERS"}
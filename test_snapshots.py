@@ -0,0 +1,131 @@
+import os
+
+import pytest
+
+import blobs
+import shards
+import snapshots
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    for category in ("C1", "C2"):
+        test_box.add_category(category)
+        for i in range(10):
+            test_box.add_card(f"{category} Q{i}", f"A{i}", category)
+    return test_box
+
+
+def test_unchanged_cards_are_shared(tmp_path):
+    store = snapshots.SnapshotStore("TEST", tmp_path)
+    test_box = make_box()
+    assert store.snapshot(test_box, "FIRST") == (1, 20)
+    assert len(store.objects.blobs()) == 20
+
+    test_box.change_level(test_box.get_card(1), True)
+    test_box.delete_cards([2, 3])
+    assert store.snapshot(test_box) == (2, 3)
+    assert len(store.objects.blobs()) == 21
+    assert store.snapshot(test_box) == (2, 0)
+    assert [entry[0] for entry in store.history()] == [1, 2]
+    assert store.history()[0][2:] == ("FIRST", 20, 20)
+
+
+def test_diff_and_restore(tmp_path):
+    store = snapshots.SnapshotStore("TEST", tmp_path)
+    test_box = make_box()
+    store.snapshot(test_box)
+    test_box.edit_card(1, answer="NEW")
+    test_box.delete_category("C2")
+    test_box.delete_cards_in_category("C2")
+    test_box.add_card("C1 Q10", "A10", "C1")
+    store.snapshot(test_box)
+
+    added, removed, changed = store.diff(1, 2)
+    assert [card_id for card_id, _, _ in added] == [21]
+    assert [card_id for card_id, _, _ in removed] == list(range(11, 21))
+    assert changed[0][0] == 1
+    assert snapshots.describe_change(*changed[0]) == "~ #1 C1 Q0: ANSWER 'A0' -> 'NEW'"
+
+    test_box.edit_card(2, answer="NEWER")
+    added, removed, changed = store.diff(2, test_box)
+    assert (added, removed, [card_id for card_id, _, _ in changed]) == ([], [], [2])
+
+    restored = store.restore(1)
+    assert restored.to_dict() == make_box().to_dict()
+    assert store.restore(2).get_card(1).answer == "NEW"
+
+
+def test_keyframes_bound_replay(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "KEYFRAME_INTERVAL", 3)
+    store = snapshots.SnapshotStore("TEST", tmp_path)
+    test_box = make_box()
+    for i in range(1, 8):
+        test_box.edit_card(1, answer=f"ANSWER {i}")
+        store.snapshot(test_box)
+    os.remove(store.version_path(1))
+    os.remove(store.version_path(2))
+    assert store.restore(7).get_card(1).answer == "ANSWER 7"
+    with pytest.raises(ValueError):
+        store.restore(2)
+
+
+def test_snapshots_keep_attachments(tmp_path):
+    store = blobs.BlobStore(tmp_path / "blobs")
+    test_box = make_box()
+    audio = store.put(b"QUACK")
+    test_box.add_attachment(1, "duck.mp3", audio)
+    snapshots.SnapshotStore("TEST", tmp_path).snapshot(test_box)
+    test_box.remove_attachment(1, audio)
+    test_box.save_to_json(tmp_path)
+    assert audio in blobs.referenced_blobs(tmp_path)
+
+
+def test_later_snapshots_only_hash_changed_cards(tmp_path, monkeypatch):
+    store = snapshots.SnapshotStore("TEST", tmp_path)
+    test_box = make_box()
+    store.snapshot(test_box)
+    hashed = []
+    card_record = snapshots.card_record
+
+    def counting_card_record(card):
+        hashed.append(card.id)
+        return card_record(card)
+
+    monkeypatch.setattr(snapshots, "card_record", counting_card_record)
+    test_box.change_level(test_box.get_card(1), True)
+    test_box.delete_card(2)
+    test_box.add_card("C1 Q10", "A10", "C1")
+    assert store.snapshot(test_box) == (2, 3)
+    assert sorted(hashed) == [1, 21]
+    assert store.snapshot(test_box) == (2, 0)
+    assert sorted(hashed) == [1, 21]
+    assert store.restore(2).to_dict() == test_box.to_dict()
+
+    # another box object, e.g. after loading the box again, compares all cards with the last version
+    other = Box.from_dict(test_box.to_dict())
+    assert store.snapshot(other) == (2, 0)
+    assert len(hashed) == 2 + len(other.cards)
+
+
+def test_sharded_snapshots_load_only_used_shards(tmp_path):
+    shards.ShardedBox.from_box(make_box()).save_to_json(tmp_path)
+    store = snapshots.SnapshotStore("TEST", tmp_path)
+    store.snapshot(shards.ShardedBox.open(tmp_path / "TEST"))
+
+    sharded_box = shards.ShardedBox.open(tmp_path / "TEST")
+    sharded_box.edit_card(sharded_box.list_card_ids_in_category("C2")[0], answer="NEW")
+    assert sharded_box.loaded == {"C2"}
+    assert store.snapshot(sharded_box) == (2, 1)
+    assert sharded_box.loaded == {"C2"}
+    expected = make_box()
+    expected.edit_card(11, answer="NEW")
+    assert store.restore(2).to_dict() == expected.to_dict()
+
+    # saved since the last snapshot: the shards on disk may differ from it, all of them are compared
+    sharded_box.save_to_json(tmp_path)
+    reopened = shards.ShardedBox.open(tmp_path / "TEST")
+    reopened.list_cards_in_category("C2")
+    assert store.snapshot(reopened) == (2, 0)
+    assert reopened.loaded == {"C1", "C2"}
@@ -0,0 +1,131 @@
+import json
+import sys
+
+import pytest
+
+from box import Box
+import sync
+from sync import apply_delta
+from sync import compute_delta
+from sync import manifest
+from sync import merge
+
+
+def make_copies():
+    base = Box("TEST")
+    base.add_category("A")
+    base.add_category("B")
+    for i in range(5):
+        base.add_card(f"Q{i}", f"A{i}", "A")
+    data = base.to_dict()
+    return base, Box.from_dict(data), Box.from_dict(data)
+
+
+def test_merge_additions_deletions_edits():
+    base, ours, theirs = make_copies()
+    ours.add_card("OURS", "A", "A")
+    theirs.add_card("THEIRS", "A", "B")
+    theirs.add_card("BOTH", "A", "B")
+    ours.add_card("BOTH", "A", "A")
+    ours.delete_card(1)
+    theirs.edit_card(2, question="Q1-EDITED", answer="A1-EDITED")
+    ours.add_category("C")
+    theirs.delete_category("B")
+
+    merged = merge(base, ours, theirs)
+    questions = sorted(card.question for card in merged.cards)
+    assert questions == ["BOTH", "OURS", "Q1-EDITED", "Q2", "Q3", "Q4", "THEIRS"]
+    assert merged.get_card(2).answer == "A1-EDITED"
+    assert len(set(merged.ids)) == len(merged.cards)
+    assert merged.next_id > max(merged.ids)
+    # 'B' was deleted by theirs, but a merged card still uses it
+    assert merged.categories == ["A", "B", "C"]
+
+
+def test_merge_levels():
+    base, ours, theirs = make_copies()
+    ours.get_card(1).level = 5
+    theirs.get_card(2).level = 3
+    ours.get_card(3).level = 4
+    ours.get_card(3).last_review = 1.0
+    theirs.get_card(3).level = 2
+    theirs.get_card(3).last_review = 2.0
+
+    levels = lambda merged: [merged.get_card(i).level for i in (1, 2, 3)]
+    assert levels(merge(base, ours, theirs, "max")) == [5, 3, 4]
+    assert levels(merge(base, ours, theirs, "min")) == [5, 3, 2]
+    assert levels(merge(base, ours, theirs, "latest")) == [5, 3, 2]
+
+
+def test_delta_round_trip():
+    old, new, _ = make_copies()
+    old_manifest = manifest(old)
+    new.add_card("NEW", "A", "B")
+    new.delete_card(1)
+    new.edit_card(2, answer="EDITED")
+    new.change_level(new.get_card(3), True)
+    new.add_category("C")
+
+    patch = compute_delta(old_manifest, new)
+    assert [card["question"] for card in patch["added"]] == ["NEW"]
+    assert [card["id"] for card in patch["updated"]] == [2]
+    assert patch["removed"] == [1]
+    assert list(patch["levels"]) == ["3"]
+    assert compute_delta(old, new) == patch
+
+    apply_delta(old, patch)
+    assert manifest(old) == manifest(new)
+    assert old.list_cards_in_category("A") == new.list_cards_in_category("A")
+    assert compute_delta(old, new)["levels"] == {}
+    with pytest.raises(ValueError):
+        apply_delta(old, patch)
+
+
+@pytest.mark.parametrize(
+    "compression, category_column", [("zlib", False), (None, True)]
+)
+def test_delta_command_reads_save_files(
+    tmp_path, monkeypatch, compression, category_column
+):
+    old, new, _ = make_copies()
+    old.name = "OLD"
+    old.compression = compression
+    old.category_column = category_column
+    old.save_to_json(tmp_path)
+    new.edit_card(2, answer="EDITED")
+    new.save_to_json(tmp_path)
+
+    output = tmp_path / "TEST.patch"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "sync.py",
+            "delta",
+            str(tmp_path / "OLD.json"),
+            str(tmp_path / "TEST.json"),
+            "-o",
+            str(output),
+        ],
+    )
+    sync.main()
+    with open(output) as file:
+        patch = json.load(file)
+    assert [card["id"] for card in patch["updated"]] == [2]
+    assert patch["added"] == patch["removed"] == []
+
+
+def test_apply_command_writes_the_given_file(tmp_path, monkeypatch):
+    old, new, _ = make_copies()
+    old.save_to_json(tmp_path, tmp_path / "copy.json")
+    new.edit_card(2, answer="EDITED")
+    sync.write_json(compute_delta(old, new), tmp_path / "TEST.patch")
+
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["sync.py", "apply", str(tmp_path / "copy.json"), str(tmp_path / "TEST.patch")],
+    )
+    sync.main()
+    assert Box.load_from_json(tmp_path / "copy.json").get_card(2).answer == "EDITED"
+    assert not (tmp_path / "TEST.json").exists()
@@ -0,0 +1,210 @@
+import os
+
+import pytest
+
+import project
+import ui
+import watch
+from box import Box
+
+
+def make_box():
+    test_box = Box("TEST")
+    test_box.add_category("C")
+    for number in range(1, 5):
+        test_box.add_card(f"Q{number}", "A", "C")
+    return test_box
+
+
+def change_on_disk(tmp_path, change):
+    other = Box.load_from_json(tmp_path / "TEST.json")
+    change(other)
+    other.save_to_json(tmp_path)
+    # make sure the change is noticed on file systems with coarse modification times
+    stat = os.stat(tmp_path / "TEST.json")
+    os.utime(tmp_path / "TEST.json", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_unchanged_file_is_not_reloaded(tmp_path):
+    make_box().save_to_json(tmp_path)
+    watcher = watch.Watcher(Box.load_from_json(tmp_path / "TEST.json"), tmp_path)
+    assert watcher.reload() is None
+    os.utime(tmp_path / "TEST.json", (0, 0))
+    assert not watcher.changed()
+    assert watcher.state == watch.file_state(tmp_path / "TEST.json")
+
+
+def test_save_merges_changes_on_disk(tmp_path):
+    make_box().save_to_json(tmp_path)
+    test_box = Box.load_from_json(tmp_path / "TEST.json")
+    watcher = watch.Watcher(test_box, tmp_path)
+
+    def change(other):
+        other.edit_card(1, answer="B")
+        other.delete_card(2)
+        other.add_card("THEIRS", "A", "C")
+        other.change_level(other.get_card(3), True)
+
+    change_on_disk(tmp_path, change)
+    test_box.add_card("OURS", "A", "C")
+    test_box.change_level(test_box.get_card(4), True)
+    merged = watcher.save()
+
+    assert merged == {"added": 1, "updated": 1, "removed": 1, "levels": 1, "kept": 0}
+    saved = Box.load_from_json(tmp_path / "TEST.json")
+    assert sorted(card.question for card in saved.cards) == [
+        "OURS",
+        "Q1",
+        "Q3",
+        "Q4",
+        "THEIRS",
+    ]
+    assert saved.find_card("Q1").answer == "B"
+    assert saved.find_card("Q3").level == saved.find_card("Q4").level == 2
+    # cards of the open box keep their IDs, the added card moves to a new one
+    assert saved.find_card("OURS").id == 5
+    assert saved.find_card("THEIRS").id == 6
+    assert saved.next_id == 7
+    assert watcher.reload() is None
+
+
+def test_unsaved_changes_win_conflicts(tmp_path):
+    make_box().save_to_json(tmp_path)
+    test_box = Box.load_from_json(tmp_path / "TEST.json")
+    watcher = watch.Watcher(test_box, tmp_path)
+
+    def change(other):
+        other.edit_card(1, answer="THEIRS")
+        other.delete_card(2)
+
+    change_on_disk(tmp_path, change)
+    test_box.edit_card(1, answer="OURS")
+    test_box.edit_card(2, answer="OURS")
+    merged = watcher.save()
+
+    assert merged["kept"] == 2
+    saved = Box.load_from_json(tmp_path / "TEST.json")
+    assert saved.get_card(1).answer == saved.get_card(2).answer == "OURS"
+
+
+def test_background_thread_reloads(tmp_path):
+    make_box().save_to_json(tmp_path)
+    test_box = Box.load_from_json(tmp_path / "TEST.json")
+    watcher = watch.Watcher(test_box, tmp_path)
+    change_on_disk(tmp_path, lambda other: other.add_card("THEIRS", "A", "C"))
+    watcher.start(interval=0.01)
+    try:
+        for _ in range(500):
+            if watcher.merged:
+                break
+            watcher.stopped.wait(0.01)
+    finally:
+        watcher.stop()
+    assert watcher.merged["added"] == 1
+    assert test_box.check_card("THEIRS")
+
+
+def test_paused_watcher_defers_merges(tmp_path):
+    make_box().save_to_json(tmp_path)
+    test_box = Box.load_from_json(tmp_path / "TEST.json")
+    watcher = watch.Watcher(test_box, tmp_path)
+    change_on_disk(tmp_path, lambda other: other.delete_card(1))
+    with watcher.paused():
+        watcher.start(interval=0.01)
+        try:
+            watcher.stopped.wait(0.2)
+            assert test_box.get_card(1) is not None
+        finally:
+            watcher.stop()
+    assert watcher.pauses == 0
+    watcher.start(interval=0.01)
+    try:
+        for _ in range(500):
+            if watcher.merged:
+                break
+            watcher.stopped.wait(0.01)
+    finally:
+        watcher.stop()
+    assert watcher.merged["removed"] == 1
+    assert test_box.get_card(1) is None
+
+
+def test_removed_card_is_not_added_to_the_level_index_again(tmp_path):
+    make_box().save_to_json(tmp_path)
+    test_box = Box.load_from_json(tmp_path / "TEST.json")
+    watcher = watch.Watcher(test_box, tmp_path)
+    card = test_box.get_card(1)
+    change_on_disk(tmp_path, lambda other: other.delete_card(1))
+    watcher.reload()
+    test_box.change_level(card, True)
+    assert card not in test_box.list_card_obj_in_level(2)
+    assert card not in test_box.list_card_obj_in_level(1)
+    indexed = sum(
+        len(test_box.list_card_obj_in_level(level)) for level in test_box.levels
+    )
+    assert indexed == len(test_box.cards) == 3
+
+
+class MergingIO(ui.ScriptedIO):
+    """
+    Scripted backend running a function at the first prompt, e.g. to change the file while the user types.
+    """
+
+    def __init__(self, keys, at_first_prompt):
+        super().__init__(keys)
+        self.at_first_prompt = at_first_prompt
+
+    def input(self, prompt=""):
+        if self.at_first_prompt is not None:
+            at_first_prompt, self.at_first_prompt = self.at_first_prompt, None
+            at_first_prompt()
+        return super().input(prompt)
+
+
+def test_card_is_not_removed_while_it_is_edited(tmp_path, monkeypatch):
+    make_box().save_to_json(tmp_path)
+    test_box = Box.load_from_json(tmp_path / "TEST.json")
+    watcher = watch.Watcher(test_box, tmp_path)
+    monkeypatch.setattr(project, "box", test_box)
+    monkeypatch.setattr(project, "watcher", watcher)
+
+    def remove_card():
+        change_on_disk(tmp_path, lambda other: other.delete_card(1))
+        watcher.start(interval=0.01)
+        watcher.stopped.wait(0.2)
+
+    try:
+        with ui.use_backend(MergingIO(["", "EDITED", ""], remove_card)):
+            project.edit_card_ui(1)
+    finally:
+        watcher.stop()
+    assert test_box.get_card(1).answer == "EDITED"
+    # the deletion is merged after the edit and loses against it
+    assert watcher.save()["kept"] == 1
+    assert Box.load_from_json(tmp_path / "TEST.json").get_card(1).answer == "EDITED"
+
+
+def test_card_removed_before_it_is_edited(tmp_path, monkeypatch):
+    make_box().save_to_json(tmp_path)
+    test_box = Box.load_from_json(tmp_path / "TEST.json")
+    watcher = watch.Watcher(test_box, tmp_path)
+    monkeypatch.setattr(project, "box", test_box)
+    monkeypatch.setattr(project, "watcher", watcher)
+    change_on_disk(tmp_path, lambda other: other.delete_card(1))
+    watcher.reload()
+    for action in (project.edit_card_ui, project.attach_file_ui, project.show_card_ui):
+        with ui.use_backend(ui.ScriptedIO([""])) as backend:
+            action(1)
+        assert "FLASHCARD NO LONGER EXISTS" in backend.output.getvalue()
+        assert not backend.keys
+
+
+def test_damaged_file_is_not_overwritten(tmp_path):
+    make_box().save_to_json(tmp_path)
+    watcher = watch.Watcher(Box.load_from_json(tmp_path / "TEST.json"), tmp_path)
+    with open(tmp_path / "TEST.json", "w") as file:
+        file.write("{")
+    with pytest.raises(ValueError):
+        watcher.save()
+    watcher.save(overwrite=True)
+    assert len(Box.load_from_json(tmp_path / "TEST.json").cards) == 4
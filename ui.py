@@ -1,13 +1,140 @@
+import io
 import os
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
 
 """
 The `ui.py` script provides the foundation for the user interface of the application.
 It defines two classes, called `Menu` and `Selector`, which are used to build the UI.
 It also provides a base class, called `BaseUI`, with common attributes and methods shared by both `Menu` and `Selector`.
+
+All input and output goes through an I/O backend, `ui.backend`. By default it is a `TerminalIO` reading the keyboard
+and printing to the terminal. A `ScriptedIO` replays a list of keystrokes instead, so the whole menu tree
+can run without a terminal (see `driver.py`). Switch backends with `use_backend`.
 """
 # ____________________
 
 
+class TerminalIO:
+    """
+    I/O backend reading from the keyboard and writing to the terminal.
+
+    Attributes:
+        output (file): File to print to. None for the standard output.
+    """
+
+    def __init__(self):
+        """
+        Initializes a terminal backend.
+        """
+        self.output = None
+
+    def input(self, prompt=""):
+        """
+        Prints a prompt and reads a line of user input.
+
+        Args:
+            prompt (str, optional): The prompt. Defaults to "".
+
+        Returns:
+            str: The user input.
+        """
+        return input(prompt)
+
+    def print(self, *values, sep=" ", end="\n"):
+        """
+        Prints values like the built-in print.
+        """
+        print(*values, sep=sep, end=end, file=self.output)
+
+    def clear(self):
+        """
+        Clears the screen based on the operating system (Windows/Linux), uses os module.
+        """
+        if os.name == "posix":
+            os.system("clear")
+        else:
+            os.system("cls")
+
+
+class ScriptEnd(Exception):
+    """
+    Raised by ScriptedIO when the application asks for input after the last keystroke.
+    """
+
+
+class ScriptedIO(TerminalIO):
+    """
+    I/O backend replaying a list of keystrokes. Every keystroke is one line of input.
+    Output goes to a buffer, clearing the screen only counts.
+
+    Attributes:
+        keys (deque): Remaining keystrokes.
+        output (file): File to print to, by default a new StringIO buffer.
+        inputs (int): Number of keystrokes read so far.
+        clears (int): Number of times the screen was cleared.
+    """
+
+    def __init__(self, keys, output=None):
+        """
+        Initializes a scripted backend.
+
+        Args:
+            keys (iterable): The keystrokes to replay, e.g. ["1", "2", "X"].
+            output (file, optional): File to print to. Defaults to None (a new StringIO buffer).
+        """
+        super().__init__()
+        self.keys = deque(keys)
+        self.output = output if output is not None else io.StringIO()
+        self.inputs = 0
+        self.clears = 0
+
+    def input(self, prompt=""):
+        """
+        Prints a prompt and returns the next keystroke.
+
+        Raises:
+            ScriptEnd: If there are no keystrokes left.
+        """
+        self.output.write(prompt)
+        if not self.keys:
+            raise ScriptEnd()
+        self.inputs += 1
+        key = self.keys.popleft()
+        self.output.write(f"{key}\n")
+        return key
+
+    def clear(self):
+        """
+        Counts the clear instead of clearing a screen.
+        """
+        self.clears += 1
+
+
+backend = TerminalIO()
+
+
+@contextmanager
+def use_backend(new_backend):
+    """
+    Context manager routing all input and output through another backend. Restores the previous backend on exit.
+
+    Args:
+        new_backend (TerminalIO): The backend to use, e.g. a ScriptedIO.
+    """
+    global backend
+    previous, backend = backend, new_backend
+    try:
+        yield new_backend
+    finally:
+        backend = previous
+
+
+# ____________________
+
+
 class BaseUI:
     """
     Base class for user interfaces. Used as parent class for Menu and Selector.
@@ -17,6 +144,7 @@ class BaseUI:
         options (dict or list): Dictionary of menu options and corresponding actions or list of options. Printed as enumerated list.
         prompt_text (str): Text prompt for user input.
         choice (str): User's choice for selection.
+        display_function (function): Function returning the displayed text of an option. Options are displayed as they are if None.
     """
 
     def __init__(self, title, options):
@@ -31,6 +159,7 @@ class BaseUI:
         self.options = options
         self.prompt_text = "YOUR CHOICE: "
         self.choice = None
+        self.display_function = None
 
     def display(self):
         """
@@ -38,7 +167,7 @@ class BaseUI:
         """
         self.clear_screen()
         self.print_line()
-        print(f"{self.title}\n")
+        backend.print(f"{self.title}\n")
         self.print_options()
         self.get_user_input()
 
@@ -46,23 +175,21 @@ class BaseUI:
         """
         Gets user input for selection.
         """
-        self.choice = input(f"\n{self.prompt_text}")
+        self.choice = backend.input(f"\n{self.prompt_text}")
 
     def clear_screen(self):
         """
-        Clears the screen based on operating system, uses os module.
+        Clears the screen through the I/O backend.
         """
-        if os.name == "posix":
-            os.system("clear")
-        else:
-            pass
+        backend.clear()
 
     def print_line(self):
         """
         Prints a line. For layout purposes.
         """
-        print("\n", 20 * "_", "\n")
+        backend.print("\n", 20 * "_", "\n")
 
+    @metrics.timed("ui_print_options_seconds")
     def print_options(self):
         """
         Enumerates and prints the options, replacing enumeration with "X" for options "EXIT" or "BACK"
@@ -70,17 +197,15 @@ class BaseUI:
         if isinstance(self.options, dict):
             for i, (key, value) in enumerate(self.options.items(), start=1):
                 if key == "EXIT" or key == "BACK":
-                    print(f"  X: {key}")
+                    backend.print(f"  X: {key}")
                 else:
-                    print(f"  {i}: {key}")
+                    backend.print(f"  {i}: {key}")
         if isinstance(self.options, list):
-            options_copy = self.options.copy()
-            options_copy.append("BACK")
-            for i, option in enumerate(options_copy, start=1):
-                if option == "BACK":
-                    print(f"  X: {option}")
-                else:
-                    print(f"  {i}: {option}")
+            for i, option in enumerate(self.options, start=1):
+                if self.display_function is not None:
+                    option = self.display_function(option)
+                backend.print(f"  {i}: {option}")
+            backend.print(f"  X: BACK")
 
     def run(self):
         """
@@ -122,8 +247,8 @@ class Menu(BaseUI):
                     selected_option = list(self.options.values())[index]
                     self.call_or_instantiate(selected_option)
             else:
-                print("\nINVALID CHOICE - ENTER A VALID OPTION OR 'X'")
-                input("\nPRESS 'ENTER' TO CONTINUE")
+                backend.print("\nINVALID CHOICE - ENTER A VALID OPTION OR 'X'")
+                backend.input("\nPRESS 'ENTER' TO CONTINUE")
                 pass
 
     def call_or_instantiate(self, selected_option=None):
@@ -134,7 +259,11 @@ class Menu(BaseUI):
             selected_option (function or instance): Selected option, which can be a function, submenu or a selector.
         """
         if callable(selected_option):
-            selected_option()
+            # only actions are timed, submenus and selectors would measure the time the user spends in them
+            with metrics.Timer(
+                "ui_action_seconds", action=getattr(selected_option, "__name__", "")
+            ):
+                selected_option()
         elif isinstance(selected_option, Menu):
             selected_option.run(self)
         elif isinstance(selected_option, Selector):
@@ -166,9 +295,10 @@ class Selector(BaseUI):
         title (str): Title of the selector.
         original_options: Reference to the original options passed when creating the Selector. Needed for navigation.
         instance_or_function: Function or instance to call and pass the selection to.
+        display_function: Function returning the displayed text of an option, e.g. the question of a flashcard ID.
     """
 
-    def __init__(self, title, options, instance_or_function):
+    def __init__(self, title, options, instance_or_function, display_function=None):
         """
         Initialize the Selector instance.
 
@@ -176,11 +306,13 @@ class Selector(BaseUI):
             title (str): Title of the selector.
             options (list or function): List of options the user can choose from or function to call if there is a parent_selector/selection.
             instance_or_function(instance or function): Function or instance to call and pass selction to.
+            display_function (function, optional): Function returning the displayed text of an option. Defaults to None.
         """
         super().__init__(title, options)
         self.title = f"AVAILABLE {title}:"
         self.original_options = options
         self.instance_or_function = instance_or_function
+        self.display_function = display_function
 
     def run(self, parent_selector=None, parent_selection=None):
         """
@@ -193,8 +325,8 @@ class Selector(BaseUI):
 
         while True:
             if not self.options:
-                print(f"\nNOTHING HERE - TRY SOMETHING ELSE")
-                input(f"\nPRESS 'ENTER' TO CONTINUE")
+                backend.print(f"\nNOTHING HERE - TRY SOMETHING ELSE")
+                backend.input(f"\nPRESS 'ENTER' TO CONTINUE")
                 break
             else:
                 if parent_selection:
@@ -206,8 +338,10 @@ class Selector(BaseUI):
                     else:
                         self.call_or_instantiate()
                 else:
-                    print(f"\nINVALID CHOICE - PLEASE ENTER A VALID OPTION OR 'X'")
-                    input(f"\nPRESS 'ENTER' TO CONTINUE")
+                    backend.print(
+                        f"\nINVALID CHOICE - PLEASE ENTER A VALID OPTION OR 'X'"
+                    )
+                    backend.input(f"\nPRESS 'ENTER' TO CONTINUE")
                     pass
 
     def call_or_instantiate(self):
@@ -219,11 +353,13 @@ class Selector(BaseUI):
         selected_option = self.options[index]
 
         if callable(self.instance_or_function):
-            self.instance_or_function(selected_option)
+            action = getattr(self.instance_or_function, "__name__", self.title)
+            with metrics.Timer("ui_action_seconds", action=action):
+                self.instance_or_function(selected_option)
         elif isinstance(self.instance_or_function, Selector):
             self.instance_or_function.run(self, selected_option)
         else:
-            print(f"\nDEFINED FUNCTION NOT CALLABLE")
+            backend.print(f"\nDEFINED FUNCTION NOT CALLABLE")
 
     def input_validation(self):
         """
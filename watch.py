@@ -0,0 +1,207 @@
+import contextlib
+import hashlib
+import os
+import threading
+
+import box
+import sync
+
+"""
+The `watch.py` script notices when the save file of an open box is replaced by another program
+(a sync client, a second instance of FlashLine_, `sync.py apply`) and merges the changes into the open box,
+so saving does not silently overwrite them and unsaved progress of the open box is not lost.
+
+A watcher remembers the size, modification time and content hash of the file as it was loaded or last saved,
+and the manifest of that version (see sync.manifest). A check compares size and modification time first
+and hashes the file only if they differ, so checking an unchanged file costs a single stat.
+A changed file is loaded and diffed against the remembered manifest (see sync.compute_delta),
+and only the cards that changed on disk are merged into the open box (see sync.merge_delta).
+
+Boxes are checked before every save and, once started, every INTERVAL seconds in a background thread.
+While a watcher is paused (see Watcher.paused), e.g. during a learn session, the background thread defers merges,
+so cards held by the session are not removed under it. Sharded boxes (see shards.py) are not watched.
+"""
+
+# ____________________
+
+# Seconds between two checks of the background thread
+INTERVAL = 5.0
+
+
+def file_state(file_path):
+    """
+    Returns the size and modification time of a file, None if it does not exist.
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def file_hash(file_path):
+    """
+    Hashes the content of a file (SHA-256), None if it does not exist.
+    """
+    try:
+        with open(file_path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class Watcher:
+    """
+    Watches the save file of an open box.
+
+    Attributes:
+        box (Box): The open box.
+        file_path (str): The path of its save file.
+        state (tuple): Size and modification time of the file when it was last loaded or saved, None if it did not exist.
+        hash (str): The content hash of the file when it was last loaded or saved.
+        base (dict): The manifest of the box in the file when it was last loaded or saved.
+        merged (dict): The number of changes merged from the file since the last save (see sync.merge_delta).
+        error (Exception): The last error of the background thread, None if there was none.
+        pauses (int): The number of open pauses. The background thread does not merge while it is not 0.
+    """
+
+    def __init__(self, current_box, save_folder="data"):
+        """
+        Initializes a watcher for a box that was just loaded from or created in a save folder,
+        before the box is changed. The box is taken as the version in the file.
+
+        Args:
+            current_box (Box): The open box.
+            save_folder (str, optional): The folder with the save files. Defaults to 'data'.
+        """
+        self.box = current_box
+        self.save_folder = save_folder
+        self.file_path = os.path.join(save_folder, f"{current_box.name}.json")
+        self.state = file_state(self.file_path)
+        self.hash = file_hash(self.file_path)
+        if self.state is None:
+            self.base = sync.manifest(box.Box(current_box.name))
+        else:
+            self.base = sync.manifest(current_box)
+        self.merged = {}
+        self.error = None
+        self.pauses = 0
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def changed(self):
+        """
+        Checks whether the file was changed since it was last loaded or saved.
+        Only the size and modification time are compared, unless they differ. Then the content is hashed,
+        so a file that was touched or rewritten with the same content does not count as changed.
+        A file that was deleted does not count as changed either, the next save writes it again.
+
+        Returns:
+            bool: True if the content of the file changed.
+        """
+        state = file_state(self.file_path)
+        if state == self.state or state is None:
+            return False
+        content_hash = file_hash(self.file_path)
+        if content_hash == self.hash:
+            self.state = state
+            return False
+        return True
+
+    def reload(self):
+        """
+        Merges the changes in the file into the open box, if the file changed. Unsaved changes of the box are kept.
+
+        Returns:
+            dict: The number of merged changes (see sync.merge_delta), None if the file did not change.
+
+        Raises:
+            ValueError: If the file is damaged (schema.SchemaError for invalid content).
+        """
+        with self.lock:
+            if not self.changed():
+                return None
+            state = file_state(self.file_path)
+            content_hash = file_hash(self.file_path)
+            theirs = box.Box.load_from_json(self.file_path)
+            patch = sync.compute_delta(self.base, theirs)
+            counts = sync.merge_delta(self.box, self.base, patch)
+            self.base = sync.manifest(theirs)
+            self.state = state
+            self.hash = content_hash
+            for key, count in counts.items():
+                self.merged[key] = self.merged.get(key, 0) + count
+            return counts
+
+    def save(self, overwrite=False):
+        """
+        Saves the box, after merging the changes in the file.
+
+        Args:
+            overwrite (bool, optional): Whether to save without merging the changes in the file. Defaults to False.
+
+        Returns:
+            dict: The number of changes merged from the file since the last save.
+
+        Raises:
+            ValueError: If the file is damaged. The box is not saved.
+        """
+        with self.lock:
+            if not overwrite:
+                self.reload()
+            self.box.save_to_json(self.save_folder)
+            self.state = file_state(self.file_path)
+            self.hash = file_hash(self.file_path)
+            self.base = sync.manifest(self.box)
+            merged, self.merged = self.merged, {}
+            return merged
+
+    @contextlib.contextmanager
+    def paused(self):
+        """
+        Defers the merges of the background thread while the context is open. A merge that is running
+        is finished first. Changes in the file are merged at the next check after the pause, or by save.
+        """
+        with self.lock:
+            self.pauses += 1
+        try:
+            yield self
+        finally:
+            with self.lock:
+                self.pauses -= 1
+
+    def run(self, interval):
+        """
+        Checks the file every interval until the watcher is stopped. Errors are kept in watcher.error.
+        """
+        while not self.stopped.wait(interval):
+            try:
+                with self.lock:
+                    if self.pauses:
+                        continue
+                    self.reload()
+                self.error = None
+            except (OSError, ValueError) as e:
+                # the file may be in the middle of being written, try again next time
+                self.error = e
+
+    def start(self, interval=INTERVAL):
+        """
+        Starts checking the file in a background thread.
+
+        Args:
+            interval (float, optional): Seconds between two checks. Defaults to INTERVAL.
+        """
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, args=(interval,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread.
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None